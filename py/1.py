@@ -2,12 +2,21 @@ from base.parser import Parser
 import requests
 import time
 import hashlib
+import json
 import random
 import string
-from urllib.parse import urlencode, quote
+from urllib.parse import urlencode, quote, urljoin, urlsplit
 from typing import Dict, Any, Tuple, Union, Iterable
 import logging
+import re
+import threading
 import urllib3
+import os
+import sys
+from requests.adapters import HTTPAdapter
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from lib.playlist import PlaylistInfo, VARIANT, rewrite_playlist
 
 # 禁用SSL警告
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -16,6 +25,154 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 缓存的播放列表模板中token的占位符
+TOKEN_SLOT = '\x00token\x00'
+
+# 这些位置的地址是子列表，需要同样改写
+PLAYLIST_KINDS = (VARIANT, '#EXT-X-MEDIA', '#EXT-X-I-FRAME-STREAM-INF')
+
+SEGMENT_TYPES = {
+    '.m4s': 'video/iso.segment',
+    '.mp4': 'video/mp4',
+    '.aac': 'audio/aac',
+    '.key': 'application/octet-stream',
+}
+
+
+def segment_content_type(ts_file):
+    path = ts_file.split('?', 1)[0].lower()
+    return SEGMENT_TYPES.get(path[path.rfind('.'):], 'video/MP2T')
+
+class ChannelListCache:
+    """
+    频道列表缓存：到期前在后台刷新，刷新期间与上游失败时继续返回旧数据
+    """
+
+    def __init__(self, loader, ttl, refresh_ahead=300):
+        self.loader = loader
+        self.ttl = ttl
+        self.refresh_ahead = min(refresh_ahead, ttl / 2)
+        self.loaded_at = 0
+        self.channels = []
+        self._refresh_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._refreshing = False
+
+    def get(self):
+        """返回频道列表；只有从未加载成功时才阻塞等待"""
+        if not self.loaded_at:
+            return self.refresh()
+        if time.time() - self.loaded_at >= self.ttl - self.refresh_ahead:
+            self.refresh_async()
+        return self.channels
+
+    def invalidate(self):
+        """标记为过期并在后台重建；重建完成前继续返回旧数据"""
+        if self.loaded_at:
+            self.loaded_at = 1
+        return self.refresh_async()
+
+    def refresh(self):
+        """同步刷新；上游全部失败时保留旧数据"""
+        with self._refresh_lock:
+            channels = self.loader()
+            if channels:
+                self.channels = channels
+                self.loaded_at = time.time()
+            elif self.loaded_at:
+                logger.warning("频道列表刷新失败，继续使用旧数据")
+            return self.channels
+
+    def refresh_async(self):
+        """后台刷新，已有刷新在进行时直接返回"""
+        with self._state_lock:
+            if self._refreshing:
+                return False
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"频道列表后台刷新失败: {e}")
+            finally:
+                with self._state_lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name='channel-refresh', daemon=True).start()
+        return True
+
+
+class UpstreamSelector:
+    """
+    上游选择器：按延迟加权选择上游，连续失败的上游熔断一段时间，
+    熔断到期后放行一次探测请求（半开），成功即恢复
+    """
+
+    def __init__(self, upstreams, failure_threshold=3, open_seconds=30, alpha=0.3):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.alpha = alpha
+        self.lock = threading.Lock()
+        self.state = {
+            upstream: {
+                'latency': 0.0,
+                'requests': 0,
+                'errors': 0,
+                'consecutive_failures': 0,
+                'open_until': 0.0
+            }
+            for upstream in upstreams
+        }
+
+    def ordered(self):
+        """返回本次请求的尝试顺序：首选按 1/延迟 加权随机，其余按延迟升序，熔断中的排在最后"""
+        now = time.time()
+        with self.lock:
+            closed = [u for u, st in self.state.items() if st['open_until'] <= now]
+            opened = sorted((u for u in self.state if u not in closed), key=lambda u: self.state[u]['open_until'])
+            closed.sort(key=lambda u: self.state[u]['latency'])
+            if len(closed) > 1:
+                weights = [1.0 / max(self.state[u]['latency'], 0.05) for u in closed]
+                first = random.choices(closed, weights=weights)[0]
+                closed.remove(first)
+                closed.insert(0, first)
+        return closed + opened
+
+    def choose(self):
+        return self.ordered()[0]
+
+    def record(self, upstream, ok, latency):
+        with self.lock:
+            st = self.state.get(upstream)
+            if st is None:
+                return
+            st['requests'] += 1
+            if ok:
+                st['latency'] = latency if not st['latency'] else (
+                    self.alpha * latency + (1 - self.alpha) * st['latency'])
+                st['consecutive_failures'] = 0
+                st['open_until'] = 0.0
+            else:
+                st['errors'] += 1
+                st['consecutive_failures'] += 1
+                if st['consecutive_failures'] >= self.failure_threshold:
+                    st['open_until'] = time.time() + self.open_seconds
+
+    def stats(self):
+        now = time.time()
+        with self.lock:
+            return {
+                upstream: {
+                    'latency_ms': round(st['latency'] * 1000, 1),
+                    'requests': st['requests'],
+                    'errors': st['errors'],
+                    'circuit': 'open' if st['open_until'] > now else 'closed'
+                }
+                for upstream, st in self.state.items()
+            }
+
+
 class Parser(Parser):
     
     def __init__(self, *args, **kwargs):
@@ -27,23 +184,32 @@ class Parser(Parser):
             'token_ttl': 2400,
             'cache_ttl': 3600,
             'fallback': 'http://vjs.zencdn.net/v/oceans.mp4',
-            'clear_key': 'leifeng'
+            'clear_key': 'leifeng',
+            'segment_deadline': 10,
+            'chunk_size': 64 * 1024
         }
+        # 独立服务模式下TS以分块方式边下边发
+        self.stream_ts = False
         
         self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=50)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
             'Cache-Control': 'no-cache'
         })
         
-        self.cache = {}
-        self.upstream_index = 0
+        self.channel_cache = ChannelListCache(self.load_channel_list, self.config['cache_ttl'])
+        self.auth_cache = {}
+        # (频道, 鉴权窗口, 服务地址, 子列表) -> (过期时间, 改写后的列表模板)，模板中的token用占位符代替
+        self.playlist_cache = {}
+        # 列表中出现过的非上游主机，只代理这些主机上的绝对地址
+        self.foreign_hosts = set()
+        self.upstreams = UpstreamSelector(self.config['upstream'])
 
     def get_upstream(self):
-        upstreams = self.config['upstream']
-        current = upstreams[self.upstream_index % len(upstreams)]
-        self.upstream_index += 1
-        return current
+        return self.upstreams.choose()
 
     def fetch_url_content(self, url, timeout=5):
         try:
@@ -55,13 +221,11 @@ class Parser(Parser):
             return None
 
     def get_channel_list(self, force_refresh=False):
-        cache_key = 'channels'
-        
-        if not force_refresh and cache_key in self.cache:
-            cached_time, data = self.cache[cache_key]
-            if time.time() - cached_time < self.config['cache_ttl']:
-                return data
+        if force_refresh:
+            return self.channel_cache.refresh()
+        return self.channel_cache.get()
 
+    def load_channel_list(self):
         raw = self.fetch_url_content(self.config['list_url'])
         if not raw:
             raw = self.fetch_url_content(self.config['backup_url'])
@@ -87,7 +251,6 @@ class Parser(Parser):
                 
                 channel_id = None
                 if '?id=' in url_part:
-                    import re
                     match = re.search(r'[?&]id=([^&]+)', url_part)
                     if match:
                         channel_id = match.group(1)
@@ -99,7 +262,6 @@ class Parser(Parser):
                         'group': current_group
                     })
 
-        self.cache[cache_key] = (time.time(), channels)
         return channels
 
     def validate_token(self, token):
@@ -119,56 +281,162 @@ class Parser(Parser):
         new_token = ''.join(random.choices(string.hexdigits, k=32)) + ':' + str(int(time.time()))
         return new_token
 
-    def generate_m3u8(self, channel_id, token):
-        upstream = self.get_upstream()
+    def auth_query(self, channel_id, current_time):
+        # 同一频道在150秒鉴权窗口内复用签名
+        key = (channel_id, current_time)
+        query = self.auth_cache.get(key)
+        if query is None:
+            if len(self.auth_cache) > 1024:
+                self.auth_cache.clear()
+            auth_str = f"tvata nginx auth module/{channel_id}/playlist.m3u8mc42afe745533{current_time}"
+            tsum = hashlib.md5(auth_str.encode()).hexdigest()
+            query = self.auth_cache[key] = urlencode({
+                'tid': 'mc42afe745533',
+                'ct': current_time,
+                'tsum': tsum
+            })
+        return query
+
+    def upstream_ref(self, upstream, channel_id, url):
+        """
+        上游绝对地址 -> 代理参数：频道目录下用相对路径，上游其他路径以 / 开头，
+        其他主机保留绝对地址并记入允许代理的主机
+        """
+        if upstream is not None:
+            channel_root = upstream + channel_id + "/"
+            if url.startswith(channel_root):
+                return url[len(channel_root):]
+            if url.startswith(upstream):
+                return "/" + url[len(upstream):]
+        if len(self.foreign_hosts) > 256:
+            self.foreign_hosts.clear()
+        self.foreign_hosts.add(urlsplit(url).netloc)
+        return url
+
+    def upstream_urls(self, channel_id, ref):
+        """代理参数 -> 依次尝试的 (上游, 地址)；其他主机的地址只有一个，上游为None"""
+        if urlsplit(ref).scheme:
+            if urlsplit(ref).netloc not in self.foreign_hosts:
+                return []
+            return [(None, ref)]
+        if ref.startswith('/'):
+            return [(upstream, upstream + ref[1:]) for upstream in self.upstreams.ordered()]
+        return [(upstream, upstream + channel_id + "/" + ref) for upstream in self.upstreams.ordered()]
+
+    def generate_m3u8(self, channel_id, token, sub=None):
         current_time = int(time.time() / 150)
-        auth_str = f"tvata nginx auth module/{channel_id}/playlist.m3u8mc42afe745533{current_time}"
-        tsum = hashlib.md5(auth_str.encode()).hexdigest()
-        
-        auth_url = upstream + channel_id + "/playlist.m3u8?" + urlencode({
-            'tid': 'mc42afe745533',
-            'ct': current_time,
-            'tsum': tsum
-        })
-        
-        content = self.fetch_url_content(auth_url)
-        if not content:
-            return {"url": self.config['fallback']}
-        
-        import re
-        base_url = self.address + "?id=" + quote(channel_id) + "&token=" + quote(token)
-        
-        def replace_ts(match):
-            ts_file = match.group(1)
-            return base_url + "&ts=" + quote(ts_file)
-        
-        content = re.sub(r'(\S+\.ts)', replace_ts, content)
-        
+        key = (channel_id, current_time, self.address, sub)
+        cached = self.playlist_cache.get(key)
+        if cached and cached[0] > time.time():
+            template = cached[1]
+        else:
+            template = self.build_m3u8(channel_id, current_time, sub)
+            if template is None:
+                return {"url": self.config['fallback']}
+
         return {
-            "content": content,
+            "content": template.replace(TOKEN_SLOT, quote(token)),
             "headers": {
                 'Content-Type': 'application/vnd.apple.mpegurl'
             }
         }
 
+    def build_m3u8(self, channel_id, current_time, sub=None):
+        """拉取上游列表（sub 为子列表的代理参数）并改写为本服务地址，结果按鉴权窗口缓存"""
+        if sub:
+            targets = self.upstream_urls(channel_id, sub)
+        else:
+            query = self.auth_query(channel_id, current_time)
+            targets = [(upstream, upstream + channel_id + "/playlist.m3u8?" + query)
+                       for upstream in self.upstreams.ordered()]
+
+        content = None
+        for upstream, playlist_url in targets:
+            start = time.time()
+            content = self.fetch_url_content(playlist_url)
+            self.upstreams.record(upstream, content is not None, time.time() - start)
+            if content:
+                break
+        if not content:
+            return None
+
+        base_url = self.address + "?id=" + quote(channel_id) + "&token=" + TOKEN_SLOT
+
+        def map_uri(uri, kind):
+            # 分片、子列表以及标签里的初始化段、密钥一律解析成绝对地址后经本服务代理，
+            # 子列表走 &sub= 继续改写，其余走 &ts= 转发
+            absolute = urljoin(playlist_url, uri)
+            if urlsplit(absolute).scheme not in ('http', 'https'):
+                return None
+            ref = self.upstream_ref(upstream, channel_id, absolute)
+            param = "&sub=" if kind in PLAYLIST_KINDS else "&ts="
+            return base_url + param + quote(ref)
+
+        info = PlaylistInfo()
+        template = rewrite_playlist(content, map_uri, info)
+
+        # 主列表与点播列表整个鉴权窗口内不变；直播列表只缓存半个分片时长
+        now = time.time()
+        window_end = (current_time + 1) * 150
+        if info.master or info.endlist:
+            expires = window_end
+        else:
+            expires = min(window_end, now + max(info.target_duration / 2, 1))
+        if len(self.playlist_cache) > 1024:
+            self.playlist_cache.clear()
+        self.playlist_cache[(channel_id, current_time, self.address, sub)] = (expires, template)
+        return template
+
     def proxy_ts(self, channel_id, ts_file):
-        upstream = self.get_upstream()
-        url = upstream + channel_id + "/" + ts_file
-        
-        try:
-            response = self.session.get(url, timeout=10, verify=False)
-            if response.status_code == 200:
-                return {
-                    "content": response.content,
-                    "headers": {
-                        'Content-Type': 'video/MP2T'
+        # 在分片截止时间内依次尝试健康的上游
+        deadline = time.time() + self.config['segment_deadline']
+        for upstream, url in self.upstream_urls(channel_id, ts_file):
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            start = time.time()
+            try:
+                response = self.session.get(url, timeout=remaining, verify=False, stream=self.stream_ts)
+                if response.status_code == 200:
+                    headers = {'Content-Type': segment_content_type(ts_file)}
+                    if self.stream_ts:
+                        if 'Content-Length' in response.headers:
+                            headers['Content-Length'] = response.headers['Content-Length']
+                        content = self.iter_body(response)
+                    else:
+                        content = response.content
+                    self.upstreams.record(upstream, True, time.time() - start)
+                    return {
+                        "content": content,
+                        "headers": headers
                     }
-                }
-        except Exception as e:
-            logger.error(f"代理TS失败: {e}")
+                response.close()
+                # 404等客户端错误说明该镜像缺少此分片，换下一个上游但不计入熔断
+                if response.status_code >= 500:
+                    self.upstreams.record(upstream, False, time.time() - start)
+            except Exception as e:
+                self.upstreams.record(upstream, False, time.time() - start)
+                logger.error(f"代理TS失败 {upstream}: {e}")
         
         return {"error": "404 Not Found"}
 
+    def iter_body(self, response):
+        try:
+            for chunk in response.iter_content(chunk_size=self.config['chunk_size']):
+                if chunk:
+                    yield chunk
+        finally:
+            response.close()
+
+    def upstream_stats(self):
+        return {
+            "content": json.dumps(self.upstreams.stats(), ensure_ascii=False, indent=2),
+            "headers": {
+                'Content-Type': 'application/json; charset=utf-8',
+                'Cache-Control': 'no-store'
+            }
+        }
+
     def send_txt_list(self):
         try:
             channels = self.get_channel_list()
@@ -200,15 +468,13 @@ class Parser(Parser):
         if key != self.config['clear_key']:
             return {"error": "权限验证失败"}
 
-        self.cache.clear()
+        self.auth_cache.clear()
+        self.playlist_cache.clear()
         results = ["缓存已清除"]
-        
-        try:
-            channels = self.get_channel_list(force_refresh=True)
-            if channels:
-                results.append(f"频道列表已重建 数量:{len(channels)}")
-        except Exception as e:
-            results.append(f"列表重建失败: {e}")
+        if self.channel_cache.invalidate():
+            results.append(f"频道列表正在后台重建 当前数量:{len(self.channel_cache.channels)}")
+        else:
+            results.append("频道列表重建已在进行中")
 
         return {
             "content": "\n".join(results),
@@ -224,6 +490,8 @@ class Parser(Parser):
 
             if action == 'clear_cache' and clear_key:
                 return self.clear_cache(clear_key)
+            elif action == 'stats':
+                return self.upstream_stats()
             elif not channel_id:
                 return self.send_txt_list()
             elif ts_file:
@@ -235,7 +503,7 @@ class Parser(Parser):
                 return self.proxy_ts(channel_id, ts_file)
             else:
                 token = self.manage_token(params)
-                return self.generate_m3u8(channel_id, token)
+                return self.generate_m3u8(channel_id, token, params.get('sub'))
 
         except Exception as e:
             logger.error(f"系统错误: {e}")
@@ -248,18 +516,44 @@ class Parser(Parser):
     def proxy(self, url: str, headers: Dict[str, Any]) -> Tuple[Union[bytes, Iterable[bytes]], Dict[str, str]]:
         pass
 
-  if __name__ == "__main__":
-    # 创建一个简单的HTTP服务器
-    from http.server import HTTPServer, BaseHTTPRequestHandler
+if __name__ == "__main__":
+    # 独立运行的多线程HTTP服务
+    import argparse
+    import signal
     import urllib.parse
-    
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    arg_parser = argparse.ArgumentParser(description='频道代理独立服务')
+    arg_parser.add_argument('--host', default=os.environ.get('PARSER_HOST', '0.0.0.0'), help='监听地址')
+    arg_parser.add_argument('--port', type=int, default=int(os.environ.get('PARSER_PORT', 5000)), help='监听端口')
+    arg_parser.add_argument('--address', default=os.environ.get('PARSER_ADDRESS', ''),
+                            help='对外访问地址，如 http://192.168.1.2:5000，默认取请求的Host')
+    args = arg_parser.parse_args()
+
+    class ServerParser(Parser):
+        # 所有连接共用一个解析器，对外地址按请求线程区分
+        local = threading.local()
+        fixed_address = args.address.rstrip('/')
+
+        @property
+        def address(self):
+            return self.fixed_address or getattr(self.local, 'address', '')
+
+        @address.setter
+        def address(self, value):
+            self.local.address = value
+
+    shared_parser = ServerParser()
+    shared_parser.stream_ts = True
+
     class ParserHTTPHandler(BaseHTTPRequestHandler):
-        parser = None
-        
+        protocol_version = 'HTTP/1.1'  # 保持连接
+        timeout = 30  # 空闲的保持连接30秒后关闭
+        disable_nagle_algorithm = True  # 响应头与正文分开写出，避免Nagle与延迟确认叠加
+        parser = shared_parser
+
         def do_GET(self):
-            if self.parser is None:
-                self.parser = Parser()
-                self.parser.address = f"http://{self.headers.get('Host')}"
+            self.parser.address = f"http://{self.headers.get('Host')}"
             
             # 解析URL参数
             parsed_url = urllib.parse.urlparse(self.path)
@@ -273,48 +567,80 @@ class Parser(Parser):
             
             try:
                 result = self.parser.parse(params)
-                
-                # 重定向
-                if 'url' in result:
-                    self.send_response(302)
-                    self.send_header('Location', result['url'])
-                    self.end_headers()
-                    return
-                
-                # 返回内容
-                elif 'content' in result:
-                    self.send_response(200)
-                    headers = result.get('headers', {})
-                    for key, value in headers.items():
-                        self.send_header(key, value)
-                    self.end_headers()
-                    
-                    content = result['content']
-                    if isinstance(content, str):
-                        content = content.encode('utf-8')
-                    self.wfile.write(content)
-                    return
-                    
             except Exception as e:
-                self.send_response(500)
+                result = {"error": f"服务器错误: {e}", "status": 500}
+
+            # 重定向
+            if 'url' in result:
+                self.send_response(302)
+                self.send_header('Location', result['url'])
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+            
+            # 返回内容
+            elif 'content' in result:
+                self.send_content(result['content'], result.get('headers', {}))
+
+            else:
+                error = result.get('error', '404 Not Found')
+                status = result.get('status', 404)
+                self.send_content(str(error), {'Content-Type': 'text/plain; charset=utf-8'}, status)
+
+        def send_content(self, content, headers, status=200):
+            if isinstance(content, str):
+                content = content.encode('utf-8')
+            self.send_response(status)
+            for key, value in headers.items():
+                if key.lower() not in ('content-length', 'transfer-encoding', 'connection'):
+                    self.send_header(key, value)
+
+            if isinstance(content, bytes):
+                self.send_header('Content-Length', str(len(content)))
                 self.end_headers()
-                self.wfile.write(f"服务器错误: {str(e)}".encode('utf-8'))
+                self.wfile.write(content)
+                return
+
+            # TS分块转发：客户端断开时关闭生成器，随之释放上游连接
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            try:
+                for chunk in content:
+                    self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+                self.wfile.write(b'0\r\n\r\n')
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True
+            finally:
+                if hasattr(content, 'close'):
+                    content.close()
         
         def log_message(self, format, *args):
             # 减少日志输出
             pass
-    
+
     # 启动服务器
-    port = 5000
-    server = HTTPServer(('0.0.0.0', port), ParserHTTPHandler)
-    print(f"服务启动: http://localhost:{port}")
-    print(f"频道列表: http://localhost:{port}/")
-    print(f"播放示例: http://localhost:{port}/?id=cctv1")
+    class ParserHTTPServer(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 128  # 默认值5，多台设备同时连接时会触发SYN重传
+
+    server = ParserHTTPServer((args.host, args.port), ParserHTTPHandler)
+
+    def graceful_shutdown(signum, frame):
+        # shutdown 会等待 serve_forever 退出，需在其他线程中调用
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, graceful_shutdown)
+
+    print(f"服务启动: http://{args.host}:{args.port}")
+    print(f"频道列表: http://localhost:{args.port}/")
+    print(f"播放示例: http://localhost:{args.port}/?id=cctv1")
+    print(f"上游状态: http://localhost:{args.port}/?action=stats")
     print("按 Ctrl+C 停止服务")
     
     try:
         server.serve_forever()
     except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        shared_parser.stop()
         print("\n服务停止")
-        if ParserHTTPHandler.parser:
-            ParserHTTPHandler.parser.stop()
@@ -16,21 +16,27 @@ from urllib.parse import quote
 from base.spider import Spider
 from Crypto.Cipher import AES
 from datetime import datetime
-from bs4 import BeautifulSoup
 from base64 import b64decode
 import urllib.request
 import urllib.parse
 import datetime
 import binascii
-import requests
 import base64
 import json
 import time
 import sys
 import re
 import os
+from functools import cached_property
 
 sys.path.append('..')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from lib.httpclient import get_client
+from lib.extract import extract_middle_text
+from lib.prefetch import DetailCache, LineResolver, prefetch_count
+from lib.soup import find_all
+
+http_client = get_client()
 
 xurl = "https://www.4kvm.net"
 
@@ -46,7 +52,17 @@ class Spider(Spider):
         return "首页"
 
     def init(self, extend):
-        pass
+        self.details.count = prefetch_count(extend)
+
+    @cached_property
+    def details(self):
+        # 分类/搜索结果返回后在后台预取前几条详情
+        return DetailCache(self.load_detail)
+
+    @cached_property
+    def lines(self):
+        # 详情返回时后台解析各线路首集，播放时直接取用；播放签名有时效，只缓存一分钟
+        return LineResolver(self.resolve_play, ttl=60)
 
     def isVideoFormat(self, url):
         pass
@@ -55,74 +71,15 @@ class Spider(Spider):
         pass
 
     def extract_middle_text(self, text, start_str, end_str, pl, start_index1: str = '', end_index2: str = ''):
-        if pl == 3:
-            plx = []
-            while True:
-                start_index = text.find(start_str)
-                if start_index == -1:
-                    break
-                end_index = text.find(end_str, start_index + len(start_str))
-                if end_index == -1:
-                    break
-                middle_text = text[start_index + len(start_str):end_index]
-                plx.append(middle_text)
-                text = text.replace(start_str + middle_text + end_str, '')
-            if len(plx) > 0:
-                purl = ''
-                for i in range(len(plx)):
-                    matches = re.findall(start_index1, plx[i])
-                    output = ""
-                    for match in matches:
-                        match3 = re.search(r'(?:^|[^0-9])(\d+)(?:[^0-9]|$)', match[1])
-                        if match3:
-                            number = match3.group(1)
-                        else:
-                            number = 0
-                        if 'http' not in match[0]:
-                            output += f"#{match[1]}${number}{xurl}{match[0]}"
-                        else:
-                            output += f"#{match[1]}${number}{match[0]}"
-                    output = output[1:]
-                    purl = purl + output + "$$$"
-                purl = purl[:-3]
-                return purl
-            else:
-                return ""
-        else:
-            start_index = text.find(start_str)
-            if start_index == -1:
-                return ""
-            end_index = text.find(end_str, start_index + len(start_str))
-            if end_index == -1:
-                return ""
-
-        if pl == 0:
-            middle_text = text[start_index + len(start_str):end_index]
-            return middle_text.replace("\\", "")
-
-        if pl == 1:
-            middle_text = text[start_index + len(start_str):end_index]
-            matches = re.findall(start_index1, middle_text)
-            if matches:
-                jg = ' '.join(matches)
-                return jg
-
-        if pl == 2:
-            middle_text = text[start_index + len(start_str):end_index]
-            matches = re.findall(start_index1, middle_text)
-            if matches:
-                new_list = [f'{item}' for item in matches]
-                jg = '$$$'.join(new_list)
-                return jg
+        return extract_middle_text(text, start_str, end_str, pl, start_index1, end_index2, base_url=xurl)
 
     def homeContent(self, filter):
         result = {"class": []}
 
-        detail = requests.get(url=xurl, headers=headerx)
+        detail = http_client.get(url=xurl, headers=headerx)
         detail.encoding = "utf-8"
         res = detail.text
-        doc = BeautifulSoup(res, "lxml")
-        soups = doc.find_all('ul', class_="main-header")
+        soups = find_all(res, 'ul', 'main-header')
 
         for soup in soups:
             vods = soup.find_all('li')
@@ -145,12 +102,10 @@ class Spider(Spider):
     def homeVideoContent(self):
         videos = []
 
-        detail = requests.get(url=xurl, headers=headerx)
+        detail = http_client.get(url=xurl, headers=headerx)
         detail.encoding = "utf-8"
         res = detail.text
-        doc = BeautifulSoup(res, "lxml")
-
-        soups = doc.find_all('article', class_="item movies")
+        soups = find_all(res, 'article', 'item movies')
 
         for vod in soups:
 
@@ -183,12 +138,10 @@ class Spider(Spider):
 
             if '@' in cid:
                 fenge = cid.split("@")
-                detail = requests.get(url=fenge[0], headers=headerx)
+                detail = http_client.get(url=fenge[0], headers=headerx)
                 detail.encoding = "utf-8"
                 res = detail.text
-                doc = BeautifulSoup(res, "lxml")
-
-                soups = doc.find_all('div', class_="se-c")
+                soups = find_all(res, 'div', 'se-c')
 
                 for vod in soups:
 
@@ -214,12 +167,10 @@ class Spider(Spider):
                     page = 1
 
                 url = f'{cid}/page/{str(page)}'
-                detail = requests.get(url=url, headers=headerx)
+                detail = http_client.get(url=url, headers=headerx)
                 detail.encoding = "utf-8"
                 res = detail.text
-                doc = BeautifulSoup(res, "lxml")
-
-                soups = doc.find_all('article', class_="item tvshows")
+                soups = find_all(res, 'article', 'item tvshows')
 
                 for vod in soups:
                     name = vod.find('img')['alt']
@@ -247,12 +198,10 @@ class Spider(Spider):
                 page = 1
 
             url = f'{cid}/page/{str(page)}'
-            detail = requests.get(url=url, headers=headerx)
+            detail = http_client.get(url=url, headers=headerx)
             detail.encoding = "utf-8"
             res = detail.text
-            doc = BeautifulSoup(res, "lxml")
-
-            soups = doc.find_all('div', class_="animation-2")
+            soups = find_all(res, 'div', 'animation-2')
 
             for item in soups:
                 vods = item.find_all('article')
@@ -288,21 +237,24 @@ class Spider(Spider):
         result['total'] = 999
         result['limit'] = len(videos)
 
+        self.details.prefetch_videos(videos)
         return result
 
     def detailContent(self, ids):
-        did = ids[0]
+        detail = self.details.get(ids[0])
+        self.lines.warm_detail(detail)
+        return detail
+
+    def load_detail(self, did):
         result = {}
         videos = []
         xianlu = ''
         bofang = ''
 
         if 'movies' not in did:
-            res = requests.get(url=did, headers=headerx)
+            res = http_client.get(url=did, headers=headerx)
             res.encoding = "utf-8"
             res = res.text
-            doc = BeautifulSoup(res, "lxml")
-
             content = '剧情介绍' + self.extract_middle_text(res,'<meta name="description" content="','"', 0)
 
             postid = self.extract_middle_text(res, 'postid:', ',', 0)
@@ -322,11 +274,9 @@ class Spider(Spider):
             xianlu = '4K影院'
 
         else:
-            res = requests.get(url=did, headers=headerx)
+            res = http_client.get(url=did, headers=headerx)
             res.encoding = "utf-8"
             res = res.text
-            doc = BeautifulSoup(res, "lxml")
-
             content = '剧情介绍' + self.extract_middle_text(res, '<meta name="description" content="', '"', 0)
 
             bofang = self.extract_middle_text(res, "data-postid='", "'", 0)
@@ -343,12 +293,19 @@ class Spider(Spider):
         return result
 
     def playerContent(self, flag, id, vipFlags):
+        result = {}
+        result["parse"] = 0
+        result["playUrl"] = ''
+        result["url"] = self.lines.get(id)
+        result["header"] = headerx
+        return result
 
+    def resolve_play(self, id):
         if '@' in id:
             fenge = id.split("@")
 
             url = f'{xurl}/artplayer?id={fenge[1]}&source=0&ep={fenge[0]}'
-            detail = requests.get(url=url, headers=headerx)
+            detail = http_client.get(url=url, headers=headerx)
             detail.encoding = "utf-8"
             res = detail.text
 
@@ -366,12 +323,12 @@ class Spider(Spider):
                 "source": source
                       }
 
-            response = requests.post(url=source, headers=headerx, json=payload)
+            response = http_client.post(url=source, headers=headerx, json=payload)
             response_data = json.loads(response.text)
             url = response_data['url']
         else:
             url = f'{xurl}/artplayer?mvsource=0&id={id}&type=hls'
-            detail = requests.get(url=url, headers=headerx)
+            detail = http_client.get(url=url, headers=headerx)
             detail.encoding = "utf-8"
             res = detail.text
 
@@ -389,28 +346,21 @@ class Spider(Spider):
                 "source": source
                       }
 
-            response = requests.post(url=source, headers=headerx, json=payload)
+            response = http_client.post(url=source, headers=headerx, json=payload)
             response_data = json.loads(response.text)
             url = response_data['url']
 
-        result = {}
-        result["parse"] = 0
-        result["playUrl"] = ''
-        result["url"] = url
-        result["header"] = headerx
-        return result
+        return url
 
     def searchContentPage(self, key, quick, pg):
         result = {}
         videos = []
 
         url = f'{xurl}/xssearch?s={key}'
-        detail = requests.get(url=url, headers=headerx)
+        detail = http_client.get(url=url, headers=headerx)
         detail.encoding = "utf-8"
         res = detail.text
-        doc = BeautifulSoup(res, "lxml")
-
-        soups = doc.find_all('div', class_="result-item")
+        soups = find_all(res, 'div', 'result-item')
 
         for vod in soups:
             ids = vod.find('div', class_="title")
@@ -453,6 +403,7 @@ class Spider(Spider):
         result['pagecount'] = 1
         result['limit'] = 90
         result['total'] = 999999
+        self.details.prefetch_videos(videos)
         return result
 
     def searchContent(self, key, quick, pg="1"):
@@ -0,0 +1 @@
+"""py目录下爬虫/解析器共用的辅助模块"""
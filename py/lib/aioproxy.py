@@ -0,0 +1,264 @@
+"""
+asyncio代理内核
+
+在一个后台线程中运行事件循环，使用 aiohttp + aiohttp_socks 访问上游，
+每个SOCKS5代理地址对应一个独立的连接池。对外提供与 requests.Session.get
+相近的同步接口，返回的响应对象支持 status_code / headers / text / content /
+iter_content / close，解析器可以在同步与异步实现之间直接切换。
+
+流式读取时由事件循环中的协程预读分块放进队列，调用线程只从队列取块，
+每消费半个窗口才通知一次事件循环补充额度，而不是每块都同步往返一次。
+
+宿主按请求在自己的线程里调用 proxy()，这部分线程由宿主决定；
+解析器自己在后台发起的请求（如分片预取）可用 read() 协程经 submit() 交给事件循环，
+全部在同一个线程里并发完成，不再各占一个工作线程。
+"""
+import asyncio
+import concurrent.futures
+import queue
+import threading
+from typing import Dict, Iterator, Optional, Tuple
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+try:
+    import aiohttp
+    from aiohttp_socks import ProxyConnectionError, ProxyConnector, ProxyError, ProxyTimeoutError
+except ImportError:  # 未安装时由调用方回退到同步实现
+    aiohttp = None
+    ProxyConnector = None
+
+_TIMEOUT_ERRORS = (asyncio.TimeoutError, concurrent.futures.TimeoutError, TimeoutError)
+
+
+def _requests_error(e: BaseException) -> BaseException:
+    """超时与 aiohttp / SOCKS 代理连接错误转换为 requests 对应的异常，其余异常原样返回"""
+    if isinstance(e, _TIMEOUT_ERRORS + (ProxyTimeoutError,)):
+        return requests.exceptions.Timeout(str(e))
+    if isinstance(e, (aiohttp.ClientError, ProxyConnectionError, ProxyError)):
+        return requests.exceptions.ConnectionError(str(e))
+    return e
+
+
+class AsyncResponse:
+    """异步响应的同步包装，接口与 requests.Response 的常用部分一致"""
+
+    def __init__(self, engine: 'AsyncProxyEngine', response, body: Optional[bytes] = None):
+        self._engine = engine
+        self._response = response
+        self._body = body
+        self.status_code = response.status
+        self.headers = CaseInsensitiveDict(response.headers)
+        self.encoding = response.charset
+        self._pump = None
+
+    @property
+    def content(self) -> bytes:
+        if self._body is None:
+            try:
+                self._body = self._engine.call(self._response.read(), self._engine.read_timeout)
+            finally:
+                self.close()
+        return self._body
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+    def iter_content(self, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """逐块读取响应体，分块由事件循环预读后经队列交给调用线程"""
+        if self._body is not None:
+            for i in range(0, len(self._body), chunk_size):
+                yield self._body[i:i + chunk_size]
+            return
+        self._pump = _ChunkPump(self._engine, self._response, chunk_size)
+        try:
+            yield from self._pump
+        finally:
+            self.close()
+
+    def close(self):
+        if self._pump is not None:
+            self._pump.cancel()
+        if self._response is not None and not self._response.closed:
+            self._engine.run(self._release())
+
+    async def _release(self):
+        self._response.release()
+
+
+class _ChunkPump:
+    """
+    事件循环中的预读协程 + 线程安全队列
+    最多预读 window 块；调用线程每取走 window // 2 块才补充一次额度
+    """
+
+    def __init__(self, engine: 'AsyncProxyEngine', response, chunk_size: int, window: int = 8):
+        self._loop = engine._loop
+        self._queue = queue.Queue()
+        self._batch = max(1, window // 2)
+        self._read_timeout = engine.read_timeout
+        self._credits = None
+        self._future = asyncio.run_coroutine_threadsafe(self._run(response, chunk_size, window), self._loop)
+
+    async def _run(self, response, chunk_size, window):
+        self._credits = asyncio.Semaphore(window)
+        try:
+            while True:
+                await self._credits.acquire()
+                chunk = await response.content.read(chunk_size)
+                self._queue.put(chunk)
+                if not chunk:
+                    break
+        except asyncio.CancelledError:
+            self._queue.put(b'')
+            raise
+        except Exception as e:
+            self._queue.put(e)
+        finally:
+            response.release()
+
+    def _grant(self, count):
+        for _ in range(count):
+            self._credits.release()
+
+    def __iter__(self) -> Iterator[bytes]:
+        consumed = 0
+        while True:
+            try:
+                item = self._queue.get(timeout=self._read_timeout)
+            except queue.Empty:
+                raise requests.exceptions.Timeout("读取上游数据超时")
+            if isinstance(item, Exception):
+                error = _requests_error(item)
+                if error is item:
+                    raise requests.exceptions.ConnectionError(str(item))
+                raise error
+            if not item:
+                return
+            yield item
+            consumed += 1
+            if consumed >= self._batch:
+                self._loop.call_soon_threadsafe(self._grant, consumed)
+                consumed = 0
+
+    def cancel(self):
+        self._future.cancel()
+
+
+class AsyncProxyEngine:
+    """
+    按代理地址维护 aiohttp 会话的异步代理内核
+    read_timeout 为调用线程等待响应体（content 整体读取、流式读取的每一块）的上限
+    """
+
+    def __init__(self, pool_limit: int = 100, per_host_limit: int = 20, headers: Dict[str, str] = None,
+                 read_timeout: float = 30):
+        if aiohttp is None:
+            raise ImportError("异步代理内核需要安装 aiohttp 和 aiohttp_socks")
+        self.pool_limit = pool_limit
+        self.per_host_limit = per_host_limit
+        self.headers = headers or {}
+        self.read_timeout = read_timeout
+        self._sessions = {}
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name='aioproxy', daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def run(self, coro, timeout: float = None):
+        """在事件循环中执行协程并同步等待结果，超时时取消协程"""
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def call(self, coro, timeout: float = None):
+        """同 run，超时与连接错误转换为 requests 对应的异常"""
+        try:
+            return self.run(coro, timeout)
+        except Exception as e:
+            error = _requests_error(e)
+            if error is e:
+                raise
+            raise error from e
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """把协程交给事件循环执行，不等待结果"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def _session(self, proxy_url: str) -> 'aiohttp.ClientSession':
+        """获取代理对应的会话，不存在时创建（仅在事件循环线程中调用）"""
+        session = self._sessions.get(proxy_url)
+        if session is None or session.closed:
+            if proxy_url:
+                connector = ProxyConnector.from_url(
+                    proxy_url, limit=self.pool_limit, limit_per_host=self.per_host_limit, ssl=False
+                )
+            else:
+                connector = aiohttp.TCPConnector(
+                    limit=self.pool_limit, limit_per_host=self.per_host_limit, ssl=False
+                )
+            session = aiohttp.ClientSession(connector=connector, headers=self.headers, auto_decompress=False)
+            self._sessions[proxy_url] = session
+        return session
+
+    async def _get(self, url: str, proxy_url: str, timeout: float, stream: bool):
+        session = self._session(proxy_url)
+        client_timeout = aiohttp.ClientTimeout(total=None if stream else timeout,
+                                               sock_connect=timeout, sock_read=timeout)
+        response = await session.get(url, timeout=client_timeout)
+        if stream:
+            return response, None
+        try:
+            body = await response.read()
+        finally:
+            response.release()
+        return response, body
+
+    def get(self, url: str, proxies: Dict[str, str] = None, timeout: float = 5,
+            stream: bool = False, **kwargs) -> AsyncResponse:
+        """
+        同步接口：与 session.get(url, proxies=..., timeout=..., stream=...) 用法一致
+        超时与连接错误转换为 requests 对应的异常，调用方的错误处理无需修改
+        """
+        proxy_url = (proxies or {}).get('http', '')
+        response, body = self.call(self._get(url, proxy_url, timeout, stream), timeout + 1)
+        return AsyncResponse(self, response, body)
+
+    async def read(self, url: str, proxies: Dict[str, str] = None, timeout: float = 5,
+                   **kwargs) -> Tuple[int, bytes]:
+        """
+        协程接口：读取完整响应，返回 (状态码, 内容)，只能在本内核的事件循环中 await
+        超时与连接错误同样转换为 requests 对应的异常
+        """
+        proxy_url = (proxies or {}).get('http', '')
+        try:
+            response, body = await self._get(url, proxy_url, timeout, False)
+        except Exception as e:
+            error = _requests_error(e)
+            if error is e:
+                raise
+            raise error from e
+        return response.status, body
+
+    async def _close_all(self):
+        sessions, self._sessions = list(self._sessions.values()), {}
+        for session in sessions:
+            await session.close()
+
+    def close(self):
+        """关闭所有连接池并停止事件循环"""
+        if not self._loop.is_running():
+            return
+        try:
+            self.run(self._close_all(), timeout=5)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
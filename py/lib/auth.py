@@ -0,0 +1,128 @@
+"""
+登录令牌管理
+
+部分爬虫在模块导入时就同步登录拿 token：加载站点列表就要多一次网络往返，
+登录接口挂掉时整个爬虫加载失败，而且 token 之后再也不刷新。
+TokenManager 改为首次使用时才登录：
+  - token 连同过期时间经宿主 setCache 持久化，重启后直接复用
+  - 临近过期（refresh_ahead 秒内）时后台刷新，期间继续用旧 token
+  - 请求返回 401 时重新登录并重试一次
+"""
+import base64
+import json
+import logging
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def jwt_expiry(token: str) -> Optional[float]:
+    """token 为JWT时取其 exp，否则返回None"""
+    parts = token.split('.')
+    if len(parts) != 3:
+        return None
+    try:
+        payload = parts[1] + '=' * (-len(parts[1]) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get('exp')
+        return float(exp) if exp else None
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+class TokenManager:
+    """
+    login() 返回 (token, 过期时间戳或None)；过期时间未知时先看JWT的exp，再退回 default_ttl
+    load()/store(text) 对接宿主缓存，缺省时只保存在内存
+    """
+
+    def __init__(self, login: Callable[[], Tuple[str, Optional[float]]],
+                 load: Optional[Callable[[], Optional[str]]] = None,
+                 store: Optional[Callable[[str], None]] = None,
+                 default_ttl: float = 24 * 3600, refresh_ahead: float = 600):
+        self.login = login
+        self.load = load
+        self.store = store
+        self.default_ttl = default_ttl
+        self.refresh_ahead = refresh_ahead
+        self.value = None
+        self.expires_at = 0.0
+        self.lock = threading.Lock()
+        self.refreshing = False
+        self.loaded = False
+
+    def _restore(self):
+        """从宿主缓存恢复，只在首次取用时做一次"""
+        self.loaded = True
+        if self.load is None:
+            return
+        try:
+            raw = self.load()
+            if raw:
+                entry = json.loads(raw) if isinstance(raw, str) else raw
+                if entry.get('expires_at', 0) > time.time():
+                    self.value = entry['token']
+                    self.expires_at = entry['expires_at']
+        except Exception as e:
+            logger.warning(f"读取缓存的登录令牌失败: {e}")
+
+    def _login(self):
+        token, expires_at = self.login()
+        if not expires_at:
+            expires_at = jwt_expiry(token) or time.time() + self.default_ttl
+        self.value = token
+        self.expires_at = expires_at
+        if self.store is not None:
+            try:
+                self.store(json.dumps({'token': token, 'expires_at': expires_at}))
+            except Exception as e:
+                logger.warning(f"保存登录令牌失败: {e}")
+
+    def _refresh_async(self):
+        with self.lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
+
+        def run():
+            try:
+                with self.lock:
+                    self._login()
+            except Exception as e:
+                logger.warning(f"后台刷新登录令牌失败: {e}")
+            finally:
+                with self.lock:
+                    self.refreshing = False
+
+        threading.Thread(target=run, name='token-refresh', daemon=True).start()
+
+    def token(self) -> str:
+        now = time.time()
+        if self.value and now < self.expires_at - self.refresh_ahead:
+            return self.value
+        with self.lock:
+            if not self.loaded:
+                self._restore()
+            if not self.value or time.time() >= self.expires_at:
+                self._login()
+                return self.value
+            token = self.value
+        if time.time() >= self.expires_at - self.refresh_ahead:
+            self._refresh_async()
+        return token
+
+    def renew(self, rejected: str) -> str:
+        """服务端拒绝了 rejected 时重新登录；其他线程已换过新 token 则直接用新的"""
+        with self.lock:
+            if self.value == rejected:
+                self._login()
+            return self.value
+
+    def call(self, send: Callable[[str], object]):
+        """send(token) 发出请求；返回 401 时换 token 重试一次"""
+        token = self.token()
+        response = send(token)
+        if getattr(response, 'status_code', None) == 401:
+            response = send(self.renew(token))
+        return response
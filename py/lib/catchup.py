@@ -0,0 +1,187 @@
+"""
+回看(catch-up)时间解析
+
+时间表达式语法（按表达式字符串编译一次并缓存）：
+
+    ${(b)}  ${(e)}                    当前时间的13位毫秒时间戳
+    ${(b10)}  ${(e10)}                当前时间的10位秒级时间戳
+    ${(b)FORMAT}  ${(b)FORMAT|TZ}     酷九/TiviMate写法，按FORMAT格式化
+    ${(FORMAT)}  ${(FORMAT|TZ)}       旧写法，FORMAT可带b/e前缀
+    其他字符串                         原样返回
+
+    FORMAT 由 yyyy MM dd HH mm ss SSS 与任意分隔字符组成
+    TZ     为时区名（Asia/Shanghai、UTC...）或 UTC+8 / GMT+08:00 / +0800 形式的偏移，
+           缺省使用本机时间，无法识别的时区按东八区处理
+
+节目单时间语法：
+
+    [[yyyy-]MM-dd ]HH:mm[:ss]  或  yyyyMMddHHmmss
+    缺少年份取当年，缺少日期取当天
+"""
+import re
+import time
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Optional, Tuple
+
+PLAYSEEK_FORMAT = '%Y%m%d%H%M%S'
+
+_TOKENS = re.compile(r'yyyy|MM|dd|HH|mm|ss|SSS')
+_TOKEN_MAP = {'yyyy': '%Y', 'MM': '%m', 'dd': '%d', 'HH': '%H', 'mm': '%M', 'ss': '%S'}
+_MARKER_FORM = re.compile(r'\((b|e)(10)?\)(.*)', re.S)
+_OFFSET = re.compile(r'(?:UTC|GMT)?\s*([+-])(\d{1,2})(?::?(\d{2}))?$', re.I)
+_TZ_OFFSETS = {
+    'Asia/Shanghai': 8, 'Asia/Chongqing': 8, 'Asia/Hong_Kong': 8, 'Asia/Taipei': 8,
+    'UTC': 0, 'GMT': 0, 'Z': 0,
+    'US/Eastern': -5, 'US/Pacific': -8,
+    'Europe/London': 0, 'Europe/Paris': 1,
+    'Asia/Tokyo': 9, 'Australia/Sydney': 10,
+}
+_DEFAULT_TZ = timezone(timedelta(hours=8))
+
+_PROGRAM_TIME = re.compile(
+    r'(?:(?:(\d{4})-)?(\d{1,2})-(\d{1,2})[ T]+)?(\d{1,2}):(\d{2})(?::(\d{2}))?'
+)
+_COMPACT_TIME = re.compile(r'(\d{4})(\d{2})(\d{2})(\d{2})(\d{2})(\d{2})')
+
+
+def parse_timezone(name: str) -> timezone:
+    """解析时区名称或偏移量"""
+    name = name.strip()
+    if name in _TZ_OFFSETS:
+        return timezone(timedelta(hours=_TZ_OFFSETS[name]))
+    match = _OFFSET.match(name)
+    if match:
+        sign = -1 if match.group(1) == '-' else 1
+        hours = int(match.group(2))
+        minutes = int(match.group(3) or 0)
+        return timezone(sign * timedelta(hours=hours, minutes=minutes))
+    return _DEFAULT_TZ
+
+
+def _compile_format(pattern: str) -> Tuple[str, ...]:
+    """
+    把 yyyyMMddHHmmss 风格的格式转换为 strftime 格式
+    strftime 没有毫秒，格式在每个 SSS 处断开，渲染时各段之间填入毫秒
+    """
+    segments = [[]]
+    last = 0
+    for match in _TOKENS.finditer(pattern):
+        segments[-1].append(pattern[last:match.start()].replace('%', '%%'))
+        if match.group(0) == 'SSS':
+            segments.append([])
+        else:
+            segments[-1].append(_TOKEN_MAP[match.group(0)])
+        last = match.end()
+    segments[-1].append(pattern[last:].replace('%', '%%'))
+    return tuple(''.join(segment) for segment in segments)
+
+
+class TimeExpression:
+    """编译后的时间表达式，render() 按当前时间生成结果"""
+
+    __slots__ = ('source', 'kind', 'segments', 'tz')
+
+    def __init__(self, source: str, kind: str, segments: Tuple[str, ...] = ('',), tz: Optional[timezone] = None):
+        self.source = source
+        self.kind = kind            # literal / epoch_ms / epoch_s / format
+        self.segments = segments    # 以 SSS 断开的 strftime 格式
+        self.tz = tz
+
+    def render(self, now: Optional[float] = None) -> str:
+        if self.kind == 'literal':
+            return self.source
+        now = time.time() if now is None else now
+        if self.kind == 'epoch_ms':
+            return str(int(now * 1000))
+        if self.kind == 'epoch_s':
+            return str(int(now))
+        dt = datetime.fromtimestamp(now, self.tz) if self.tz else datetime.fromtimestamp(now)
+        if len(self.segments) == 1:
+            return dt.strftime(self.segments[0])
+        return f"{dt.microsecond // 1000:03d}".join(dt.strftime(segment) for segment in self.segments)
+
+
+def _format_expression(source: str, body: str) -> TimeExpression:
+    if '|' in body:
+        pattern, tz_name = body.split('|', 1)
+        tz = parse_timezone(tz_name)
+    else:
+        pattern, tz = body, None
+    return TimeExpression(source, 'format', _compile_format(pattern), tz)
+
+
+@lru_cache(maxsize=256)
+def compile_time_expression(expr: str) -> TimeExpression:
+    """编译时间表达式，相同字符串只编译一次"""
+    source = expr.strip()
+    if not (source.startswith('${') and source.endswith('}')):
+        return TimeExpression(source, 'literal')
+    inner = source[2:-1]
+
+    match = _MARKER_FORM.fullmatch(inner)
+    if match:
+        seconds, rest = match.group(2), match.group(3)
+        if not rest:
+            return TimeExpression(source, 'epoch_s' if seconds else 'epoch_ms')
+        return _format_expression(source, rest)
+
+    if inner.startswith('(') and inner.endswith(')'):
+        body = inner[1:-1]
+        head = body.split('|', 1)[0]
+        if head in ('b', 'e'):
+            return TimeExpression(source, 'epoch_ms')
+        if head in ('b10', 'e10'):
+            return TimeExpression(source, 'epoch_s')
+        if body[:1] in ('b', 'e') and len(head) > 1:
+            body = body[1:]
+        return _format_expression(source, body)
+
+    return TimeExpression(source, 'literal')
+
+
+def split_range(playseek_expr: str):
+    """拆分 开始-结束，表达式内部的'-'（如 yyyy-MM-dd）不作为分隔符"""
+    if '}-' in playseek_expr:
+        start_expr, end_expr = playseek_expr.split('}-', 1)
+        return start_expr + '}', end_expr
+    return playseek_expr.split('-', 1)
+
+
+def render_playseek(playseek_expr: str, now: Optional[float] = None) -> str:
+    """把 开始表达式-结束表达式 渲染为具体的回看参数"""
+    if not playseek_expr or '-' not in playseek_expr:
+        return playseek_expr
+    start_expr, end_expr = split_range(playseek_expr)
+    now = time.time() if now is None else now
+    return f"{compile_time_expression(start_expr).render(now)}-{compile_time_expression(end_expr).render(now)}"
+
+
+def parse_program_time(text: str, today: date) -> datetime:
+    """按节目单时间语法解析，无法识别时抛出ValueError（不能返回当前时间，结果会被缓存）"""
+    text = text.strip()
+    match = _COMPACT_TIME.fullmatch(text)
+    if match:
+        return datetime(*map(int, match.groups()))
+    match = _PROGRAM_TIME.fullmatch(text)
+    if not match:
+        raise ValueError(f"无法识别的节目时间: {text!r}")
+    year, month, day, hour, minute, second = match.groups()
+    if month is None:
+        year, month, day = today.year, today.month, today.day
+    return datetime(int(year or today.year), int(month), int(day), int(hour), int(minute), int(second or 0))
+
+
+@lru_cache(maxsize=256)
+def _convert_program_time(start_time: str, end_time: str, today: date) -> str:
+    start_dt = parse_program_time(start_time, today)
+    end_dt = parse_program_time(end_time, today)
+    return f"{start_dt.strftime(PLAYSEEK_FORMAT)}-{end_dt.strftime(PLAYSEEK_FORMAT)}"
+
+
+def convert_program_time(start_time: str, end_time: str) -> str:
+    """
+    节目单开始/结束时间转换为 yyyyMMddHHmmss-yyyyMMddHHmmss，结果按当天缓存
+    无法解析时抛出ValueError，由调用方决定回退方式（回退值不进缓存）
+    """
+    return _convert_program_time(start_time.strip(), end_time.strip(), date.today())
@@ -0,0 +1,137 @@
+"""
+HTML/文本片段提取
+
+各爬虫原先各自复制了一份 extract_middle_text：pl=3 模式每找到一段就
+text.replace(start + middle + end, '') 复制整页，集数多的详情页是 O(n²)。
+这里通常只向前扫描一遍（删除会改变后续查找的少数页面仍按原做法），
+正则按模式串编译后缓存，输出与原实现完全相同：
+  pl=0  首段中间文本，去掉反斜杠
+  pl=1  首段内正则匹配结果，空格连接
+  pl=2  首段内正则匹配结果，$$$ 连接
+  pl=3  每段内 (地址, 名称) 匹配拼成 名称$<名称中的集数><地址>，段内 # 连接、段间 $$$ 连接
+"""
+import re
+from functools import lru_cache
+from typing import List, Optional
+
+_NUMBER = re.compile(r'(?:^|[^0-9])(\d+)(?:[^0-9]|$)')
+
+
+@lru_cache(maxsize=256)
+def compile_pattern(pattern: str):
+    return re.compile(pattern)
+
+
+@lru_cache(maxsize=256)
+def _scan_guard(start_str: str, end_str: str):
+    """
+    单次扫描的前提：起止串非空，结束串没有自重叠（如 </ul>）
+    返回起止串的非空真前缀及其末字符，用来检查段前的文字；不满足前提时返回None
+    """
+    if not start_str or not end_str or any(end_str[:i] == end_str[-i:] for i in range(1, len(end_str))):
+        return None
+    prefixes = frozenset(p[:i] for p in (start_str, end_str) for i in range(1, len(p)))
+    return prefixes, frozenset(prefix[-1] for prefix in prefixes), max(len(start_str), len(end_str))
+
+
+def _scan_blocks(text: str, start_str: str, end_str: str) -> Optional[List[str]]:
+    """
+    向前扫描一遍取出各段；原做法逐段删除后会改变后续查找的情形返回None：
+      - 起始串还出现在段内（包括与起止串重叠的位置），删除时会连带删掉别的内容
+      - 段前紧挨着起始串或结束串的前缀，删除后拼接处可能拼出新的起止串
+    """
+    guard = _scan_guard(start_str, end_str)
+    if guard is None:
+        return None
+    prefixes, last_chars, longest = guard
+    find = text.find
+    start_len = len(start_str)
+    end_len = len(end_str)
+    blocks = []
+    pos = 0
+    while True:
+        start_index = find(start_str, pos)
+        if start_index == -1:
+            break
+        end_index = find(end_str, start_index + start_len)
+        if end_index == -1:
+            break
+        pos = end_index + end_len
+        if find(start_str, start_index + 1, pos + start_len - 1) != -1:
+            return None
+        if start_index and text[start_index - 1] in last_chars:
+            before = text[max(0, start_index - longest + 1):start_index]
+            if any(before[-i:] in prefixes for i in range(1, len(before) + 1)):
+                return None
+        blocks.append(text[start_index + start_len:end_index])
+    return blocks
+
+
+def _replace_blocks(text: str, start_str: str, end_str: str) -> List[str]:
+    """原各爬虫的做法：每取出一段就把页面中所有相同的 起始串+段+结束串 删掉"""
+    blocks = []
+    while True:
+        start_index = text.find(start_str)
+        if start_index == -1:
+            break
+        end_index = text.find(end_str, start_index + len(start_str))
+        if end_index == -1:
+            break
+        middle_text = text[start_index + len(start_str):end_index]
+        blocks.append(middle_text)
+        text = text.replace(start_str + middle_text + end_str, '')
+    return blocks
+
+
+def iter_blocks(text: str, start_str: str, end_str: str) -> List[str]:
+    """
+    依次取出所有 start_str...end_str 之间的文本，结果与原先逐段 replace 删除的做法完全一致
+    常见页面向前扫描一遍，内容相同的段只保留第一次出现（即 replace 删掉的那些）；
+    段相互嵌套或拼接处可能拼出新起止串的页面（见 _scan_blocks）退回原做法
+    """
+    blocks = _scan_blocks(text, start_str, end_str)
+    if blocks is None:
+        return _replace_blocks(text, start_str, end_str)
+    return list(dict.fromkeys(blocks))
+
+
+def build_playlist(blocks: List[str], pattern: str, base_url: str = '') -> str:
+    """把各播放线路段拼成 名称$地址#...$$$... 形式，相对地址补上 base_url"""
+    regex = compile_pattern(pattern)
+    number = _NUMBER.search
+    lines = []
+    for block in blocks:
+        episodes = []
+        for match in regex.findall(block):
+            match3 = number(match[1])
+            prefix = '' if 'http' in match[0] else base_url
+            episodes.append(f"{match[1]}${match3.group(1) if match3 else 0}{prefix}{match[0]}")
+        lines.append('#'.join(episodes))
+    return '$$$'.join(lines)
+
+
+def extract_middle_text(text: str, start_str: str, end_str: str, pl: int,
+                        start_index1: str = '', end_index2: str = '', base_url: str = '') -> Optional[str]:
+    """与各爬虫原 extract_middle_text 同参同结果；base_url 对应原实现中引用的模块级 xurl"""
+    if pl == 3:
+        blocks = iter_blocks(text, start_str, end_str)
+        if not blocks:
+            return ""
+        return build_playlist(blocks, start_index1, base_url)
+
+    start_index = text.find(start_str)
+    if start_index == -1:
+        return ""
+    end_index = text.find(end_str, start_index + len(start_str))
+    if end_index == -1:
+        return ""
+    middle_text = text[start_index + len(start_str):end_index]
+
+    if pl == 0:
+        return middle_text.replace("\\", "")
+
+    if pl == 1 or pl == 2:
+        matches = compile_pattern(start_index1).findall(middle_text)
+        if matches:
+            return (' ' if pl == 1 else '$$$').join(matches)
+    return None
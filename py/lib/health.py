@@ -0,0 +1,186 @@
+"""
+代理健康监测
+
+每个解析器只启动一个后台线程，定期经由各代理探测其最近一次播放的地址，
+结合真实请求的结果维护滚动的延迟与错误率评分。proxy 根据评分快速失败，
+或在多个代理之间选择更健康的一个。
+连续失败熔断后每隔 retry_after 秒放行一次试探请求（半开），成功即恢复，
+只有一个代理时也不必等下一轮后台探测。
+连续 idle_intervals 轮没有真实请求的代理不再探测并移出监测，没有要探测的代理时后台线程退出。
+"""
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, Optional
+
+
+class ProxyHealth:
+    """单个代理的滚动统计"""
+
+    def __init__(self, window: int):
+        self.samples = deque(maxlen=window)  # (成功, 延迟秒)
+        self.probe_url = ''
+        self.consecutive_failures = 0
+        self.last_checked = 0.0
+        self.last_used = time.time()  # 最近一次登记或真实请求，探测不算
+        self.trial_at = 0.0
+
+    def add(self, ok: bool, latency: float):
+        self.samples.append((ok, latency))
+        self.consecutive_failures = 0 if ok else self.consecutive_failures + 1
+        self.last_checked = time.time()
+        if not ok:
+            self.trial_at = self.last_checked  # 试探请求从最近一次失败起算
+
+    @property
+    def error_rate(self) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(1 for ok, _ in self.samples if not ok) / len(self.samples)
+
+    @property
+    def latency(self) -> float:
+        latencies = [latency for ok, latency in self.samples if ok]
+        return sum(latencies) / len(latencies) if latencies else 0.0
+
+
+class ProxyHealthMonitor:
+    """
+    后台代理健康监测器
+    probe(proxy_url, url) 经由代理探测url并返回HTTP状态码，抛出异常或状态码不是2xx/3xx视为失败
+    """
+
+    def __init__(self, probe: Callable[[str, str], Optional[int]], interval: float = 30.0, window: int = 10,
+                 max_failures: int = 3, retry_after: float = 5.0, idle_intervals: int = 10, logger=None):
+        self.probe = probe
+        self.interval = interval
+        self.window = window
+        self.max_failures = max_failures
+        self.retry_after = retry_after
+        self.idle_intervals = idle_intervals
+        self.logger = logger
+        self._health = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def register(self, proxy_url: str, probe_url: str):
+        """登记需要监测的代理及探测地址，首次登记时启动后台线程"""
+        with self._lock:
+            health = self._health.get(proxy_url)
+            if health is None:
+                health = self._health[proxy_url] = ProxyHealth(self.window)
+            health.probe_url = probe_url
+            health.last_used = time.time()
+            if self._thread is None:
+                # 每个线程有自己的停止事件，stop() 之后可以重新启动
+                self._stop = threading.Event()
+                self._thread = threading.Thread(target=self._run, args=(self._stop,),
+                                                name='proxy-health', daemon=True)
+                self._thread.start()
+
+    def unregister(self, proxy_url: str):
+        """停止监测代理并丢弃它的统计"""
+        with self._lock:
+            self._health.pop(proxy_url, None)
+
+    def record(self, proxy_url: str, ok: bool, latency: float = 0.0, probe: bool = False):
+        """记录一次真实请求或探测（probe=True）的结果，探测不算作代理仍在使用"""
+        with self._lock:
+            health = self._health.get(proxy_url)
+            if health is None:
+                if probe:  # 探测期间已被移出监测
+                    return
+                health = self._health[proxy_url] = ProxyHealth(self.window)
+            health.add(ok, latency)
+            if not probe:
+                health.last_used = health.last_checked
+
+    def is_available(self, proxy_url: str) -> bool:
+        """
+        连续失败达到上限的代理视为不可用，未知代理视为可用
+        熔断期间每 retry_after 秒放行一个试探请求，其结果经 record 决定是否恢复
+        """
+        with self._lock:
+            health = self._health.get(proxy_url)
+            if health is None or health.consecutive_failures < self.max_failures:
+                return True
+            now = time.time()
+            if now - health.trial_at >= self.retry_after:
+                health.trial_at = now
+                return True
+            return False
+
+    def is_tripped(self, proxy_url: str) -> bool:
+        """是否处于熔断状态（只查询，不占用试探名额）"""
+        with self._lock:
+            health = self._health.get(proxy_url)
+            return health is not None and health.consecutive_failures >= self.max_failures
+
+    def score(self, proxy_url: str) -> float:
+        """评分越低越好：平均延迟按错误率放大，不可用的代理为无穷大"""
+        with self._lock:
+            health = self._health.get(proxy_url)
+            if health is None:
+                return 0.0
+            if health.consecutive_failures >= self.max_failures:
+                return float('inf')
+            return (health.latency or 0.001) * (1 + 4 * health.error_rate)
+
+    def best(self, candidates: Iterable[str]) -> Optional[str]:
+        """从候选代理中选出评分最低的一个"""
+        candidates = list(candidates)
+        if not candidates:
+            return None
+        return min(candidates, key=self.score)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                proxy_url: {
+                    'latency': round(health.latency, 3),
+                    'error_rate': round(health.error_rate, 2),
+                    'consecutive_failures': health.consecutive_failures,
+                }
+                for proxy_url, health in self._health.items()
+            }
+
+    def _run(self, stop: threading.Event):
+        while not stop.is_set():
+            with self._lock:
+                idle_before = time.time() - self.idle_intervals * self.interval
+                for proxy_url in [proxy_url for proxy_url, health in self._health.items()
+                                  if health.last_used < idle_before]:
+                    del self._health[proxy_url]
+                targets = [(proxy_url, health.probe_url) for proxy_url, health in self._health.items()
+                           if health.probe_url]
+                if not targets:
+                    # 没有要探测的代理，线程退出，下次 register 时重新启动
+                    if self._stop is stop:
+                        self._thread = None
+                    return
+            for proxy_url, probe_url in targets:
+                if stop.is_set():
+                    return
+                self.check(proxy_url, probe_url)
+            stop.wait(self.interval)
+
+    def check(self, proxy_url: str, probe_url: str) -> bool:
+        """立即探测一次并记录结果"""
+        start = time.time()
+        try:
+            status = self.probe(proxy_url, probe_url)
+            ok = status is None or 200 <= status < 400
+            if not ok and self.logger:
+                self.logger.debug(f"代理探测失败 {proxy_url}: HTTP {status}")
+        except Exception as e:
+            ok = False
+            if self.logger:
+                self.logger.debug(f"代理探测失败 {proxy_url}: {e}")
+        self.record(proxy_url, ok, time.time() - start, probe=True)
+        return ok
+
+    def stop(self):
+        with self._lock:
+            self._stop.set()
+            self._thread = None
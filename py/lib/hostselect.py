@@ -0,0 +1,154 @@
+"""
+多域名站点的最快主机选择
+
+部分爬虫在 init 里给每个候选域名开一个线程 HEAD 测速，全部返回后才选出最快的，
+有的还要先同步拉一次动态域名列表：每次启动都要等这一轮探测才能出内容。
+HostSelector 把候选列表、测速表和选中的主机存进磁盘缓存（与列表缓存同一个 SQLite）：
+  - 缓存未过期：直接用缓存的主机，不探测
+  - 过期：先用缓存的主机，后台重新拉列表并测速
+  - 没有缓存：同步探测一次
+  - 请求出错时 failover() 切到测速表中次快的主机，并在后台重新测速
+
+    self.hosts = HostSelector('jpys', candidates=hosts)
+    self.host = self.hosts.select()
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+from lib.httpclient import get_client
+from lib.listcache import get_cache
+
+logger = logging.getLogger(__name__)
+
+UNREACHABLE = float('inf')
+
+# 所有站点共用的测速线程池，只在测速时才起线程
+_probe_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='host-probe')
+
+
+def split_hosts(url_list) -> List[str]:
+    """逗号分隔的字符串或列表 -> 去空、去重后的主机列表"""
+    if isinstance(url_list, str):
+        url_list = url_list.split(',')
+    hosts = []
+    for url in url_list or []:
+        url = url.strip()
+        if url and url not in hosts:
+            hosts.append(url)
+    return hosts
+
+
+def head_latency(url: str, timeout: float = 1.0) -> float:
+    """HEAD 一次的耗时（毫秒），失败为 inf；测速不重试，免得把失败算成慢"""
+    try:
+        start = time.time()
+        get_client('host-probe', retries=0).head(url, timeout=timeout).close()
+        return (time.time() - start) * 1000
+    except Exception:
+        return UNREACHABLE
+
+
+class HostSelector:
+    """
+    key 为缓存键名；candidates 为固定候选，discover() 返回动态候选（优先于 candidates）
+    ttl 为测速结果的有效期（秒）
+    """
+
+    def __init__(self, key: str, candidates: Iterable[str] = (), discover: Optional[Callable[[], Iterable[str]]] = None,
+                 ttl: float = 6 * 3600, probe_timeout: float = 1.0):
+        self.key = f"host:{key}"
+        self.candidates = split_hosts(candidates)
+        self.discover = discover
+        self.ttl = ttl
+        self.probe_timeout = probe_timeout
+        self.lock = threading.Lock()
+        self.probing = False
+        self.table: Dict[str, float] = {}
+        self.host = ''
+
+    def _load(self):
+        cache = get_cache()
+        entry = cache.get(self.key) if cache.available else None
+        if not entry:
+            return None, 0.0
+        return entry[0], entry[1]
+
+    def _save(self):
+        cache = get_cache()
+        if cache.available:
+            cache.put(self.key, {'host': self.host, 'table': self.table})
+
+    def _candidates(self) -> List[str]:
+        if self.discover is not None:
+            try:
+                hosts = split_hosts(self.discover())
+                if hosts:
+                    return hosts
+            except Exception as e:
+                logger.warning(f"获取动态域名失败 {self.key}: {e}")
+        return self.candidates or list(self.table)
+
+    def probe(self) -> Dict[str, float]:
+        """并发测速全部候选，更新测速表并选出最快的主机"""
+        hosts = self._candidates()
+        if len(hosts) <= 1:
+            table = {host: 0.0 for host in hosts}
+        else:
+            latencies = _probe_executor.map(lambda host: head_latency(host, self.probe_timeout), hosts)
+            table = dict(zip(hosts, latencies))
+        if not table:
+            return self.table
+        with self.lock:
+            self.table = table
+            self.host = min(table.items(), key=lambda item: item[1])[0]
+            self._save()
+        return table
+
+    def _probe_async(self):
+        with self.lock:
+            if self.probing:
+                return
+            self.probing = True
+
+        def run():
+            try:
+                self.probe()
+            except Exception as e:
+                logger.warning(f"后台测速失败 {self.key}: {e}")
+            finally:
+                with self.lock:
+                    self.probing = False
+
+        threading.Thread(target=run, name='host-reprobe', daemon=True).start()
+
+    def select(self) -> str:
+        """返回当前应使用的主机；缓存过期时后台重新测速"""
+        entry, stored = self._load()
+        # 配置里的固定候选改过后，不再沿用不在其中的旧主机
+        if entry and entry.get('host') and (self.discover or not self.candidates
+                                            or entry['host'] in self.candidates):
+            with self.lock:
+                self.host = entry['host']
+                self.table = entry.get('table') or {self.host: 0.0}
+            if time.time() - stored >= self.ttl:
+                self._probe_async()
+            return self.host
+        self.probe()
+        return self.host
+
+    def failover(self, failed: str) -> str:
+        """failed 请求出错：标记为不可达，切到次快的主机，并后台重新测速"""
+        with self.lock:
+            switched = failed == self.host
+            if switched:
+                self.table[failed] = UNREACHABLE
+                ranked = sorted(self.table.items(), key=lambda item: item[1])
+                self.host = next((host for host, latency in ranked if latency != UNREACHABLE), ranked[0][0])
+                self._save()
+            host = self.host
+        if switched:
+            self._probe_async()
+        return host
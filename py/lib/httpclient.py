@@ -0,0 +1,118 @@
+"""
+爬虫共用的HTTP客户端
+
+各站点爬虫原先直接调用模块级 requests.get/post：没有超时，站点卡死会一直挂住宿主；
+也没有会话，每次首页/分类/详情请求都要重新握手TCP+TLS。
+HttpClient 在一个 requests.Session 上按主机保持长连接，统一默认超时与有限重试
+（只重试连接失败和幂等请求的5xx/429），可选经 httpx 走 HTTP/2。
+
+爬虫里用 get_client() 取共享实例，接口与 requests.get/post 一致：
+    http_client = get_client()
+    detail = http_client.get(url=xurl, headers=headerx)
+"""
+import threading
+from http.cookiejar import DefaultCookiePolicy
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (连接超时, 读取超时)
+DEFAULT_TIMEOUT = (5, 15)
+RETRY_STATUS = (429, 500, 502, 503, 504)
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+
+
+def _create_retry(retries: int, backoff: float) -> Retry:
+    options = dict(total=retries, connect=retries, read=retries, status=retries,
+                   backoff_factor=backoff, status_forcelist=RETRY_STATUS, raise_on_status=False)
+    try:
+        return Retry(allowed_methods=IDEMPOTENT_METHODS, **options)
+    except TypeError:
+        # urllib3 < 1.26
+        return Retry(method_whitelist=IDEMPOTENT_METHODS, **options)
+
+
+class HttpClient:
+    """带连接池、默认超时与有限重试的HTTP客户端"""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, retries: int = 2, backoff: float = 0.3,
+                 pool_connections: int = 16, pool_maxsize: int = 16, http2: bool = False,
+                 keep_cookies: bool = False, headers: Optional[Dict[str, str]] = None):
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                              max_retries=_create_retry(retries, backoff))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if not keep_cookies:
+            # 与原先每次独立请求一致，不在站点之间携带Cookie
+            self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        if headers:
+            self.session.headers.update(headers)
+        self.h2 = self._create_h2_client(retries, pool_maxsize) if http2 else None
+
+    def _create_h2_client(self, retries, pool_maxsize):
+        """httpx 与 h2 都可用时启用HTTP/2，否则退回 requests"""
+        try:
+            import httpx
+            import h2  # noqa: F401
+        except ImportError:
+            return None
+        return httpx.Client(
+            http2=True,
+            transport=httpx.HTTPTransport(http2=True, retries=retries),
+            limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize),
+            headers=dict(self.session.headers),
+        )
+
+    def _h2_request(self, method, url, kwargs):
+        import httpx
+        timeout = kwargs.pop('timeout')
+        if isinstance(timeout, tuple):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        kwargs['follow_redirects'] = kwargs.pop('allow_redirects', method != 'HEAD')
+        return self.h2.request(method, url, timeout=timeout, **kwargs)
+
+    def request(self, method: str, url: str, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        method = method.upper()
+        # 流式读取、关闭证书校验、走代理的请求仍交给 requests
+        if self.h2 is not None and not ({'stream', 'verify', 'proxies', 'cert'} & kwargs.keys()):
+            return self._h2_request(method, url, kwargs)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs):
+        kwargs.setdefault('allow_redirects', True)
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, data=None, json=None, **kwargs):
+        return self.request('POST', url, data=data, json=json, **kwargs)
+
+    def head(self, url: str, **kwargs):
+        kwargs.setdefault('allow_redirects', False)
+        return self.request('HEAD', url, **kwargs)
+
+    def close(self):
+        self.session.close()
+        if self.h2 is not None:
+            self.h2.close()
+
+
+_clients: Dict[str, HttpClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(name: str = 'default', **options) -> HttpClient:
+    """
+    按名称取共享客户端，同一进程内所有爬虫复用连接池
+    options 只在该名称首次创建时生效
+    """
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = HttpClient(**options)
+    return client
@@ -0,0 +1,223 @@
+"""
+首页/分类列表的磁盘缓存
+
+分类页一小时只变几次，但 homeContent / homeVideoContent / categoryContent 每次导航都回源。
+cached_listing 把结果按 (爬虫文件, 站点配置, 方法, 参数) 存进宿主的 getCache/setCache，
+宿主不提供时存进 SQLite（ListingCache），进程重启后仍然有效：
+  - 未过期：直接返回
+  - 过期但仍在 stale 窗口内：先返回旧数据，后台线程刷新（同一键只刷新一次）
+  - 超出 stale 窗口或没有缓存：同步回源
+结果为空或回源出错时不写入。站点配置取爬虫的 host 与 extend 属性，同一爬虫配置不同站点时互不混用。
+
+爬虫里按方法声明TTL即可，ttl/stale 也可以是按参数返回秒数的函数：
+    @cached_listing(ttl=6 * 3600)
+    def homeContent(self, filter): ...
+"""
+import copy
+import json
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from typing import Any, Callable, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# 各方法默认TTL（秒）
+DEFAULT_TTLS = {
+    'homeContent': 6 * 3600,
+    'homeVideoContent': 30 * 60,
+    'categoryContent': 15 * 60,
+}
+DEFAULT_STALE = 24 * 3600
+
+
+class ListingCache:
+    """SQLite 键值表，值为JSON，记录写入时间；宿主不提供 getCache/setCache 时使用"""
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 5000, workers: int = 2):
+        self.path = path or os.environ.get('SPIDER_CACHE_DB') or os.path.join(
+            tempfile.gettempdir(), 'spider_listing.db')
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.refreshing = set()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='listing-refresh')
+        self.conn = self._connect()
+        self.writes = 0
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        try:
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS listing '
+                         '(key TEXT PRIMARY KEY, value TEXT NOT NULL, stored REAL NOT NULL)')
+            return conn
+        except sqlite3.Error as e:
+            logger.warning(f"列表缓存数据库不可用 {self.path}: {e}")
+            return None
+
+    @property
+    def available(self) -> bool:
+        return self.conn is not None
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """返回 (值, 写入时间)"""
+        with self.lock:
+            try:
+                row = self.conn.execute('SELECT value, stored FROM listing WHERE key = ?', (key,)).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"读取列表缓存失败: {e}")
+                return None
+        if row is None:
+            return None
+        try:
+            return json.loads(row[0]), row[1]
+        except ValueError:
+            return None
+
+    def put(self, key: str, value: Any):
+        data = json.dumps(value, ensure_ascii=False)
+        with self.lock:
+            try:
+                self.conn.execute('INSERT OR REPLACE INTO listing (key, value, stored) VALUES (?, ?, ?)',
+                                  (key, data, time.time()))
+                self.writes += 1
+                if self.writes % 100 == 0:
+                    # 只保留最近写入的 max_entries 条
+                    self.conn.execute('DELETE FROM listing WHERE key NOT IN '
+                                      '(SELECT key FROM listing ORDER BY stored DESC LIMIT ?)', (self.max_entries,))
+            except sqlite3.Error as e:
+                logger.warning(f"写入列表缓存失败: {e}")
+
+    def clear(self):
+        if self.conn is None:
+            return
+        with self.lock:
+            self.conn.execute('DELETE FROM listing')
+
+    def refresh(self, key: str, load, store):
+        """后台刷新，同一键已在刷新时直接返回"""
+        with self.lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+
+        def run():
+            try:
+                value = load()
+                if _has_content(value):
+                    store(key, value)
+            except Exception as e:
+                logger.warning(f"列表缓存后台刷新失败 {key}: {e}")
+            finally:
+                with self.lock:
+                    self.refreshing.discard(key)
+
+        self.executor.submit(run)
+
+
+_cache: Optional[ListingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> ListingCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ListingCache()
+    return _cache
+
+
+def _spider_id(spider) -> str:
+    module = sys.modules.get(type(spider).__module__)
+    path = getattr(module, '__file__', None)
+    return os.path.basename(path) if path else type(spider).__module__
+
+
+def _scope(spider) -> str:
+    """站点配置：同一爬虫文件按不同 host/extend 运行时各用各的缓存"""
+    return json.dumps([str(getattr(spider, 'host', '') or ''), str(getattr(spider, 'extend', '') or '')],
+                      ensure_ascii=False)
+
+
+def _has_host_cache(spider) -> bool:
+    return callable(getattr(spider, 'getCache', None)) and callable(getattr(spider, 'setCache', None))
+
+
+def _host_get(spider, key) -> Optional[Tuple[Any, float]]:
+    try:
+        raw = spider.getCache(key)
+        if not raw:
+            return None
+        entry = json.loads(raw) if isinstance(raw, (str, bytes)) else raw
+        return entry['value'], float(entry['stored'])
+    except Exception as e:
+        logger.warning(f"读取宿主缓存失败 {key}: {e}")
+        return None
+
+
+def _host_put(spider, key, value):
+    try:
+        spider.setCache(key, json.dumps({'value': value, 'stored': time.time()}, ensure_ascii=False))
+    except Exception as e:
+        logger.warning(f"写入宿主缓存失败: {e}")
+
+
+def _has_content(value) -> bool:
+    """只缓存有内容的结果，接口出错时返回的空列表不写入"""
+    if not isinstance(value, dict):
+        return bool(value)
+    return any(value.get(field) for field in ('list', 'class', 'filters'))
+
+
+def cached_listing(ttl: Union[float, Callable[..., float], None] = None,
+                   stale: Union[float, Callable[..., float]] = DEFAULT_STALE):
+    """
+    给爬虫的列表方法加缓存
+    ttl 缺省按方法名取 DEFAULT_TTLS；stale 为过期后仍可先返回旧数据的时长
+    两者为函数时以方法参数（不含 self）调用，按参数返回秒数
+    """
+    def decorator(func):
+        default_ttl = ttl if ttl is not None else DEFAULT_TTLS.get(func.__name__, 15 * 60)
+
+        @wraps(func)
+        def wrapper(self, *args):
+            cache = get_cache()
+            # 参数先序列化，方法内部可能会改动 extend 字典
+            key = 'listing:' + ':'.join((_spider_id(self), _scope(self), func.__name__,
+                                        json.dumps(args, ensure_ascii=False, sort_keys=True, default=str)))
+            if _has_host_cache(self):
+                lookup = lambda k: _host_get(self, k)
+                store = lambda k, v: _host_put(self, k, v)
+            elif cache.available:
+                lookup, store = cache.get, cache.put
+            else:
+                return func(self, *args)
+
+            method_ttl = default_ttl(*args) if callable(default_ttl) else default_ttl
+            method_stale = stale(*args) if callable(stale) else stale
+            entry = lookup(key)
+            if entry is not None:
+                value, stored = entry
+                age = time.time() - stored
+                if age < method_ttl:
+                    return value
+                if age < method_ttl + method_stale:
+                    refresh_args = copy.deepcopy(args)
+                    cache.refresh(key, lambda: func(self, *refresh_args), store)
+                    return value
+
+            value = func(self, *args)
+            if _has_content(value):
+                store(key, value)
+            return value
+
+        return wrapper
+    return decorator
@@ -0,0 +1,162 @@
+"""
+m3u8播放列表重写
+
+PlaylistRewriter 按 (代理地址, 播放列表地址, 附加参数) 构建一次后重复使用：
+附加参数预先编码成固定后缀，相对地址用预先算好的目录/站点前缀拼接，
+每个分片只做一次 quote。除分片行外，也会改写 #EXT-X-KEY / #EXT-X-MAP 等标签中的 URI 属性。
+
+iter_playlist / rewrite_playlist 是与地址格式无关的逐行解析层：一次扫描同时处理
+主播放列表（子列表行）与媒体播放列表（分片行，含 .m4s 与带查询串的分片），
+标签行原样保留，只改写其中的 URI 属性；地址如何改写由调用方的 map_uri 决定。
+"""
+import re
+import urllib.parse
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# 带 URI="..." 属性、需要经代理访问的标签
+URI_TAGS = ('#EXT-X-KEY', '#EXT-X-MAP', '#EXT-X-MEDIA', '#EXT-X-SESSION-KEY', '#EXT-X-I-FRAME-STREAM-INF')
+_URI_ATTR = re.compile(r'URI="([^"]*)"')
+
+# iter_playlist 产出的行类型
+BLANK = 'blank'
+TAG = 'tag'
+SEGMENT = 'segment'
+VARIANT = 'variant'
+
+
+class PlaylistInfo:
+    """rewrite_playlist 顺带收集的列表信息"""
+
+    __slots__ = ('master', 'endlist', 'target_duration', 'segments')
+
+    def __init__(self):
+        self.master = False
+        self.endlist = False
+        self.target_duration = 0.0
+        self.segments = 0
+
+
+def iter_playlist(lines: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    """
+    逐行识别播放列表，产出 (类型, 行)
+    #EXT-X-STREAM-INF 之后的地址行为子列表(VARIANT)，其余地址行为分片(SEGMENT)
+    """
+    expect_variant = False
+    for line in lines:
+        if not line or line.isspace():
+            yield BLANK, line
+        elif line[0] == '#':
+            if line.startswith('#EXT-X-STREAM-INF'):
+                expect_variant = True
+            yield TAG, line
+        else:
+            yield (VARIANT if expect_variant else SEGMENT), line
+            expect_variant = False
+
+
+def rewrite_playlist(content: str, map_uri: Callable[[str, str], Optional[str]],
+                     info: Optional[PlaylistInfo] = None) -> str:
+    """
+    单次扫描改写播放列表
+    map_uri(uri, kind) 返回新地址，返回None保持原样；kind 为 SEGMENT / VARIANT / 标签名
+    info 不为None时顺带记录主/媒体列表、ENDLIST、目标时长与分片数
+    """
+    if not content or not content.strip():
+        return content
+
+    def replace_attr(match, tag):
+        new_uri = map_uri(match.group(1), tag)
+        return match.group(0) if new_uri is None else f'URI="{new_uri}"'
+
+    out = []
+    append = out.append
+    for kind, line in iter_playlist(content.splitlines()):
+        if kind is TAG:
+            if line.startswith(URI_TAGS) and 'URI="' in line:
+                tag = line.split(':', 1)[0]
+                line = _URI_ATTR.sub(lambda match: replace_attr(match, tag), line)
+            elif info is not None:
+                if line.startswith('#EXT-X-TARGETDURATION:'):
+                    try:
+                        info.target_duration = float(line[22:].strip())
+                    except ValueError:
+                        pass
+                elif line.startswith('#EXT-X-ENDLIST'):
+                    info.endlist = True
+            if info is not None and line.startswith('#EXT-X-STREAM-INF'):
+                info.master = True
+            append(line)
+        elif kind is BLANK:
+            append(line)
+        else:
+            if info is not None and kind is SEGMENT:
+                info.segments += 1
+            new_uri = map_uri(line.strip(), kind)
+            append(line if new_uri is None else new_uri)
+    return '\n'.join(out)
+
+
+def encode_query(params: Dict[str, str]) -> str:
+    """把附加参数编码成 &k=v 形式的后缀，空值省略"""
+    return ''.join(
+        f"&{key}={urllib.parse.quote(str(value), safe='')}" for key, value in params.items() if value
+    )
+
+
+class PlaylistRewriter:
+    """把播放列表中的地址改写为 {address}?a=<绝对地址><后缀>"""
+
+    def __init__(self, address: str, base_url: str, suffix: str = ''):
+        self.address = address
+        self.base_url = base_url
+        self.suffix = suffix
+        self.prefix = f"{address}?a="
+        parts = urllib.parse.urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.origin = f"{parts.scheme}://{parts.netloc}"
+        self.base_dir = urllib.parse.urljoin(base_url, '.')
+
+    def resolve(self, uri: str) -> Optional[str]:
+        """相对地址转绝对地址；非http(s)协议（如skd://、data:）返回None表示保持原样"""
+        if uri.startswith(('http://', 'https://')):
+            return uri
+        if uri.startswith('//'):
+            return f"{self.scheme}:{uri}"
+        if ':' in uri and urllib.parse.urlsplit(uri).scheme:
+            # 只看真正的协议头：查询串里带 http:// 的相对地址仍然照常改写
+            return None
+        if uri.startswith('/'):
+            return self.origin + uri
+        if uri.startswith(('./', '../', '?', '#')) or '/./' in uri or '/../' in uri:
+            return urllib.parse.urljoin(self.base_url, uri)
+        return self.base_dir + uri
+
+    def proxy_url(self, absolute_url: str) -> str:
+        return self.prefix + urllib.parse.quote(absolute_url, safe='') + self.suffix
+
+    def rewrite(self, content: str, segments: Optional[List[str]] = None) -> str:
+        """
+        改写整个播放列表
+        segments不为None时，按顺序收集媒体分片的绝对地址
+        """
+        prefix = self.prefix
+        suffix = self.suffix
+        quote = urllib.parse.quote
+        resolve = self.resolve
+
+        def map_uri(uri, kind):
+            absolute_url = resolve(uri)
+            if absolute_url is None:
+                return None
+            if segments is not None and kind is SEGMENT and '.m3u8' not in absolute_url.lower():
+                segments.append(absolute_url)
+            return prefix + quote(absolute_url, safe='') + suffix
+
+        return rewrite_playlist(content, map_uri)
+
+
+@lru_cache(maxsize=256)
+def get_rewriter(address: str, base_url: str, suffix: str = '') -> PlaylistRewriter:
+    """按 (代理地址, 播放列表地址, 后缀) 复用重写器"""
+    return PlaylistRewriter(address, base_url, suffix)
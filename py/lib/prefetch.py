@@ -0,0 +1,217 @@
+"""
+详情页预取
+
+打开一部影片时 detailContent 要串行请求详情页和播放配置等 2~3 次。
+DetailCache 在分类/搜索结果返回后，后台预取前 N 个 vod_id 的详情，放进有界 LRU：
+  - 预取线程数即对源站的并发上限，排队中的预取超过 max_pending 时丢弃最旧的
+  - detailContent 先查缓存；对应详情正在预取时等它完成，不重复请求；还在排队的则取消后直接请求
+  - 预取失败不缓存，detailContent 照常自己请求
+
+LineResolver 在 detailContent 返回前把各播放线路首集交给后台解析：
+  - 有界线程池并发，不等待结果，详情照常返回
+  - 只由真实的 detailContent 触发，预取详情不解析线路
+  - playerContent 取用时等对应的解析完成或自己解析
+  - 播放串与线路顺序不变，解析结果只作缓存
+"""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+
+class DetailCache:
+    """详情LRU缓存，load(vod_id) 返回与 detailContent 相同的结果"""
+
+    def __init__(self, load: Callable[[str], dict], count: int = 4, workers: int = 2,
+                 max_entries: int = 64, ttl: float = 600, max_pending: int = 16):
+        self.load = load
+        self.count = count
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self.entries = OrderedDict()   # vod_id -> (写入时间, 详情)
+        self.inflight = OrderedDict()  # vod_id -> Future
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='detail-prefetch')
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+
+    def _lookup(self, vod_id):
+        entry = self.entries.get(vod_id)
+        if entry is None:
+            return None
+        if time.time() - entry[0] > self.ttl:
+            del self.entries[vod_id]
+            return None
+        self.entries.move_to_end(vod_id)
+        return entry[1]
+
+    def _store(self, vod_id, detail):
+        self.entries[vod_id] = (time.time(), detail)
+        self.entries.move_to_end(vod_id)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def _run(self, vod_id, future: Future):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            detail = self.load(vod_id)
+        except Exception as e:
+            logger.warning(f"预取详情失败 {vod_id}: {e}")
+            detail = None
+        with self.lock:
+            self.inflight.pop(vod_id, None)
+            if detail and detail.get('list'):
+                self._store(vod_id, detail)
+                self.prefetched += 1
+        future.set_result(detail)
+
+    def prefetch(self, vod_ids: Iterable[str]):
+        """后台预取，已缓存或正在请求的跳过"""
+        if self.count <= 0:
+            return
+        with self.lock:
+            for vod_id in list(vod_ids)[:self.count]:
+                if vod_id in self.inflight or self._lookup(vod_id) is not None:
+                    continue
+                future = Future()
+                self.inflight[vod_id] = future
+                self.executor.submit(self._run, vod_id, future)
+            # 用户翻页很快时，旧页面还没开始的预取直接放弃
+            for old_id, old_future in list(self.inflight.items()):
+                if len(self.inflight) <= self.max_pending:
+                    break
+                if old_future.cancel():
+                    del self.inflight[old_id]
+
+    def prefetch_videos(self, videos: List[dict]):
+        """从分类/搜索结果中取可打开详情的条目（跳过目录项）"""
+        self.prefetch(v['vod_id'] for v in videos if v.get('vod_tag') != 'folder' and v.get('vod_id'))
+
+    def get(self, vod_id: str) -> dict:
+        with self.lock:
+            detail = self._lookup(vod_id)
+            if detail is not None:
+                self.hits += 1
+                return detail
+            self.misses += 1
+            future = self.inflight.get(vod_id)
+            if future is not None and future.cancel():
+                # 还在排队的预取不等了，直接在当前线程请求
+                del self.inflight[vod_id]
+                future = None
+        if future is not None:
+            try:
+                detail = future.result()
+            except Exception:
+                detail = None
+            if detail and detail.get('list'):
+                return detail
+        detail = self.load(vod_id)
+        if detail and detail.get('list'):
+            with self.lock:
+                self._store(vod_id, detail)
+        return detail
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'inflight': len(self.inflight),
+                'hits': self.hits,
+                'misses': self.misses,
+                'prefetched': self.prefetched,
+            }
+
+
+def prefetch_count(extend, default: int = 4) -> int:
+    """从站点 ext 配置 {"prefetch": N} 读取预取数量，0 为关闭"""
+    try:
+        config = json.loads(extend) if isinstance(extend, str) and extend else (extend or {})
+        return max(0, int(config.get('prefetch', default)))
+    except (ValueError, TypeError, AttributeError):
+        return default
+
+
+def first_episodes(play_url: str) -> List[str]:
+    """取 vod_play_url 中每条线路第一集的播放id，保持线路顺序"""
+    ids = []
+    for line in play_url.split('$$$'):
+        episode = line.split('#', 1)[0]
+        if '$' in episode:
+            episode = episode.split('$', 1)[1]
+        if episode:
+            ids.append(episode)
+    return ids
+
+
+class LineResolver:
+    """播放id -> 真实地址 的解析缓存，resolve(play_id) 与原 playerContent 中的解析逻辑一致"""
+
+    def __init__(self, resolve: Callable[[str], str], workers: int = 4, ttl: float = 120, max_entries: int = 256):
+        self.resolve = resolve
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()   # play_id -> (解析时间, 地址)
+        self.inflight: Dict[str, Future] = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='line-resolve')
+
+    def _lookup(self, play_id):
+        entry = self.entries.get(play_id)
+        if entry is None or time.time() - entry[0] > self.ttl:
+            return None
+        self.entries.move_to_end(play_id)
+        return entry[1]
+
+    def _run(self, play_id):
+        try:
+            url = self.resolve(play_id)
+        except Exception as e:
+            logger.warning(f"线路解析失败 {play_id}: {e}")
+            url = None
+        with self.lock:
+            self.inflight.pop(play_id, None)
+            if url:
+                self.entries[play_id] = (time.time(), url)
+                self.entries.move_to_end(play_id)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        return url
+
+    def warm(self, play_ids: Iterable[str]) -> int:
+        """后台并发解析，不等待结果，返回新提交的数量；已缓存或正在解析的跳过"""
+        submitted = 0
+        with self.lock:
+            for play_id in play_ids:
+                if self._lookup(play_id) is not None or play_id in self.inflight:
+                    continue
+                self.inflight[play_id] = self.executor.submit(self._run, play_id)
+                submitted += 1
+        return submitted
+
+    def warm_detail(self, detail: dict) -> int:
+        """按 detailContent 的结果解析各线路首集"""
+        play_ids = []
+        for vod in (detail or {}).get('list') or []:
+            play_ids.extend(first_episodes(vod.get('vod_play_url') or ''))
+        return self.warm(play_ids)
+
+    def get(self, play_id: str) -> str:
+        with self.lock:
+            url = self._lookup(play_id)
+            future = self.inflight.get(play_id) if url is None else None
+        if url is not None:
+            return url
+        if future is not None:
+            url = future.result()
+            if url:
+                return url
+        return self.resolve(play_id)
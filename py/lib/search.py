@@ -0,0 +1,279 @@
+"""
+多站点聚合搜索
+
+宿主按站点依次调用各爬虫的 searchContent，慢站点会拖住整次搜索。
+AggregatedSearch 用常驻线程池同时向所有已注册爬虫发起搜索：
+  - 每个站点从开始执行起有截止时间，超时的站点直接跳过，结果按站点返回的先后流式产出
+  - 结果按 规范化标题 + 年份 去重
+  - 记录每个站点的延迟，快速搜索只用延迟低于阈值、最近没有超时的站点；
+    被排除的站点每隔 reprobe_interval 秒放进一次快速搜索重新测量
+
+    engine = AggregatedSearch(load_spiders(py目录, ['金牌影视', '热播影视']), workers=16, deadline=6)
+    for site, videos in engine.search('庆余年'):
+        ...
+聚合搜索.py 把它包装成一个爬虫站点。
+命令行：python lib/search.py 关键词 --sites 金牌影视 热播影视 [--quick] [--deadline 6] [--workers 16]
+"""
+import importlib.util
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_PUNCT = re.compile(r'[\s\W_]+', re.UNICODE)
+# 标题末尾常见的清晰度/版本标注，去重时忽略
+_TITLE_TAGS = re.compile(r'[\[【(（](?:[^\]】)）]*?(?:HD|BD|4K|1080P|国语|粤语|中字|高清|蓝光|完结|更新)[^\]】)）]*)[\]】)）]',
+                         re.IGNORECASE)
+
+
+def normalize_title(title: str) -> str:
+    """全角转半角、去标注与标点、统一小写"""
+    title = unicodedata.normalize('NFKC', title or '')
+    title = _TITLE_TAGS.sub('', title)
+    return _PUNCT.sub('', title).lower()
+
+
+def dedup_key(video: dict) -> Tuple[str, str]:
+    year = str(video.get('vod_year') or '').strip()[:4]
+    return normalize_title(video.get('vod_name', '')), year
+
+
+class SiteStats:
+    """单个站点的搜索延迟统计，延迟为指数滑动平均"""
+
+    __slots__ = ('latency', 'requests', 'timeouts', 'errors', 'consecutive_timeouts', 'results', 'checked_at')
+
+    def __init__(self):
+        self.latency = 0.0
+        self.requests = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.consecutive_timeouts = 0
+        self.results = 0
+        self.checked_at = 0.0
+
+    def record(self, latency: float, alpha: float = 0.3):
+        self.latency = latency if not self.latency else alpha * latency + (1 - alpha) * self.latency
+
+    def as_dict(self) -> dict:
+        return {
+            'latency_ms': round(self.latency * 1000, 1),
+            'requests': self.requests,
+            'timeouts': self.timeouts,
+            'errors': self.errors,
+            'results': self.results,
+        }
+
+
+class AggregatedSearch:
+    """
+    聚合搜索引擎
+    deadline 为每个站点从开始执行起的截止时间（秒）；站点数多于 workers 时排队的站点轮到后才开始计时，
+    整次搜索最长为 deadline × 排队轮数，届时仍未开始的站点跳过且不计入统计
+    quick_cutoff 为快速搜索允许的站点平均延迟上限，reprobe_interval 为被排除站点的重新测量间隔
+    """
+
+    def __init__(self, spiders: Dict[str, object], workers: int = 16, deadline: float = 6.0,
+                 quick_cutoff: float = 3.0, max_consecutive_timeouts: int = 2, reprobe_interval: float = 300):
+        self.spiders = dict(spiders)
+        self.workers = workers
+        self.deadline = deadline
+        self.quick_cutoff = quick_cutoff
+        self.max_consecutive_timeouts = max_consecutive_timeouts
+        self.reprobe_interval = reprobe_interval
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='search')
+        self.lock = threading.Lock()
+        self.stats: Dict[str, SiteStats] = {name: SiteStats() for name in self.spiders}
+
+    def register(self, name: str, spider):
+        with self.lock:
+            self.spiders[name] = spider
+            self.stats.setdefault(name, SiteStats())
+
+    def quick_sites(self) -> List[str]:
+        """快速搜索使用的站点：没有统计数据的站点先给一次机会，被排除的站点到期后重新测量一次"""
+        now = time.time()
+        sites = []
+        with self.lock:
+            for name, st in self.stats.items():
+                if name not in self.spiders:
+                    continue
+                if (st.consecutive_timeouts < self.max_consecutive_timeouts
+                        and (not st.requests or st.latency <= self.quick_cutoff)):
+                    sites.append(name)
+                elif now - st.checked_at >= self.reprobe_interval:
+                    # 重新测量的机会只给一次搜索，结果出来前其他搜索仍然跳过
+                    st.checked_at = now
+                    sites.append(name)
+        return sites
+
+    def _search_site(self, name: str, keyword: str, quick: bool, pg: str,
+                     started: Dict[str, float]) -> Tuple[List[dict], float]:
+        spider = self.spiders[name]
+        start = started[name] = time.time()
+        if str(pg) != '1' and hasattr(spider, 'searchContentPage'):
+            result = spider.searchContentPage(keyword, quick, pg)
+        elif str(pg) != '1':
+            result = spider.searchContent(keyword, quick, pg)
+        else:
+            result = spider.searchContent(keyword, quick)
+        videos = (result or {}).get('list') or []
+        return videos, time.time() - start
+
+    def search(self, keyword: str, quick: bool = False, pg: str = '1',
+               sites: Optional[List[str]] = None, deadline: Optional[float] = None
+               ) -> Iterator[Tuple[str, List[dict]]]:
+        """按站点返回先后产出 (站点, 去重后的新结果)，开始执行后截止时间内未返回的站点计为超时"""
+        if sites is None:
+            sites = self.quick_sites() if quick else list(self.spiders)
+        deadline = self.deadline if deadline is None else deadline
+        # 排队的站点轮到后才开始计时，整次搜索按排队轮数封顶
+        rounds = -(-len(sites) // max(self.workers, 1))
+        search_end = time.time() + deadline * max(rounds, 1)
+        started: Dict[str, float] = {}
+        futures = {self.executor.submit(self._search_site, name, keyword, quick, pg, started): name
+                   for name in sites}
+        pending = set(futures)
+        seen = set()
+        try:
+            while pending:
+                now = time.time()
+                expired = [f for f in pending
+                           if futures[f] in started and now >= started[futures[f]] + deadline]
+                if now >= search_end:
+                    expired = [f for f in pending if futures[f] in started]
+                    pending.clear()
+                if expired:
+                    # 超时的站点按截止时间记一次延迟，线程继续跑完但结果丢弃
+                    pending.difference_update(expired)
+                    self._record_timeouts([futures[f] for f in expired], deadline)
+                if not pending:
+                    break
+                # 尚未开始的站点最早也要 deadline 秒后才到期
+                wake = min([started[futures[f]] + deadline for f in pending if futures[f] in started]
+                           + [now + deadline, search_end])
+                done, _ = wait(pending, timeout=max(wake - now, 0), return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.discard(future)
+                    fresh = self._collect(futures[future], future, seen)
+                    if fresh:
+                        yield futures[future], fresh
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _collect(self, name: str, future, seen: set) -> List[dict]:
+        """记录站点结果的统计，返回去重后的新结果"""
+        try:
+            videos, latency = future.result()
+        except Exception as e:
+            with self.lock:
+                st = self.stats[name]
+                st.requests += 1
+                st.errors += 1
+                st.checked_at = time.time()
+            logger.warning(f"站点搜索失败 {name}: {e}")
+            return []
+
+        fresh = []
+        for video in videos:
+            key = dedup_key(video)
+            if key[0] and key in seen:
+                continue
+            seen.add(key)
+            fresh.append(video)
+
+        with self.lock:
+            st = self.stats[name]
+            st.requests += 1
+            st.consecutive_timeouts = 0
+            st.results += len(videos)
+            st.checked_at = time.time()
+            st.record(latency)
+        return fresh
+
+    def _record_timeouts(self, names: Iterable[str], deadline: float):
+        with self.lock:
+            for name in names:
+                st = self.stats[name]
+                st.requests += 1
+                st.timeouts += 1
+                st.consecutive_timeouts += 1
+                st.checked_at = time.time()
+                st.record(deadline)
+
+    def search_all(self, keyword: str, quick: bool = False, pg: str = '1') -> List[dict]:
+        """收齐所有站点结果后一次返回，vod_id 前加 站点名@@ 便于回查详情"""
+        merged = []
+        for name, videos in self.search(keyword, quick, pg):
+            for video in videos:
+                video = dict(video)
+                video['vod_id'] = f"{name}@@{video.get('vod_id')}"
+                merged.append(video)
+        return merged
+
+    def site_stats(self) -> Dict[str, dict]:
+        with self.lock:
+            return {name: st.as_dict() for name, st in self.stats.items()}
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+def load_spiders(directory: str, names: Iterable[str], extend: str = '') -> Dict[str, object]:
+    """
+    按 names（文件名，不含.py）加载目录下的爬虫并调用 init；只加载明确列出的爬虫，
+    目录里的解析器与不参与搜索的爬虫 init 时可能联网，不做扫描
+    缺失、加载失败或没有 searchContent 的记日志后跳过
+    """
+    spiders = {}
+    for name in names:
+        path = os.path.join(directory, f"{name}.py")
+        if not os.path.isfile(path):
+            logger.warning(f"爬虫不存在 {path}")
+            continue
+        try:
+            spec = importlib.util.spec_from_file_location(f"spider_{abs(hash(path))}", path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            spider_class = getattr(module, 'Spider', None)
+            if spider_class is None or not hasattr(spider_class, 'searchContent'):
+                logger.warning(f"不是可搜索的爬虫 {name}")
+                continue
+            spider = spider_class()
+            spider.init(extend)
+            spiders[name] = spider
+        except Exception as e:
+            logger.warning(f"加载爬虫失败 {name}: {e}")
+    return spiders
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    arg_parser = argparse.ArgumentParser(description='多站点聚合搜索')
+    arg_parser.add_argument('keyword')
+    arg_parser.add_argument('--dir', default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    arg_parser.add_argument('--sites', nargs='+', required=True, help='搜索这些爬虫（文件名不含.py）')
+    arg_parser.add_argument('--quick', action='store_true')
+    arg_parser.add_argument('--deadline', type=float, default=6.0)
+    arg_parser.add_argument('--workers', type=int, default=16)
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    engine = AggregatedSearch(load_spiders(args.dir, args.sites), workers=args.workers, deadline=args.deadline)
+    started = time.time()
+    total = 0
+    for site, videos in engine.search(args.keyword, quick=args.quick):
+        total += len(videos)
+        print(f"[{time.time() - started:6.2f}s] {site}: {len(videos)} 条")
+        for video in videos[:5]:
+            print(f"    {video.get('vod_name')} {video.get('vod_year') or ''} {video.get('vod_remarks') or ''}")
+    print(f"共 {total} 条，耗时 {time.time() - started:.2f}s")
+    print(json.dumps(engine.site_stats(), ensure_ascii=False, indent=2))
@@ -0,0 +1,60 @@
+"""
+选择性HTML解析
+
+爬虫原先对首页/分类/搜索/详情的整页都 BeautifulSoup(res, "lxml") 建完整棵树，
+实际只用到其中几个 ul/li/article 节点。这里用 SoupStrainer 只为目标标签及其子树建树，
+lxml 不可用时退回 html.parser。返回的仍是 bs4 节点，原有 find/find_all 写法不用改：
+    soups = find_all(res, 'article', 'item movies')
+    doc = parse_only(res, 'ul', ['fed-padding', 'fed-tabs-btm'])
+"""
+from typing import List, Optional, Sequence, Union
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml  # noqa: F401
+    FEATURES = 'lxml'
+except ImportError:
+    FEATURES = 'html.parser'
+
+Classes = Union[str, Sequence[str], None]
+
+
+def class_matcher(class_: Classes):
+    """
+    解析阶段拿到的是原始 class 字符串，按 find_all(class_=...) 的规则匹配：
+    含空格的值要求整串相同，单个类名只要出现在其中即可
+    """
+    wanted = [class_] if isinstance(class_, str) else list(class_)
+
+    def match(value):
+        if not value:
+            return False
+        if isinstance(value, str):
+            raw = ' '.join(value.split())
+            tokens = raw.split(' ')
+        else:
+            tokens = list(value)
+            raw = ' '.join(tokens)
+        return any(raw == c if ' ' in c else c in tokens for c in wanted)
+
+    return match
+
+
+def strainer(name: str, class_: Classes = None) -> SoupStrainer:
+    if class_:
+        return SoupStrainer(name, attrs={'class': class_matcher(class_)})
+    return SoupStrainer(name)
+
+
+def parse_only(markup: str, name: str, class_: Classes = None) -> BeautifulSoup:
+    """只为匹配 name/class_ 的标签建树"""
+    return BeautifulSoup(markup, FEATURES, parse_only=strainer(name, class_))
+
+
+def find_all(markup: str, name: str, class_: Classes = None) -> List:
+    return parse_only(markup, name, class_).find_all(name, class_=class_)
+
+
+def find(markup: str, name: str, class_: Classes = None) -> Optional[object]:
+    return parse_only(markup, name, class_).find(name, class_=class_)
@@ -0,0 +1,152 @@
+"""
+SOCKS5 解析器共用的上游请求入口
+
+socks5 / socks51 / 新socks5 都按请求在 requests 与 asyncio 内核之间切换，
+经代理的请求计入健康评分，代理熔断时直接失败。UpstreamClient 把这部分集中起来：
+  - get(url, engine, **kwargs) 与 session.get 用法一致，两种引擎返回的响应对象用法相同
+  - health 为 ProxyHealthMonitor，探测也经同一入口发出
+  - acquire(proxy_url) 返回 (session, release)，可按代理划分连接池；流式响应在关闭时才 release
+  - submit(coro) 把 read_async 等协程交给异步引擎的事件循环，后台请求不必各占一个线程
+"""
+import logging
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from typing import Callable, Optional, Tuple
+
+import requests
+
+from lib.aioproxy import AsyncProxyEngine
+from lib.health import ProxyHealthMonitor
+
+
+def _noop():
+    pass
+
+
+def release_on_close(response, release: Callable[[], None]):
+    """流式响应关闭（或被回收）时调用 release，release 需可重复调用"""
+    close = response.close
+
+    def close_and_release():
+        try:
+            close()
+        finally:
+            release()
+
+    response.close = close_and_release
+    weakref.finalize(response, release)
+    return response
+
+
+class UpstreamClient:
+    """按引擎发起上游GET请求，并维护经由代理的健康评分"""
+
+    def __init__(self, session: requests.Session,
+                 acquire: Optional[Callable[[str], Tuple[requests.Session, Callable[[], None]]]] = None,
+                 probe_interval: float = 30, logger=None):
+        self.session = session
+        self.acquire = acquire or (lambda proxy_url: (session, _noop))
+        self.logger = logger or logging.getLogger(__name__)
+        self.health = ProxyHealthMonitor(self.probe, interval=probe_interval, logger=self.logger)
+        self._async_engine = None
+        self._async_engine_lock = threading.Lock()
+
+    def async_engine(self) -> Optional[AsyncProxyEngine]:
+        """按需创建异步代理内核，依赖缺失时返回None并回退到同步实现"""
+        if self._async_engine is None:
+            with self._async_engine_lock:
+                if self._async_engine is None:
+                    try:
+                        self._async_engine = AsyncProxyEngine(headers=dict(self.session.headers))
+                    except ImportError as e:
+                        self.logger.warning(f"异步引擎不可用，使用同步实现: {e}")
+                        self._async_engine = False
+        return self._async_engine or None
+
+    def get(self, url: str, engine: str = 'sync', **kwargs):
+        """
+        发起GET请求，经代理的请求计入健康评分
+        代理被判定为不可用时直接抛出ConnectionError，不再等待超时
+        """
+        proxy_url = (kwargs.get('proxies') or {}).get('http', '')
+        if proxy_url and not self.health.is_available(proxy_url):
+            raise requests.exceptions.ConnectionError(f"代理暂不可用: {proxy_url}")
+
+        request_start = time.time()
+        try:
+            response = self.send(url, engine, **kwargs)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            if proxy_url:
+                self.health.record(proxy_url, False, time.time() - request_start)
+            raise
+        if proxy_url:
+            self.health.record(proxy_url, True, time.time() - request_start)
+        return response
+
+    def submit(self, coro) -> Optional[Future]:
+        """把协程交给异步引擎的事件循环执行，返回 Future；异步引擎不可用时返回None"""
+        async_engine = self.async_engine()
+        if async_engine is None:
+            coro.close()
+            return None
+        return async_engine.submit(coro)
+
+    async def read_async(self, url: str, **kwargs) -> Tuple[int, bytes]:
+        """
+        协程版 get：读取完整响应，返回 (状态码, 内容)，需经 submit 在异步引擎的事件循环中执行
+        与 get 一样计入健康评分，代理熔断时直接抛出ConnectionError
+        """
+        proxy_url = (kwargs.get('proxies') or {}).get('http', '')
+        if proxy_url and not self.health.is_available(proxy_url):
+            raise requests.exceptions.ConnectionError(f"代理暂不可用: {proxy_url}")
+
+        request_start = time.time()
+        try:
+            result = await self._async_engine.read(url, **kwargs)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            if proxy_url:
+                self.health.record(proxy_url, False, time.time() - request_start)
+            raise
+        if proxy_url:
+            self.health.record(proxy_url, True, time.time() - request_start)
+        return result
+
+    def send(self, url: str, engine: str, **kwargs):
+        """按引擎发起GET请求，不计入健康评分"""
+        if engine == 'async':
+            async_engine = self.async_engine()
+            if async_engine is not None:
+                return async_engine.get(url, **kwargs)
+
+        session, release = self.acquire((kwargs.get('proxies') or {}).get('http', ''))
+        try:
+            response = session.get(url, **kwargs)
+        except BaseException:
+            release()
+            raise
+        if kwargs.get('stream'):
+            return release_on_close(response, release)
+        release()
+        return response
+
+    def probe(self, proxy_url: str, url: str) -> int:
+        """
+        经由代理探测播放地址，供健康监测线程调用，返回状态码，连接失败时抛出异常
+        用只读响应头的GET而不是HEAD，不支持HEAD的源不会被误判为失败
+        """
+        proxies = {"http": proxy_url, "https": proxy_url}
+        session, release = self.acquire(proxy_url)
+        try:
+            response = session.get(url, proxies=proxies, timeout=2, verify=False, stream=True)
+            response.close()
+            return response.status_code
+        finally:
+            release()
+
+    def close(self):
+        self.health.stop()
+        if self._async_engine:
+            self._async_engine.close()
+        self._async_engine = None
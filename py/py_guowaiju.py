@@ -1,13 +1,14 @@
+import os
 import re
 import sys
 from Crypto.Hash import MD5
 sys.path.append("..")
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import pad, unpad
 from urllib.parse import quote, urlparse
 from base64 import b64encode, b64decode
 import json
 import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from lib.appcrypto import PerSecond, get_cipher
 from base.spider import Spider
 
 
@@ -15,6 +16,9 @@ class Spider(Spider):
 
     def init(self, extend=""):
         self.host = 'https://guowaiju.com'
+        self.cipher = get_cipher(b"7xv16h7qgkrs9b1p")
+        # 签名只取决于整秒时间戳
+        self.verify = PerSecond(self.cipher.encrypt_b64)
         self.did=self.getdid()
         pass
 
@@ -162,30 +166,24 @@ class Spider(Spider):
         return did
 
     def aes(self, text, b=None):
-        key = b"7xv16h7qgkrs9b1p"
-        cipher = AES.new(key, AES.MODE_CBC, key)
         if b:
-            ct_bytes = cipher.encrypt(pad(text.encode("utf-8"), AES.block_size))
-            ct = b64encode(ct_bytes).decode("utf-8")
-            return ct
+            return self.cipher.encrypt_b64(text)
         else:
-            pt = unpad(cipher.decrypt(b64decode(text)), AES.block_size)
-            return pt.decode("utf-8")
+            return self.cipher.decrypt_b64(text).decode("utf-8")
 
     def header(self):
-        t = str(int(time.time()))
+        t, sign = self.verify()
         header = {
           "User-Agent": "okhttp/3.14.9", "app-version-code": "110", "app-ui-mode": "light",
           "app-api-verify-time": t, "app-user-device-id": self.did,
-          "app-api-verify-sign": self.aes(t, True),
+          "app-api-verify-sign": sign,
           "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8"
         }
         return header
 
     def getdata(self, path, data=None):
         vdata = self.post(f"{self.host}{path}", headers=self.header(), data=data, timeout=10).json()['data']
-        data1 = self.aes(vdata)
-        return json.loads(data1)
+        return self.cipher.decode_json(vdata)
 
     def Mproxy(self, url):
         return f"{self.getProxyUrl()}&url={self.e64(url)}&type=m3u8"
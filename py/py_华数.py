@@ -1,15 +1,20 @@
 # -*- coding: utf-8 -*-
 #//新时代青年为您提示:作品内容均从互联网收集而来 仅供交流学习使用 版权归原创者所有 如侵犯了您的权益 请者 将及时删除侵权内容
-import requests
 # from bs4 import BeautifulSoup
 import re
 from base.spider import Spider
 import sys
+import os
 import json
 import base64
 import urllib.parse
 
 sys.path.append('..')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from lib.httpclient import get_client
+from lib.extract import extract_middle_text
+
+http_client = get_client()
 
 xurl = "https://www.wasu.cn"
 
@@ -34,65 +39,7 @@ class Spider(Spider):
         pass
 
     def extract_middle_text(self, text, start_str, end_str, pl, start_index1: str = '', end_index2: str = ''):
-        if pl == 3:
-            plx = []
-            while True:
-                start_index = text.find(start_str)
-                if start_index == -1:
-                    break
-                end_index = text.find(end_str, start_index + len(start_str))
-                if end_index == -1:
-                    break
-                middle_text = text[start_index + len(start_str):end_index]
-                plx.append(middle_text)
-                text = text.replace(start_str + middle_text + end_str, '')
-            if len(plx) > 0:
-                purl = ''
-                for i in range(len(plx)):
-                    matches = re.findall(start_index1, plx[i])
-                    output = ""
-                    for match in matches:
-                        match3 = re.search(r'(?:^|[^0-9])(\d+)(?:[^0-9]|$)', match[1])
-                        if match3:
-                            number = match3.group(1)
-                        else:
-                            number = 0
-                        if 'http' not in match[0]:
-                            output += f"#{'' + match[1]}${number}{xurl}{match[0]}"
-                        else:
-                            output += f"#{'' + match[1]}${number}{match[0]}"
-                    output = output[1:]
-                    purl = purl + output + "$$$"
-                purl = purl[:-3]
-                return purl
-            else:
-                return ""
-        else:
-            start_index = text.find(start_str)
-            if start_index == -1:
-                return ""
-            end_index = text.find(end_str, start_index + len(start_str))
-            if end_index == -1:
-                return ""
-
-        if pl == 0:
-            middle_text = text[start_index + len(start_str):end_index]
-            return middle_text.replace("\\", "")
-
-        if pl == 1:
-            middle_text = text[start_index + len(start_str):end_index]
-            matches = re.findall(start_index1, middle_text)
-            if matches:
-                jg = ' '.join(matches)
-                return jg
-
-        if pl == 2:
-            middle_text = text[start_index + len(start_str):end_index]
-            matches = re.findall(start_index1, middle_text)
-            if matches:
-                new_list = [f'{item}' for item in matches]
-                jg = '$$$'.join(new_list)
-                return jg
+        return extract_middle_text(text, start_str, end_str, pl, start_index1, end_index2, base_url=xurl)
 
     def homeContent(self, filter):
         result = {}
@@ -109,7 +56,7 @@ class Spider(Spider):
 
     def homeVideoContent(self):
         videos = []
-        detail = requests.get(url='https://mcspapp.5g.wasu.tv/bvradio_app/hzhs/recommendServlet?functionName=getRecommond&modeId=1033&page=1&pageSize=10&siteId=1000101', headers=headerx)
+        detail = http_client.get(url='https://mcspapp.5g.wasu.tv/bvradio_app/hzhs/recommendServlet?functionName=getRecommond&modeId=1033&page=1&pageSize=10&siteId=1000101', headers=headerx)
         detail.encoding = "utf-8"
         res = detail.text
         js1=json.loads(res)
@@ -137,7 +84,7 @@ class Spider(Spider):
         result = {}
         videos = []
 
-        detail = requests.get(url=f'https://ups.5g.wasu.tv/rmp-user-suggest/1000101/hzhs/searchServlet?functionName=getNewsSearchedByCondition&nodeId={cid}&nodeTag=%E5%85%A8%E9%83%A8&yearTag=%E5%85%A8%E9%83%A8&countryTag=%E5%85%A8%E9%83%A8&orderType=0&pageSize=40&page={pg}&keyword=&siteId=1000101', headers=headerx)
+        detail = http_client.get(url=f'https://ups.5g.wasu.tv/rmp-user-suggest/1000101/hzhs/searchServlet?functionName=getNewsSearchedByCondition&nodeId={cid}&nodeTag=%E5%85%A8%E9%83%A8&yearTag=%E5%85%A8%E9%83%A8&countryTag=%E5%85%A8%E9%83%A8&orderType=0&pageSize=40&page={pg}&keyword=&siteId=1000101', headers=headerx)
         detail.encoding = "utf-8"
         res = detail.text
         js1=json.loads(res)
@@ -167,7 +114,7 @@ class Spider(Spider):
 
         result = {}
         videos = []
-        res1 = requests.get(url=f'https://mcspapp.5g.wasu.tv/bvradio_app/hzhs/newsServlet?siteId=1000101&functionName=getCurrentNews&nodeId={cid}&newsId={id}&platform=web', headers=headerx)
+        res1 = http_client.get(url=f'https://mcspapp.5g.wasu.tv/bvradio_app/hzhs/newsServlet?siteId=1000101&functionName=getCurrentNews&nodeId={cid}&newsId={id}&platform=web', headers=headerx)
         res1.encoding = "utf-8"
         res = res1.text
         js1=json.loads(res)
@@ -8,7 +8,209 @@ from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import time
 from datetime import datetime
+from collections import OrderedDict
+import copy
 import threading
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from lib.playlist import encode_query, get_rewriter
+from lib.upstream import UpstreamClient
+
+
+class _InFlight:
+    """正在进行中的上游请求，供并发未命中的请求等待同一结果"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.data = None
+        self.error = None
+
+
+class SegmentCache:
+    """
+    TS分片缓存：以上游绝对URL为键，按总字节数上限做LRU淘汰，
+    同一分片的并发未命中请求合并为一次上游拉取
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_item_bytes: int = 8 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def put(self, key: str, data: bytes):
+        """写入分片，超出字节上限时从最久未使用的一端淘汰"""
+        size = len(data)
+        if size > self.max_item_bytes or size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = data
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+
+    def acquire(self, key: str) -> Tuple[Union[bytes, None], Union[_InFlight, None], bool]:
+        """
+        查询分片：命中返回 (内容, None, False)；
+        未命中且无人拉取时登记为拉取者，返回 (None, flight, True)；
+        已有拉取进行中返回 (None, flight, False)，调用方用wait等待
+        """
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data, None, False
+            flight = self._inflight.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return None, flight, False
+            flight = self._inflight[key] = _InFlight()
+            self.misses += 1
+            return None, flight, True
+
+    def wait(self, flight: _InFlight, timeout: float) -> Union[bytes, None]:
+        """等待拉取者完成；拉取失败时抛出该异常的副本，拉取被中断或等待超时返回None"""
+        if not flight.event.wait(timeout):
+            return None
+        if flight.error is not None:
+            # 每个等待者各抛一份副本，不在多个线程间共用同一异常对象（及其traceback）
+            raise _copy_error(flight.error) from flight.error
+        return flight.data
+
+    def complete(self, key: str, flight: _InFlight, data: Union[bytes, None] = None, error: Exception = None):
+        """结束一次拉取并唤醒等待者；data为None且无error表示拉取被中断（如客户端断开）"""
+        flight.data = data
+        flight.error = error
+        if data is not None:
+            self.put(key, data)
+        with self._lock:
+            # 同一键可能已有新的拉取登记，只移除自己的
+            if self._inflight.get(key) is flight:
+                del self._inflight[key]
+        flight.event.set()
+
+    def get_or_fetch(self, key: str, fetch, timeout: float = 30) -> Tuple[bytes, bool]:
+        """
+        读取分片，未命中时调用fetch(key)拉取；并发的同键请求只拉取一次
+        返回 (内容, 是否命中缓存)，fetch抛出的异常会传递给所有等待者
+        最多等待别人的拉取 timeout 秒，超时后单独拉取
+        """
+        deadline = time.time() + timeout
+        while True:
+            data, flight, leader = self.acquire(key)
+            if data is not None:
+                return data, True
+            if leader:
+                try:
+                    data = fetch(key)
+                except Exception as e:
+                    self.complete(key, flight, error=e)
+                    raise
+                self.complete(key, flight, data=data)
+                return data, False
+
+            remaining = deadline - time.time()
+            if remaining > 0:
+                data = self.wait(flight, remaining)
+                if data is not None:
+                    return data, True
+                if time.time() < deadline:
+                    continue  # 拉取者被中断，重新登记
+            data = fetch(key)
+            self.put(key, data)
+            return data, False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, int]:
+        """返回缓存统计信息"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+            }
+
+
+def _copy_error(error: Exception) -> Exception:
+    try:
+        return copy.copy(error)
+    except Exception:
+        return requests.exceptions.RequestException(str(error))
+
+
+class _SegmentStream:
+    """
+    逐块转发TS分片，同时收集内容写入缓存
+    拉取登记的结束不依赖生成器的finally：读完、宿主调用close()、或对象被丢弃时都会结束，
+    宿主在第一次next()之前就关闭或丢弃它，等待同一分片的请求也会被唤醒
+    """
+
+    def __init__(self, cache: SegmentCache, key: str, flight: _InFlight,
+                 response: requests.Response, chunk_size: int):
+        self.cache = cache
+        self.key = key
+        self.flight = flight
+        self.response = response
+        self.chunk_size = chunk_size
+        self._done = False
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        parts = []
+        received = 0
+        completed = False
+        try:
+            for chunk in self.response.iter_content(chunk_size=self.chunk_size):
+                if not chunk:
+                    continue
+                received += len(chunk)
+                if parts is not None:
+                    if received <= self.cache.max_item_bytes:
+                        parts.append(chunk)
+                    else:
+                        parts = None  # 超出单分片缓存上限，不再收集
+                yield chunk
+            completed = True
+        finally:
+            # 播放器断开时宿主关闭生成器，随即关闭上游连接
+            self._finish(b''.join(parts) if completed and parts is not None else None)
+
+    def _finish(self, data: Union[bytes, None] = None):
+        with self._lock:
+            if self._done:
+                return
+            self._done = True
+        self.response.close()
+        self.cache.complete(self.key, self.flight, data=data)
+
+    def close(self):
+        self._finish()
+
+    def __del__(self):
+        self._finish()
+
 
 class Parser(Parser):  # 必须继承
 
@@ -22,12 +224,25 @@ class Parser(Parser):  # 必须继承
         
         # 创建优化的session
         self.session = self._create_optimized_session()
+
+        # TS分片缓存（多台设备观看同一频道时共享分片）
+        self.segment_cache = SegmentCache(max_bytes=64 * 1024 * 1024)
+
+        # TS流式转发的分块大小（字节），低内存盒子可适当调小
+        self.chunk_size = 64 * 1024
+
+        # 默认请求引擎：sync(requests) / async(asyncio内核)，可用 engine 参数按请求切换
+        self.engine = 'sync'
         
         # 设置日志
         logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
         self.logger = logging.getLogger(__name__)
         self.logger.info("优化版SOCKS5代理解析器初始化完成")
 
+        # 后台代理健康监测（单线程定期探测，替代每次parse启动的测试线程）
+        self.upstream = UpstreamClient(self.session, logger=self.logger)
+        self.health_monitor = self.upstream.health
+
     def _create_optimized_session(self) -> requests.Session:
         """创建优化的HTTP会话"""
         session = requests.Session()
@@ -83,18 +298,20 @@ class Parser(Parser):  # 必须继承
                 # 处理回看参数 - 直接生成最终URL
                 play_url = self._fast_process_playseek(play_url, playseek)
             
-            # 异步测试连接（不阻塞主流程）
-            test_thread = threading.Thread(target=self._async_test_connection, args=(play_url,))
-            test_thread.daemon = True
-            test_thread.start()
+            # 登记到后台健康监测（不阻塞主流程）
+            self.health_monitor.register(self.proxy_config['http'], play_url)
             
             # 构建代理URL（不包含回看参数，因为已经处理到play_url中）
             proxy_play_url = f"{self.address}?a={urllib.parse.quote(play_url, safe='')}"
+            engine = params.get("engine", "").strip()
+            if engine:
+                proxy_play_url += f"&engine={urllib.parse.quote(engine, safe='')}"
             
             return {
                 "url": proxy_play_url,
                 "proxy_type": "SOCKS5", 
                 "proxy_server": "120.226.12.155:31167",
+                "engine": engine or self.engine,
                 "status": "ready",
                 "play_url": proxy_play_url,
                 "m3u8_url": play_url,
@@ -190,20 +407,15 @@ class Parser(Parser):  # 必须继承
             # 出错时返回简化时间戳
             return datetime.now().strftime('%Y%m%d%H%M%S')
 
-    def _async_test_connection(self, url: str):
-        """异步测试连接，不阻塞主流程"""
-        try:
-            # 超时缩短为2秒
-            response = self.session.head(url, proxies=self.proxy_config, timeout=2, verify=False)
-            if response.status_code == 200:
-                self.logger.info(f"连接测试成功: {response.status_code}")
-        except Exception as e:
-            self.logger.debug(f"连接测试跳过: {e}")
-
     def stop(self):
         """停止解析器"""
+        if hasattr(self, 'upstream'):
+            self.upstream.close()
         if hasattr(self, 'session'):
             self.session.close()
+        if hasattr(self, 'segment_cache'):
+            self.logger.info(f"分片缓存统计: {self.segment_cache.stats()}")
+            self.segment_cache.clear()
         self.logger.info("SOCKS5代理解析器已停止")
 
     def proxy(self, url: str, headers: Dict[str, Any]) -> Tuple[Union[bytes, Iterable[bytes]], Dict[str, str]]:
@@ -217,6 +429,7 @@ class Parser(Parser):  # 必须继承
             parsed_url = urllib.parse.urlparse(url)
             query_params = urllib.parse.parse_qs(parsed_url.query)
             target_url = query_params.get('a', [''])[0]
+            engine = query_params.get('engine', [self.engine])[0]
             
             if not target_url:
                 return self._quick_error_response("缺少URL参数a")
@@ -225,24 +438,48 @@ class Parser(Parser):  # 必须继承
             is_m3u8 = self._is_m3u8_request(target_url, headers)
             timeout = 3 if is_m3u8 else 8  # 回看m3u8使用3秒超时
             
-            # 直接请求目标URL（回看参数已经在parse阶段处理完成）
-            response = self.session.get(
-                target_url,
-                proxies=self.proxy_config,
-                timeout=timeout,
-                verify=False,
-                stream=not is_m3u8  # m3u8不使用流式传输
-            )
-            
-            if response.status_code != 200:
-                return self._quick_error_response(f"请求失败: {response.status_code}")
-            
-            # 快速处理响应
-            if is_m3u8:
+            if not is_m3u8:
+                # TS片段优先走缓存，并发未命中合并为一次上游请求
+                data, flight, leader = self.segment_cache.acquire(target_url)
+                if data is None and not leader:
+                    data = self.segment_cache.wait(flight, timeout)
+                    if data is None:
+                        # 合并的上游请求被中断或过慢，单独拉取一次
+                        data, _ = self.segment_cache.get_or_fetch(
+                            target_url, lambda key: self._fetch_segment(key, engine), timeout
+                        )
+
+                if data is not None:
+                    return data, self._segment_headers(start_time, 'HIT', len(data))
+
+                # 未命中：边读上游边转发给播放器，不等待整个分片下载完成
+                # 拉取登记此后由 _SegmentStream 负责结束，之前出错则在这里结束
+                try:
+                    response = self._open_segment(target_url, timeout, engine)
+                    chunks = _SegmentStream(self.segment_cache, target_url, flight, response, self.chunk_size)
+                except Exception as e:
+                    self.segment_cache.complete(target_url, flight, error=e)
+                    raise
+
+                content_length = response.headers.get('Content-Length')
+                return chunks, self._segment_headers(start_time, 'MISS', content_length)
+            else:
+                # 直接请求目标URL（回看参数已经在parse阶段处理完成）
+                response = self.upstream.get(
+                    target_url,
+                    engine,
+                    proxies=self.proxy_config,
+                    timeout=timeout,
+                    verify=False
+                )
+
+                if response.status_code != 200:
+                    return self._quick_error_response(f"请求失败: {response.status_code}")
+
                 # 优化m3u8处理性能
-                content = self._optimized_m3u8_process(response.text, target_url)
+                content = self._optimized_m3u8_process(response.text, target_url, engine)
                 content_bytes = content.encode('utf-8')
-                
+
                 response_headers = {
                     'Content-Type': 'application/vnd.apple.mpegurl',
                     'Content-Length': str(len(content_bytes)),
@@ -250,23 +487,15 @@ class Parser(Parser):  # 必须继承
                     'Cache-Control': 'no-cache, max-age=0',
                     'X-Processing-Time': f'{time.time() - start_time:.2f}s'
                 }
-            else:
-                # TS片段直接返回
-                content_bytes = response.content
-                response_headers = {
-                    'Content-Type': 'video/mp2t',
-                    'Content-Length': str(len(content_bytes)),
-                    'Access-Control-Allow-Origin': '*',
-                    'Cache-Control': 'public, max-age=7200',  # 延长TS缓存时间
-                    'X-Processing-Time': f'{time.time() - start_time:.2f}s'
-                }
-            
+
             total_time = time.time() - start_time
             if total_time > 2.0:  # 只记录较慢的请求
                 self.logger.info(f"代理完成: {len(content_bytes)} bytes, 耗时: {total_time:.2f}s")
             
             return content_bytes, response_headers
             
+        except requests.exceptions.HTTPError as e:
+            return self._quick_error_response(f"请求失败: {e.response.status_code}")
         except requests.exceptions.Timeout:
             return self._quick_error_response("请求超时，请检查网络或源地址")
         except requests.exceptions.ConnectionError:
@@ -274,45 +503,53 @@ class Parser(Parser):  # 必须继承
         except Exception as e:
             return self._quick_error_response(f"代理错误: {str(e)}")
 
+    def _open_segment(self, url: str, timeout: float = 8, engine: str = 'sync') -> requests.Response:
+        """以流式方式打开TS分片请求，非200状态抛出HTTPError"""
+        response = self.upstream.get(
+            url,
+            engine,
+            proxies=self.proxy_config,
+            timeout=timeout,
+            verify=False,
+            stream=True
+        )
+        if response.status_code != 200:
+            response.close()
+            raise requests.exceptions.HTTPError(f"请求失败: {response.status_code}", response=response)
+        return response
+
+    def _fetch_segment(self, url: str, engine: str = 'sync') -> bytes:
+        """通过SOCKS5代理拉取完整TS分片"""
+        response = self._open_segment(url, engine=engine)
+        try:
+            return response.content
+        finally:
+            response.close()
+
+    def _segment_headers(self, start_time: float, cache_status: str, content_length=None) -> Dict[str, str]:
+        """TS分片响应头"""
+        response_headers = {
+            'Content-Type': 'video/mp2t',
+            'Access-Control-Allow-Origin': '*',
+            'Cache-Control': 'public, max-age=7200',  # 延长TS缓存时间
+            'X-Cache': cache_status,
+            'X-Processing-Time': f'{time.time() - start_time:.2f}s'
+        }
+        if content_length is not None:
+            response_headers['Content-Length'] = str(content_length)
+        return response_headers
+
     def _is_m3u8_request(self, url: str, headers: Dict[str, Any]) -> bool:
         """快速判断是否为m3u8请求"""
         return '.m3u8' in url.lower()
 
-    def _optimized_m3u8_process(self, content: str, base_url: str) -> str:
+    def _optimized_m3u8_process(self, content: str, base_url: str, engine: str = '') -> str:
         """
-        优化m3u8处理，提升回看性能
+        优化m3u8处理，提升回看性能（重写器按播放列表地址复用）
         """
-        if not content or not content.strip():
-            return content
-            
-        lines = content.splitlines()
-        processed_lines = []
-        
-        # 预计算基础路径
-        base_dir = base_url.rsplit('/', 1)[0] + '/' if '/' in base_url else base_url
-        
-        for line in lines:
-            if not line or line.startswith('#'):
-                processed_lines.append(line)
-                continue
-                
-            # 快速URL处理
-            if line.startswith(('http://', 'https://')):
-                # 完整URL直接代理
-                proxy_url = f"{self.address}?a={urllib.parse.quote(line, safe='')}"
-                processed_lines.append(proxy_url)
-            else:
-                # 相对路径转换为绝对路径
-                if line.startswith('/'):
-                    parsed = urllib.parse.urlparse(base_url)
-                    full_url = f"{parsed.scheme}://{parsed.netloc}{line}"
-                else:
-                    full_url = urllib.parse.urljoin(base_dir, line)
-                
-                proxy_url = f"{self.address}?a={urllib.parse.quote(full_url, safe='')}"
-                processed_lines.append(proxy_url)
-        
-        return '\n'.join(processed_lines)
+        # 非默认引擎需要透传给分片请求
+        suffix = encode_query({'engine': engine if engine != self.engine else ''})
+        return get_rewriter(self.address, base_url, suffix).rewrite(content)
 
     def _quick_error_response(self, error_msg: str) -> Tuple[bytes, Dict[str, str]]:
         """快速错误响应"""
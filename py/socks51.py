@@ -7,8 +7,268 @@ import re
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import time
-from datetime import datetime, timezone, timedelta
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 import threading
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from lib.playlist import encode_query, get_rewriter
+from lib.catchup import convert_program_time, render_playseek
+from lib.upstream import UpstreamClient
+
+
+class SegmentPrefetcher:
+    """
+    HLS分片预取：播放列表重写后在后台拉取后续K个分片，放入短时缓冲区，
+    proxy收到对应TS请求时直接返回
+    fetch(url, proxies, engine) 与普通分片请求走同一入口（计入代理健康评分、按引擎发送）
+    异步引擎下改用 fetch_async(url, proxies) 协程，经 submit 交给事件循环并发预取，不占用预取线程；
+    submit 返回None（异步引擎不可用）时回退到预取线程
+    """
+
+    def __init__(self, fetch, fetch_async=None, submit=None, workers: int = 4, ttl: float = 30.0,
+                 max_entries: int = 64, max_tracked: int = 4096, max_wait: float = 0.5):
+        self.fetch = fetch
+        self.fetch_async = fetch_async
+        self.submit = submit
+        self.ttl = ttl
+        self.max_wait = max_wait
+        self.max_entries = max_entries
+        self.max_tracked = max_tracked
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='prefetch')
+        self._buffer = OrderedDict()   # key -> (过期时间, 内容)
+        self._pending = {}             # key -> Future
+        self._positions = OrderedDict()  # key -> (分片列表, 下标, 预取深度, 代理配置, 引擎)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def on_playlist(self, entries, proxies: Dict[str, str], depth: int, is_live: bool, engine: str = 'sync'):
+        """
+        记录媒体播放列表的分片顺序并预取首批分片
+        entries为 [(key, 实际请求URL), ...]；直播取最新的depth个，点播/回看取开头的depth个
+        """
+        if depth <= 0 or not entries:
+            return
+        entries = tuple(entries)
+        with self._lock:
+            for index, (key, _) in enumerate(entries):
+                self._positions[key] = (entries, index, depth, proxies, engine)
+                self._positions.move_to_end(key)
+            while len(self._positions) > self.max_tracked:
+                self._positions.popitem(last=False)
+        self._schedule(entries[-depth:] if is_live else entries[:depth], proxies, engine)
+
+    def advance(self, key):
+        """某个分片被请求后，预取它之后的depth个分片"""
+        with self._lock:
+            position = self._positions.get(key)
+        if position is None:
+            return
+        entries, index, depth, proxies, engine = position
+        self._schedule(entries[index + 1:index + 1 + depth], proxies, engine)
+
+    def take(self, key, timeout: float) -> Union[bytes, None]:
+        """
+        取出预取的分片，无可用内容返回None
+        预取仍在进行时最多等 min(timeout, max_wait) 秒，慢了就让调用方直接请求，预取照常完成写入缓冲区
+        """
+        with self._lock:
+            item = self._buffer.get(key)
+            if item is not None:
+                expire_at, data = item
+                if expire_at > time.time():
+                    self.hits += 1
+                    return data
+                del self._buffer[key]
+            future = self._pending.get(key)
+        if future is None:
+            with self._lock:
+                if key in self._positions:
+                    self.misses += 1
+            return None
+        try:
+            data = future.result(timeout=min(timeout, self.max_wait))
+        except Exception:
+            data = None
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return data
+
+    def _schedule(self, entries, proxies: Dict[str, str], engine: str):
+        now = time.time()
+        submitted = []
+        with self._lock:
+            for key, fetch_url in entries:
+                item = self._buffer.get(key)
+                if key in self._pending or (item is not None and item[0] > now):
+                    continue
+                future = None
+                if engine == 'async' and self.fetch_async is not None:
+                    future = self.submit(self.fetch_async(fetch_url, proxies))
+                if future is None:
+                    future = self._executor.submit(self._fetch, key, fetch_url, proxies, engine)
+                else:
+                    submitted.append((key, future))
+                self._pending[key] = future
+        # 已完成的Future会在add_done_callback里立即回调，回调要加锁，所以放到锁外登记
+        for key, future in submitted:
+            future.add_done_callback(lambda done, key=key: self._fetched(key, done))
+
+    def _fetch(self, key, fetch_url: str, proxies: Dict[str, str], engine: str) -> Union[bytes, None]:
+        data = None
+        try:
+            data = self.fetch(fetch_url, proxies, engine)
+        except Exception:
+            pass
+        finally:
+            self._store(key, data)
+        return data
+
+    def _fetched(self, key, future: Future):
+        """事件循环中的预取完成后回调"""
+        try:
+            data = future.result()
+        except Exception:
+            data = None
+        self._store(key, data)
+
+    def _store(self, key, data: Union[bytes, None]):
+        with self._lock:
+            self._pending.pop(key, None)
+            if data is not None:
+                self._buffer[key] = (time.time() + self.ttl, data)
+                self._buffer.move_to_end(key)
+                while len(self._buffer) > self.max_entries:
+                    self._buffer.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        """返回预取统计信息"""
+        with self._lock:
+            return {
+                'buffered': len(self._buffer),
+                'pending': len(self._pending),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+        with self._lock:
+            self._buffer.clear()
+            self._positions.clear()
+
+
+class _CachedPlaylist:
+    """缓存的播放列表文本及其新鲜/过期时间"""
+
+    def __init__(self, text: str, fresh_until: float, stale_until: float):
+        self.text = text
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+
+class PlaylistCache:
+    """
+    播放列表短TTL缓存：TTL取 #EXT-X-TARGETDURATION 的一半（点播/回看列表更长），
+    同一地址的并发请求只拉取一次上游；过期不久的条目先返回旧内容，同时在后台刷新
+    可返回旧内容的时长按直播刷新间隔的 stale_factor 倍封顶，点播列表里带签名的分片地址不会过期太久
+    """
+
+    _TARGET_DURATION = re.compile(r'#EXT-X-TARGETDURATION:\s*(\d+(?:\.\d+)?)')
+
+    def __init__(self, max_entries: int = 256, default_ttl: float = 2.0, vod_ttl: float = 300.0,
+                 stale_factor: float = 3.0, workers: int = 2):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.vod_ttl = vod_ttl
+        self.stale_factor = stale_factor
+        self._entries = OrderedDict()
+        self._inflight = {}  # key -> Future
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='playlist-refresh')
+
+    def refresh_interval(self, text: str) -> float:
+        """直播列表的刷新间隔：目标分片时长的一半"""
+        match = self._TARGET_DURATION.search(text)
+        if match:
+            return max(float(match.group(1)) / 2, 0.5)
+        return self.default_ttl
+
+    def ttl_for(self, text: str) -> float:
+        """根据播放列表内容计算缓存时间"""
+        if '#EXT-X-ENDLIST' in text:
+            return self.vod_ttl
+        return self.refresh_interval(text)
+
+    def get(self, key, fetch, timeout: float = 10) -> Tuple[str, str]:
+        """
+        返回 (播放列表文本, 缓存状态)，状态为 HIT / STALE / MISS
+        fetch() 拉取上游文本，失败时抛出异常并传递给所有等待者；等待别人的拉取最多 timeout 秒
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now < entry.fresh_until:
+                self._entries.move_to_end(key)
+                return entry.text, 'HIT'
+            future = self._inflight.get(key)
+            if entry is not None and now < entry.stale_until:
+                if future is None:
+                    self._start(key, fetch, background=True)
+                return entry.text, 'STALE'
+            leader = future is None
+            if leader:
+                future = self._start(key, fetch, background=False)
+
+        if leader:
+            self._run(key, fetch, future)
+        try:
+            return future.result(timeout), 'MISS'
+        except FutureTimeoutError:
+            raise requests.exceptions.Timeout("等待播放列表超时")
+
+    def _start(self, key, fetch, background: bool) -> Future:
+        future = self._inflight[key] = Future()
+        if background:
+            try:
+                self._executor.submit(self._run, key, fetch, future)
+            except RuntimeError:
+                # 已 shutdown：不再后台刷新，本次仍返回旧内容
+                del self._inflight[key]
+                future.cancel()
+        return future
+
+    def _run(self, key, fetch, future: Future):
+        try:
+            text = fetch()
+        except Exception as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            return
+        now = time.time()
+        ttl = self.ttl_for(text)
+        stale = self.refresh_interval(text) * (self.stale_factor - 1)
+        with self._lock:
+            self._inflight.pop(key, None)
+            self._entries[key] = _CachedPlaylist(text, now + ttl, now + ttl + stale)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        future.set_result(text)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+        with self._lock:
+            self._entries.clear()
+
 
 class Parser(Parser):
 
@@ -16,11 +276,26 @@ class Parser(Parser):
         super().__init__(*args, **kwargs)
         self.proxy_config = None
         self.session = self._create_optimized_session()
+
+        # 默认请求引擎：sync(requests) / async(asyncio内核)，可用 engine 参数按请求切换
+        self.engine = 'sync'
+
+        # 播放列表短TTL缓存（多个客户端刷新同一直播列表时共享上游请求）
+        self.playlist_cache = PlaylistCache()
         
         logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
         self.logger = logging.getLogger(__name__)
         self.logger.info("节目单回看优化版SOCKS5代理解析器初始化完成")
 
+        # 后台代理健康监测（单线程定期探测，替代每次parse启动的测试线程）
+        self.upstream = UpstreamClient(self.session, logger=self.logger)
+        self.health_monitor = self.upstream.health
+
+        # 分片预取（默认关闭，可通过 prefetch=K 参数开启）
+        self.prefetch_depth = 0
+        self.prefetcher = SegmentPrefetcher(self._prefetch_segment, self._prefetch_segment_async,
+                                            self.upstream.submit)
+
     def _create_optimized_session(self) -> requests.Session:
         """创建优化的HTTP会话"""
         session = requests.Session()
@@ -49,14 +324,25 @@ class Parser(Parser):
 
     def _get_proxy_config(self, params: Dict[str, str]) -> Dict[str, str]:
         """从参数中获取代理配置"""
-        proxy_url = params.get("proxy", "").strip()
-        if proxy_url and proxy_url.startswith('socks5://'):
+        proxy_url = self._select_proxy(params.get("proxy", ""))
+        if proxy_url:
             return {
                 "http": proxy_url,
                 "https": proxy_url
             }
         return {}
 
+    def _split_proxies(self, proxy_param: str) -> list:
+        """proxy参数支持逗号分隔的多个socks5地址"""
+        return [p.strip() for p in proxy_param.split(',') if p.strip().startswith('socks5://')]
+
+    def _select_proxy(self, proxy_param: str) -> str:
+        """按健康评分从候选代理中选出最优的一个，无可用代理时返回空字符串（直连）"""
+        candidates = self._split_proxies(proxy_param)
+        if len(candidates) > 1:
+            return self.health_monitor.best(candidates)
+        return candidates[0] if candidates else ""
+
     def parse(self, params: Dict[str, str]) -> Dict[str, str]:
         """
         解析参数并返回代理播放地址，优化节目单回看支持
@@ -104,25 +390,33 @@ class Parser(Parser):
                 query_params += f"&start={urllib.parse.quote(start_time, safe='')}"
             if end_time:
                 query_params += f"&end={urllib.parse.quote(end_time, safe='')}"
+
+            engine = params.get("engine", "").strip()
+            if engine:
+                query_params += f"&engine={urllib.parse.quote(engine, safe='')}"
+
+            prefetch_depth = self._get_prefetch_depth(params.get("prefetch", ""))
+            if prefetch_depth:
+                query_params += f"&prefetch={prefetch_depth}"
             
             proxy_play_url = f"{self.address}?{query_params}"
             
-            # 异步测试连接
-            if proxy_config:
-                test_thread = threading.Thread(target=self._async_test_connection, args=(original_play_url, proxy_config))
-                test_thread.daemon = True
-                test_thread.start()
+            # 登记到后台健康监测
+            for candidate in self._split_proxies(params.get("proxy", "")):
+                self.health_monitor.register(candidate, original_play_url)
             
             return {
                 "url": proxy_play_url,
                 "proxy_type": "动态SOCKS5" if proxy_config else "直连",
                 "proxy_server": params.get("proxy", "无"),
+                "engine": engine or self.engine,
                 "status": "ready",
                 "play_url": proxy_play_url,
                 "m3u8_url": original_play_url,
                 "playseek": playseek if playseek else "无",
                 "start_time": start_time if start_time else "无",
                 "end_time": end_time if end_time else "无",
+                "prefetch": prefetch_depth,
                 "note": f"节目单回看优化版 - {proxy_note}"
             }
             
@@ -132,170 +426,45 @@ class Parser(Parser):
                 "error": f"解析失败: {str(e)}"
             }
 
+    def _get_prefetch_depth(self, value: str) -> int:
+        """解析预取深度参数，未指定时使用默认值"""
+        try:
+            return max(0, min(int(value), 10)) if value else self.prefetch_depth
+        except ValueError:
+            return self.prefetch_depth
+
     def _convert_program_time(self, start_time: str, end_time: str) -> str:
         """
-        转换节目单时间格式为回看参数
+        转换节目单时间格式为回看参数（结果按当天缓存，见 lib/catchup.py）
         支持格式：
         - "11-20 07:00-08:00" (月-日 时:分-时:分)
         - "2024-11-20 07:00:00-2024-11-20 08:00:00" (完整日期时间)
         - "07:00-08:00" (当天时间，自动补全日期)
+        - "20241120070000" (yyyyMMddHHmmss)
         """
         try:
-            # 清理时间字符串
-            start_time = start_time.strip()
-            end_time = end_time.strip()
-            
-            # 如果包含日期信息（如"11-20 07:00-08:00"）
-            if ' ' in start_time and ' ' in end_time:
-                start_date_part, start_time_part = start_time.split(' ', 1)
-                end_date_part, end_time_part = end_time.split(' ', 1)
-                
-                # 处理月份-日期格式（如"11-20"）
-                if '-' in start_date_part and len(start_date_part.split('-')) == 2:
-                    month, day = start_date_part.split('-')
-                    current_year = datetime.now().year
-                    start_datetime_str = f"{current_year}-{month}-{day} {start_time_part}"
-                    end_datetime_str = f"{current_year}-{end_date_part.split('-')[0]}-{end_date_part.split('-')[1]} {end_time_part}"
-                else:
-                    start_datetime_str = start_time
-                    end_datetime_str = end_time
-            else:
-                # 只有时间，使用当天日期
-                current_date = datetime.now().strftime("%Y-%m-%d")
-                start_datetime_str = f"{current_date} {start_time}"
-                end_datetime_str = f"{current_date} {end_time}"
-            
-            # 解析日期时间
-            start_dt = self._parse_datetime_string(start_datetime_str)
-            end_dt = self._parse_datetime_string(end_datetime_str)
-            
-            # 转换为回看格式：yyyyMMddHHmmss
-            playseek_format = "%Y%m%d%H%M%S"
-            start_formatted = start_dt.strftime(playseek_format)
-            end_formatted = end_dt.strftime(playseek_format)
-            
-            return f"{start_formatted}-{end_formatted}"
-            
+            return convert_program_time(start_time, end_time)
         except Exception as e:
             self.logger.warning(f"转换节目时间失败 {start_time}-{end_time}: {e}")
             # 返回原始时间戳作为fallback
             return f"{int(time.time()*1000)}-{int(time.time()*1000)+3600000}"
 
-    def _parse_datetime_string(self, datetime_str: str) -> datetime:
-        """
-        解析各种日期时间字符串格式
-        """
-        try:
-            # 尝试常见格式
-            formats = [
-                "%Y-%m-%d %H:%M:%S",
-                "%Y-%m-%d %H:%M",
-                "%m-%d %H:%M:%S", 
-                "%m-%d %H:%M",
-                "%H:%M:%S",
-                "%H:%M"
-            ]
-            
-            current_year = datetime.now().year
-            current_date = datetime.now().strftime("%Y-%m-%d")
-            
-            for fmt in formats:
-                try:
-                    dt = datetime.strptime(datetime_str, fmt)
-                    # 如果格式中没有年份，添加当前年份
-                    if fmt.startswith("%m-") or fmt.startswith("%H"):
-                        dt = dt.replace(year=current_year)
-                    return dt
-                except ValueError:
-                    continue
-            
-            # 如果所有格式都失败，使用当前时间
-            return datetime.now()
-            
-        except Exception:
-            return datetime.now()
-
-    def _parse_time_expression(self, time_expr: str) -> str:
-        """
-        解析酷九风格的时间表达式
-        """
-        try:
-            clean_expr = time_expr.strip()
-            if clean_expr.startswith('${(') and clean_expr.endswith(')}'):
-                clean_expr = clean_expr[3:-2]
-            else:
-                return clean_expr
-            
-            if '|' in clean_expr:
-                format_part, timezone_str = clean_expr.split('|', 1)
-            else:
-                format_part, timezone_str = clean_expr, None
-            
-            if format_part in ['b', 'e']:
-                return str(int(time.time() * 1000))
-            elif format_part in ['b10', 'e10']:
-                return str(int(time.time()))
-            else:
-                time_format = format_part
-                if time_format.startswith('b') and len(time_format) > 1:
-                    time_format = time_format[1:]
-                elif time_format.startswith('e') and len(time_format) > 1:
-                    time_format = time_format[1:]
-                
-                format_mapping = {
-                    'yyyy': '%Y', 'MM': '%m', 'dd': '%d',
-                    'HH': '%H', 'mm': '%M', 'ss': '%S'
-                }
-                
-                py_format = time_format
-                for k, v in format_mapping.items():
-                    py_format = py_format.replace(k, v)
-                
-                if timezone_str:
-                    tz_offsets = {
-                        'Asia/Shanghai': 8, 'UTC': 0, 'GMT': 0,
-                        'US/Eastern': -5, 'US/Pacific': -8,
-                        'Europe/London': 0, 'Europe/Paris': 1,
-                        'Asia/Tokyo': 9, 'Australia/Sydney': 10,
-                    }
-                    
-                    offset_hours = tz_offsets.get(timezone_str, 8)
-                    tz = timezone(timedelta(hours=offset_hours))
-                    now = datetime.now(tz)
-                else:
-                    now = datetime.now()
-                
-                return now.strftime(py_format)
-                
-        except Exception as e:
-            self.logger.warning(f"解析时间表达式失败 {time_expr}: {e}")
-            return str(int(time.time() * 1000))
-
     def _process_playseek_expression(self, playseek_expr: str) -> str:
-        """处理playseek表达式"""
-        if not playseek_expr or '-' not in playseek_expr:
-            return playseek_expr
-        
+        """处理playseek表达式（酷九风格表达式按字符串编译一次后复用）"""
         try:
-            start_expr, end_expr = playseek_expr.split('-', 1)
-            start_time = self._parse_time_expression(start_expr.strip())
-            end_time = self._parse_time_expression(end_expr.strip())
-            return f"{start_time}-{end_time}"
+            return render_playseek(playseek_expr)
         except Exception as e:
             self.logger.warning(f"处理playseek表达式失败: {e}")
             return playseek_expr
 
-    def _async_test_connection(self, url: str, proxy_config: Dict[str, str]):
-        """异步测试连接"""
-        try:
-            response = self.session.head(url, proxies=proxy_config, timeout=1, verify=False)
-            if response.status_code == 200:
-                self.logger.info(f"连接测试成功: {response.status_code}")
-        except Exception as e:
-            self.logger.debug(f"连接测试跳过: {e}")
-
     def stop(self):
         """停止解析器"""
+        if hasattr(self, 'upstream'):
+            self.upstream.close()
+        if hasattr(self, 'prefetcher'):
+            self.prefetcher.shutdown()
+        if hasattr(self, 'playlist_cache'):
+            self.playlist_cache.shutdown()
         if hasattr(self, 'session'):
             self.session.close()
         self.logger.info("代理解析器已停止")
@@ -310,17 +479,20 @@ class Parser(Parser):
             parsed_url = urllib.parse.urlparse(url)
             query_params = urllib.parse.parse_qs(parsed_url.query)
             target_url = query_params.get('a', [''])[0]
-            proxy_url = query_params.get('proxy', [''])[0]
+            proxy_param = query_params.get('proxy', [''])[0]
             playseek_expr = query_params.get('playseek', [''])[0]
             start_param = query_params.get('start', [''])[0]    # 新增：开始时间
             end_param = query_params.get('end', [''])[0]        # 新增：结束时间
+            engine = query_params.get('engine', [self.engine])[0]
+            prefetch_depth = self._get_prefetch_depth(query_params.get('prefetch', [''])[0])
             
             if not target_url:
                 return self._quick_error_response("缺少URL参数a")
             
-            # 动态获取代理配置
+            # 动态获取代理配置（多个代理时选择健康评分最优的）
+            proxy_url = self._select_proxy(proxy_param)
             proxy_config = {}
-            if proxy_url and proxy_url.startswith('socks5://'):
+            if proxy_url:
                 proxy_config = {
                     "http": proxy_url,
                     "https": proxy_url
@@ -340,29 +512,65 @@ class Parser(Parser):
             # 判断请求类型并设置超时
             is_m3u8 = self._is_m3u8_request(final_target_url, headers)
             timeout = 2 if is_m3u8 else 5
+
+            if not is_m3u8:
+                # 优先返回预取好的分片
+                prefetch_key = (target_url, proxy_param)
+                data = self.prefetcher.take(prefetch_key, timeout)
+                self.prefetcher.advance(prefetch_key)
+                if data is not None:
+                    return data, {
+                        'Content-Type': 'video/mp2t',
+                        'Content-Length': str(len(data)),
+                        'Access-Control-Allow-Origin': '*',
+                        'Cache-Control': 'public, max-age=3600',
+                        'X-Processing-Time': f'{time.time() - start_time:.2f}s',
+                        'X-Playseek': final_playseek if final_playseek else 'none',
+                        'X-Prefetch': 'HIT'
+                    }
             
-            # 直接请求目标URL
-            response = self.session.get(
-                final_target_url,
-                proxies=proxy_config,
-                timeout=timeout,
-                verify=False,
-                stream=True
-            )
-            
-            if response.status_code != 200:
-                return self._quick_error_response(f"请求失败: {response.status_code}")
+            if is_m3u8:
+                # 播放列表走短TTL缓存，并发请求合并为一次上游拉取
+                playlist_text, cache_status = self.playlist_cache.get(
+                    (final_target_url, proxy_url, engine),
+                    lambda: self._fetch_playlist(final_target_url, engine, proxy_config, timeout),
+                    timeout + 1
+                )
+            else:
+                # 直接请求目标URL
+                response = self.upstream.get(
+                    final_target_url,
+                    engine,
+                    proxies=proxy_config,
+                    timeout=timeout,
+                    verify=False,
+                    stream=True
+                )
+
+                if response.status_code != 200:
+                    return self._quick_error_response(f"请求失败: {response.status_code}")
             
             # 快速处理响应
             if is_m3u8:
+                segments = [] if prefetch_depth else None
                 content = self._optimized_m3u8_process(
-                    response.text, 
+                    playlist_text, 
                     final_target_url, 
-                    proxy_url, 
+                    proxy_param, 
                     playseek_expr,
                     start_param,  # 传递节目单参数
-                    end_param
+                    end_param,
+                    engine,
+                    prefetch_depth,
+                    segments
                 )
+                if segments:
+                    entries = [
+                        ((segment_url, proxy_param), self._apply_playseek_to_url(segment_url, final_playseek))
+                        for segment_url in segments
+                    ]
+                    is_live = '#EXT-X-ENDLIST' not in playlist_text
+                    self.prefetcher.on_playlist(entries, proxy_config, prefetch_depth, is_live, engine)
                 content_bytes = content.encode('utf-8')
                 
                 response_headers = {
@@ -373,7 +581,8 @@ class Parser(Parser):
                     'X-Processing-Time': f'{time.time() - start_time:.2f}s',
                     'X-Playseek': final_playseek if final_playseek else 'none',
                     'X-Program-Start': start_param if start_param else 'none',
-                    'X-Program-End': end_param if end_param else 'none'
+                    'X-Program-End': end_param if end_param else 'none',
+                    'X-Cache': cache_status
                 }
                 
                 return content_bytes, response_headers
@@ -388,6 +597,8 @@ class Parser(Parser):
                 
                 return response.iter_content(chunk_size=8192), response_headers
                 
+        except requests.exceptions.HTTPError as e:
+            return self._quick_error_response(f"请求失败: {e.response.status_code}")
         except requests.exceptions.Timeout:
             return self._quick_error_response("请求超时，请检查网络或源地址")
         except requests.exceptions.ConnectionError:
@@ -395,6 +606,26 @@ class Parser(Parser):
         except Exception as e:
             return self._quick_error_response(f"代理错误: {str(e)}")
 
+    def _prefetch_segment(self, url: str, proxies: Dict[str, str], engine: str) -> Union[bytes, None]:
+        """预取线程拉取完整分片，与普通分片请求同样经 upstream 发出"""
+        response = self.upstream.get(url, engine, proxies=proxies, timeout=5, verify=False)
+        try:
+            return response.content if response.status_code == 200 else None
+        finally:
+            response.close()
+
+    async def _prefetch_segment_async(self, url: str, proxies: Dict[str, str]) -> Union[bytes, None]:
+        """异步引擎下的预取，在事件循环中完成"""
+        status, body = await self.upstream.read_async(url, proxies=proxies, timeout=5)
+        return body if status == 200 else None
+
+    def _fetch_playlist(self, url: str, engine: str, proxy_config: Dict[str, str], timeout: float) -> str:
+        """拉取上游播放列表文本，非200状态抛出HTTPError"""
+        response = self.upstream.get(url, engine, proxies=proxy_config, timeout=timeout, verify=False)
+        if response.status_code != 200:
+            raise requests.exceptions.HTTPError(f"请求失败: {response.status_code}", response=response)
+        return response.text
+
     def _apply_playseek_to_url(self, target_url: str, playseek: str) -> str:
         """将回看参数应用到目标URL"""
         if not playseek:
@@ -417,58 +648,22 @@ class Parser(Parser):
         return '.m3u8' in url.lower() or headers.get('Accept', '').find('mpegurl') != -1
 
     def _optimized_m3u8_process(self, content: str, base_url: str, proxy_url: str = "", 
-                               playseek_expr: str = "", start_time: str = "", end_time: str = "") -> str:
+                               playseek_expr: str = "", start_time: str = "", end_time: str = "",
+                               engine: str = "",
+                               prefetch_depth: int = 0, segments: list = None) -> str:
         """
-        优化m3u8处理，支持节目单参数传递
+        优化m3u8处理，支持节目单参数传递（重写器按播放列表地址与参数复用）
+        segments不为None时，按顺序收集媒体分片的绝对URL（供预取使用）
         """
-        if not content or not content.strip():
-            return content
-            
-        lines = content.splitlines()
-        processed_lines = []
-        
-        base_dir = base_url.rsplit('/', 1)[0] + '/' if '/' in base_url else base_url
-        
-        for line in lines:
-            if not line or line.startswith('#'):
-                processed_lines.append(line)
-                continue
-                
-            if line.startswith(('http://', 'https://')):
-                query_params = f"a={urllib.parse.quote(line, safe='')}"
-                if proxy_url:
-                    query_params += f"&proxy={urllib.parse.quote(proxy_url, safe='')}"
-                if playseek_expr:
-                    query_params += f"&playseek={urllib.parse.quote(playseek_expr, safe='')}"
-                # 传递节目单时间参数
-                if start_time:
-                    query_params += f"&start={urllib.parse.quote(start_time, safe='')}"
-                if end_time:
-                    query_params += f"&end={urllib.parse.quote(end_time, safe='')}"
-                
-                proxy_url_full = f"{self.address}?{query_params}"
-                processed_lines.append(proxy_url_full)
-            else:
-                if line.startswith('/'):
-                    parsed = urllib.parse.urlparse(base_url)
-                    full_url = f"{parsed.scheme}://{parsed.netloc}{line}"
-                else:
-                    full_url = urllib.parse.urljoin(base_dir, line)
-                
-                query_params = f"a={urllib.parse.quote(full_url, safe='')}"
-                if proxy_url:
-                    query_params += f"&proxy={urllib.parse.quote(proxy_url, safe='')}"
-                if playseek_expr:
-                    query_params += f"&playseek={urllib.parse.quote(playseek_expr, safe='')}"
-                if start_time:
-                    query_params += f"&start={urllib.parse.quote(start_time, safe='')}"
-                if end_time:
-                    query_params += f"&end={urllib.parse.quote(end_time, safe='')}"
-                
-                proxy_url_full = f"{self.address}?{query_params}"
-                processed_lines.append(proxy_url_full)
-        
-        return '\n'.join(processed_lines)
+        suffix = encode_query({
+            'proxy': proxy_url,
+            'playseek': playseek_expr,
+            'start': start_time,
+            'end': end_time,
+            'engine': engine if engine != self.engine else '',
+            'prefetch': prefetch_depth,
+        })
+        return get_rewriter(self.address, base_url, suffix).rewrite(content, segments)
 
     def _quick_error_response(self, error_msg: str) -> Tuple[bytes, Dict[str, str]]:
         """快速错误响应"""
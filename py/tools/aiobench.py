@@ -0,0 +1,188 @@
+"""
+lib/aioproxy 与 requests 同步实现的对比基准（依赖 aiohttp、aiohttp_socks）
+
+    python tools/aiobench.py --size 32 --chunk 65536 -n 5 -c 16
+
+子进程里起一个返回 --size MB 数据的HTTP服务，直连（不走代理）测三组：
+  - 单路流式读取：requests 同步实现、AsyncProxyEngine 每块同步往返（原做法）、预读队列批量交付，
+    输出吞吐以及调用线程每MB消耗的CPU时间
+  - 并发流式读取：-c 个线程（模拟宿主的请求线程）同时读取，对比两种引擎的总吞吐、进程CPU与线程数峰值
+  - 后台整段拉取（分片预取）：-c 个分片，同步实现交给 4 个工作线程，异步实现全部在事件循环中完成
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib.aioproxy import AsyncProxyEngine
+
+
+def _serve(size, ports):
+    payload = os.urandom(1024 * 1024)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'video/mp2t')
+            self.send_header('Content-Length', str(size * len(payload)))
+            self.end_headers()
+            for _ in range(size):
+                self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    ports.put(server.server_port)
+    server.serve_forever()
+
+
+def serve(size):
+    """HTTP服务放在子进程里，它的连接线程不计入本进程的线程数与CPU"""
+    ports = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve, args=(size, ports), daemon=True)
+    process.start()
+    return process, ports.get(timeout=10)
+
+
+def legacy(engine, response, chunk_size):
+    """原做法：每块一次跨线程同步往返"""
+    raw = response._response
+    while True:
+        chunk = engine.run(raw.content.read(chunk_size))
+        if not chunk:
+            break
+        yield chunk
+    response.close()
+
+
+class ThreadPeak:
+    """后台采样进程内的线程数峰值（不含采样线程自身）"""
+
+    def __init__(self):
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(0.005):
+            self.peak = max(self.peak, threading.active_count() - 1)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def single(args, url, session, engine):
+    print(f"单路流式读取 {args.size} MB x {args.n}")
+    cases = (
+        ('requests', lambda: session.get(url, stream=True, timeout=10).iter_content(args.chunk)),
+        ('每块往返', lambda: legacy(engine, engine.get(url, stream=True, timeout=10), args.chunk)),
+        ('队列批量', lambda: engine.get(url, stream=True, timeout=10).iter_content(args.chunk)),
+    )
+    for name, open_stream in cases:
+        wall = cpu = 0.0
+        for i in range(args.n + 1):
+            wall_start, cpu_start = time.perf_counter(), time.thread_time()
+            total = sum(len(chunk) for chunk in open_stream())
+            assert total == args.size * 1024 * 1024, total
+            if i:  # 第一次预热连接池
+                wall += time.perf_counter() - wall_start
+                cpu += time.thread_time() - cpu_start
+        megabytes = args.size * args.n
+        print(f"  {name:<8}: {megabytes / wall:8.1f} MB/s  调用线程 {cpu / megabytes * 1000:6.2f} ms CPU/MB")
+
+
+def run_concurrent(workers, jobs, task):
+    """在 workers 个线程里跑 jobs 个任务，返回 (耗时, 进程CPU, 线程数峰值)"""
+    with ThreadPeak() as peak:
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for total in pool.map(lambda _: task(), range(jobs)):
+                assert total > 0
+        wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+    return wall, cpu, peak.peak
+
+
+def report(name, megabytes, wall, cpu, threads):
+    print(f"  {name:<8}: {megabytes / wall:8.1f} MB/s  进程 {cpu / megabytes * 1000:6.2f} ms CPU/MB  "
+          f"线程峰值 {threads}")
+
+
+def concurrent_streams(args, url, session, engine):
+    print(f"并发流式读取 {args.c} 路 x {args.size} MB")
+    cases = (
+        ('requests', lambda: sum(len(chunk) for chunk in
+                                 session.get(url, stream=True, timeout=10).iter_content(args.chunk))),
+        ('async', lambda: sum(len(chunk) for chunk in
+                              engine.get(url, stream=True, timeout=10).iter_content(args.chunk))),
+    )
+    for name, task in cases:
+        report(name, args.c * args.size, *run_concurrent(args.c, args.c, task))
+
+
+def background_fetch(args, url, session, engine):
+    print(f"后台整段拉取 {args.c} 个分片 x {args.size} MB")
+
+    def sync_fetch():
+        with ThreadPeak() as peak:
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                futures = [pool.submit(lambda: len(session.get(url, timeout=10).content)) for _ in range(args.c)]
+                assert all(future.result() for future in futures)
+            return time.perf_counter() - wall_start, time.process_time() - cpu_start, peak.peak
+
+    async def read():
+        status, body = await engine.read(url, timeout=10)
+        return len(body)
+
+    def async_fetch():
+        with ThreadPeak() as peak:
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+            futures = [engine.submit(read()) for _ in range(args.c)]
+            assert all(future.result() for future in futures)
+            return time.perf_counter() - wall_start, time.process_time() - cpu_start, peak.peak
+
+    for name, fetch in (('requests', sync_fetch), ('async', async_fetch)):
+        report(name, args.c * args.size, *fetch())
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='requests 与异步内核对比基准')
+    arg_parser.add_argument('--size', type=int, default=32, help='响应大小（MB）')
+    arg_parser.add_argument('--chunk', type=int, default=64 * 1024, help='分块大小')
+    arg_parser.add_argument('-n', type=int, default=5, help='单路读取的重复次数')
+    arg_parser.add_argument('-c', type=int, default=16, help='并发路数 / 后台拉取的分片数')
+    args = arg_parser.parse_args()
+
+    server, port = serve(args.size)
+    url = f"http://127.0.0.1:{port}/segment.ts"
+    session = requests.Session()
+    session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=args.c))
+    engine = AsyncProxyEngine()
+    try:
+        print(f"基线线程数 {threading.active_count()}（含事件循环线程）")
+        single(args, url, session, engine)
+        concurrent_streams(args, url, session, engine)
+        background_fetch(args, url, session, engine)
+    finally:
+        engine.close()
+        session.close()
+        server.terminate()
+
+
+if __name__ == '__main__':
+    main()
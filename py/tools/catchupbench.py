@@ -0,0 +1,67 @@
+"""
+lib/catchup 回看时间解析的微基准
+
+    python tools/catchupbench.py -n 20000
+
+常见EPG回看表达式与节目单时间格式，对比编译缓存命中、每次重新编译，
+以及节目单时间原先逐个格式尝试 strptime 的做法。
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib.catchup import _convert_program_time, compile_time_expression, convert_program_time, render_playseek
+
+EXPRESSIONS = [
+    '${(b)yyyyMMddHHmmss}-${(e)yyyyMMddHHmmss}',
+    '${(b)yyyyMMddHHmmss|UTC}-${(e)yyyyMMddHHmmss|UTC}',
+    '${(b)yyyy-MM-dd HH:mm:ss|Asia/Shanghai}-${(e)yyyy-MM-dd HH:mm:ss|Asia/Shanghai}',
+    '${(b)}-${(e)}',
+    '${(b10)}-${(e10)}',
+    '${(yyyyMMddHHmmss|GMT+08:00)}-${(yyyyMMddHHmmss|GMT+08:00)}',
+]
+PROGRAMS = [
+    ('11-20 07:00', '11-20 08:00'),
+    ('2024-11-20 07:00:00', '2024-11-20 08:00:00'),
+    ('07:00', '08:00'),
+    ('20241120070000', '20241120080000'),
+]
+
+
+def legacy_parse(text):
+    # 原先逐个格式尝试 strptime 的做法
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%m-%d %H:%M:%S", "%m-%d %H:%M", "%H:%M:%S", "%H:%M"):
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return datetime.now()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='回看时间解析微基准')
+    arg_parser.add_argument('-n', type=int, default=20000, help='每项的运行次数')
+    args = arg_parser.parse_args()
+    runs = args.n
+
+    for expr in EXPRESSIONS:
+        print(f"{expr}\n    -> {render_playseek(expr)}")
+        cached = timeit.timeit(lambda: render_playseek(expr), number=runs) / runs
+        cold = timeit.timeit(lambda: (compile_time_expression.cache_clear(), render_playseek(expr)),
+                             number=runs) / runs
+        print(f"    cached {cached * 1e6:.1f} us, uncached {cold * 1e6:.1f} us")
+
+    for start, end in PROGRAMS:
+        print(f"{start} / {end} -> {convert_program_time(start, end)}")
+        cached = timeit.timeit(lambda: convert_program_time(start, end), number=runs) / runs
+        cold = timeit.timeit(lambda: (_convert_program_time.cache_clear(), convert_program_time(start, end)),
+                             number=runs) / runs
+        legacy = timeit.timeit(lambda: (legacy_parse(start), legacy_parse(end)), number=runs) / runs
+        print(f"    cached {cached * 1e6:.1f} us, uncached {cold * 1e6:.1f} us, strptime loop {legacy * 1e6:.1f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+lib/extract 的 pl=3 提取微基准
+
+    python tools/extractbench.py -n 3
+
+多线路、上千集的模拟详情页上，对比各爬虫原先复制的 extract_middle_text（每段复制整页）
+与 lib/extract 的单次扫描，两者结果先互相校验一致。
+"""
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib.extract import extract_middle_text
+
+XURL = 'https://www.example.com'
+PATTERN = r'href="(.*?)".*?>(.*?)</a>'
+
+
+def legacy(text, start_str, end_str, pl, start_index1='', end_index2='', xurl=''):
+    # 原各爬虫中的 pl=3 实现
+    plx = []
+    while True:
+        start_index = text.find(start_str)
+        if start_index == -1:
+            break
+        end_index = text.find(end_str, start_index + len(start_str))
+        if end_index == -1:
+            break
+        middle_text = text[start_index + len(start_str):end_index]
+        plx.append(middle_text)
+        text = text.replace(start_str + middle_text + end_str, '')
+    if len(plx) > 0:
+        purl = ''
+        for i in range(len(plx)):
+            matches = re.findall(start_index1, plx[i])
+            output = ""
+            for match in matches:
+                match3 = re.search(r'(?:^|[^0-9])(\d+)(?:[^0-9]|$)', match[1])
+                if match3:
+                    number = match3.group(1)
+                else:
+                    number = 0
+                if 'http' not in match[0]:
+                    output += f"#{match[1]}${number}{xurl}{match[0]}"
+                else:
+                    output += f"#{match[1]}${number}{match[0]}"
+            output = output[1:]
+            purl = purl + output + "$$$"
+        purl = purl[:-3]
+        return purl
+    else:
+        return ""
+
+
+def build_page(lines, episodes):
+    page = ['<html><head>' + '<meta name="x" content="y">' * 200 + '</head><body>']
+    for line in range(lines):
+        page.append('<ul class="stui-content__playlist clearfix">')
+        for ep in range(1, episodes + 1):
+            href = f'/play/12345-{line}-{ep}.html' if ep % 3 else f'https://cdn.example.com/{line}/{ep}.m3u8'
+            page.append(f'<li><a class="btn" href="{href}" title="第{ep}集">第{ep}集</a></li>')
+        page.append('</ul>')
+    page.append('<div class="footer">' + 'x' * 200000 + '</div></body></html>')
+    return ''.join(page)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='pl=3 提取微基准')
+    arg_parser.add_argument('-n', type=int, default=3, help='每种做法的运行次数')
+    arg_parser.add_argument('--lines', type=int, default=8, help='线路数')
+    arg_parser.add_argument('--episodes', type=int, default=1200, help='每条线路的集数')
+    args = arg_parser.parse_args()
+
+    html = build_page(args.lines, args.episodes)
+    cases = [
+        (f'{args.lines}条线路 x {args.episodes}集',
+         (html, '<ul class="stui-content__playlist clearfix">', '</ul>', 3, PATTERN)),
+        # 每集一段：段数上万时原实现每段都复制整页
+        (f'按集分段 {args.lines * args.episodes}段', (html, '<li>', '</li>', 3, PATTERN)),
+    ]
+    print(f"页面大小 {len(html) / 1024:.0f} KB")
+    for title, case in cases:
+        assert legacy(*case, xurl=XURL) == extract_middle_text(*case, base_url=XURL)
+        for name, func in (('legacy', lambda: legacy(*case, xurl=XURL)),
+                           ('scan', lambda: extract_middle_text(*case, base_url=XURL))):
+            cost = timeit.timeit(func, number=args.n) / args.n
+            print(f"{title} {name:>8}: {cost * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
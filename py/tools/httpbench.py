@@ -0,0 +1,67 @@
+"""
+lib/httpclient 冷/热请求延迟基准（需联网）
+
+    python tools/httpbench.py [地址 ...] -n 5 [--http2]
+
+每个站点冷请求（每次新建会话与连接）与复用 HttpClient 连接池的热请求，各取中位数对比。
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib.httpclient import DEFAULT_TIMEOUT, HttpClient
+
+SITES = [
+    'https://www.4kvm.net',
+    'https://djw1.com',
+    'https://fantuansjz.com',
+    'https://app.whjzjx.cn',
+    'https://mcspapp.5g.wasu.tv',
+    'http://v.rbotv.cn',
+    'http://xjj2.716888.xyz',
+]
+
+
+def measure(send, url, count):
+    costs = []
+    for _ in range(count):
+        start = time.perf_counter()
+        try:
+            send(url).content
+        except Exception as e:
+            return f"失败: {e.__class__.__name__}"
+        costs.append((time.perf_counter() - start) * 1000)
+    return f"{statistics.median(costs):8.1f} ms"
+
+
+def cold(url):
+    with requests.Session() as session:
+        return session.get(url, timeout=DEFAULT_TIMEOUT)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='冷/热请求延迟基准')
+    arg_parser.add_argument('urls', nargs='*', default=SITES)
+    arg_parser.add_argument('-n', type=int, default=5, help='每个站点的请求次数')
+    arg_parser.add_argument('--http2', action='store_true')
+    args = arg_parser.parse_args()
+
+    warm_client = HttpClient(http2=args.http2)
+    print(f"{'站点':<32}{'冷请求中位数':>20}{'热请求中位数':>20}")
+    for url in args.urls:
+        try:
+            # 预热：先建立连接，热请求只统计复用连接的耗时
+            warm_client.get(url).content
+        except Exception:
+            pass
+        print(f"{url:<32}{measure(cold, url, args.n):>26}{measure(warm_client.get, url, args.n):>26}")
+    warm_client.close()
+
+
+if __name__ == '__main__':
+    main()
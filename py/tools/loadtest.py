@@ -0,0 +1,118 @@
+"""
+1.py 独立服务模式的压测脚本（仅依赖标准库）
+
+    python tools/loadtest.py --url http://127.0.0.1:5000 --channel cctv1 -c 30 -n 600
+
+先请求一次频道播放列表取得分片地址，然后分别对播放列表和分片并发压测，
+每个线程使用一条保持连接，输出 请求数/秒 与 p50/p95/p99 延迟。
+"""
+import argparse
+import http.client
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Worker:
+    """每个线程一条保持连接，断开后自动重连"""
+
+    def __init__(self, netloc, timeout):
+        self.netloc = netloc
+        self.timeout = timeout
+        self.conn = None
+
+    def get(self, path):
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.netloc, timeout=self.timeout)
+            try:
+                self.conn.request('GET', path)
+                response = self.conn.getresponse()
+                body = response.read()
+                if response.will_close:
+                    self.conn.close()
+                    self.conn = None
+                return response.status, body
+            except (http.client.HTTPException, ConnectionError, OSError):
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(p / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def run(name, netloc, paths, concurrency, total, timeout):
+    local = threading.local()
+    latencies = []
+    errors = [0]
+    received = [0]
+    lock = threading.Lock()
+
+    def one(i):
+        worker = getattr(local, 'worker', None)
+        if worker is None:
+            worker = local.worker = Worker(netloc, timeout)
+        path = paths[i % len(paths)]
+        start = time.perf_counter()
+        try:
+            status, body = worker.get(path)
+            ok = status == 200
+        except Exception:
+            ok, body = False, b''
+        elapsed = time.perf_counter() - start
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+                received[0] += len(body)
+            else:
+                errors[0] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(total)))
+    wall = time.perf_counter() - start
+
+    print(f"[{name}] {total} 请求, 并发 {concurrency}, 失败 {errors[0]}, 耗时 {wall:.2f}s")
+    print(f"    {len(latencies) / wall:.1f} req/s, {received[0] / wall / 1024 / 1024:.2f} MiB/s")
+    print("    延迟 p50 {:.1f} ms, p95 {:.1f} ms, p99 {:.1f} ms, max {:.1f} ms".format(
+        percentile(latencies, 50) * 1000, percentile(latencies, 95) * 1000,
+        percentile(latencies, 99) * 1000, max(latencies or [0]) * 1000))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='1.py 独立服务压测')
+    arg_parser.add_argument('--url', default='http://127.0.0.1:5000', help='服务地址')
+    arg_parser.add_argument('--channel', default='cctv1', help='频道id')
+    arg_parser.add_argument('-c', '--concurrency', type=int, default=20, help='并发数')
+    arg_parser.add_argument('-n', '--requests', type=int, default=400, help='每类请求总数')
+    arg_parser.add_argument('--timeout', type=float, default=15, help='单请求超时（秒）')
+    args = arg_parser.parse_args()
+
+    base = urllib.parse.urlsplit(args.url)
+    playlist_path = f"/?id={urllib.parse.quote(args.channel)}"
+
+    status, body = Worker(base.netloc, args.timeout).get(playlist_path)
+    if status != 200:
+        raise SystemExit(f"获取播放列表失败: HTTP {status}")
+    segment_paths = []
+    for line in body.decode('utf-8', 'replace').splitlines():
+        if line and not line.startswith('#'):
+            parts = urllib.parse.urlsplit(line)
+            segment_paths.append(f"{parts.path or '/'}?{parts.query}")
+    print(f"播放列表包含 {len(segment_paths)} 个分片")
+
+    run('playlist', base.netloc, [playlist_path], args.concurrency, args.requests, args.timeout)
+    if segment_paths:
+        run('segment', base.netloc, segment_paths, args.concurrency, args.requests, args.timeout)
+
+
+if __name__ == '__main__':
+    main()
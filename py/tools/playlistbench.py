@@ -0,0 +1,71 @@
+"""
+lib/playlist 回看播放列表改写的微基准
+
+    python tools/playlistbench.py -n 50
+
+1000分片的回看播放列表单次刷新，对比原先 _optimized_m3u8_process 的逐行做法与
+按 (代理地址, 播放列表地址, 附加参数) 缓存的 PlaylistRewriter。
+"""
+import argparse
+import os
+import sys
+import timeit
+import urllib.parse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib.playlist import encode_query, get_rewriter
+
+ADDRESS = 'http://127.0.0.1:9978/proxy'
+BASE_URL = 'http://example.com/PLTV/88888888/224/3221225618/index.m3u8?playseek=20241120070000-20241120080000'
+PARAMS = {'proxy': 'socks5://127.0.0.1:1080', 'playseek': '${(b)yyyyMMddHHmmss}-${(e)yyyyMMddHHmmss}',
+          'start': '11-20 07:00', 'end': '11-20 08:00'}
+
+
+def build_playlist(segments):
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-TARGETDURATION:4',
+             '#EXT-X-KEY:METHOD=AES-128,URI="key.bin"']
+    for i in range(segments):
+        lines.append('#EXTINF:4.000,')
+        lines.append(f'20241120/{i:06d}.ts?auth=abcdef' if i % 2 else f'/PLTV/88888888/seg/{i:06d}.ts')
+    lines.append('#EXT-X-ENDLIST')
+    return '\n'.join(lines)
+
+
+def legacy(content):
+    # 原先 _optimized_m3u8_process 的逐行做法
+    base_dir = BASE_URL.rsplit('/', 1)[0] + '/'
+    result = []
+    for line in content.splitlines():
+        if not line or line.startswith('#'):
+            result.append(line)
+            continue
+        if line.startswith('/'):
+            parsed = urllib.parse.urlparse(BASE_URL)
+            full_url = f"{parsed.scheme}://{parsed.netloc}{line}"
+        else:
+            full_url = urllib.parse.urljoin(base_dir, line)
+        query = f"a={urllib.parse.quote(full_url, safe='')}"
+        for key, value in PARAMS.items():
+            query += f"&{key}={urllib.parse.quote(value, safe='')}"
+        result.append(f"{ADDRESS}?{query}")
+    return '\n'.join(result)
+
+
+def compiled(content):
+    return get_rewriter(ADDRESS, BASE_URL, encode_query(PARAMS)).rewrite(content)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='回看播放列表改写微基准')
+    arg_parser.add_argument('-n', type=int, default=50, help='每种做法的运行次数')
+    arg_parser.add_argument('--segments', type=int, default=1000, help='播放列表分片数')
+    args = arg_parser.parse_args()
+
+    content = build_playlist(args.segments)
+    for name, func in (('legacy', legacy), ('compiled', compiled)):
+        cost = timeit.timeit(lambda: func(content), number=args.n) / args.n
+        print(f"{name:>8}: {cost * 1000:.2f} ms / {args.segments}分片刷新")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+lib/soup 选择性建树的基准（依赖 bs4，有 lxml 时用 lxml）
+
+    python tools/soupbench.py [页面文件 标签 类名] -n 10
+
+对比整页 BeautifulSoup 建树后 find_all 与 SoupStrainer 只为目标标签建树的耗时和内存峰值，
+不带页面文件时用模拟的分类页，两种做法的结果先互相校验一致。
+"""
+import argparse
+import os
+import sys
+import timeit
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib.soup import FEATURES, find_all
+
+
+def sample_page():
+    parts = ['<html><head>', '<script>var x = 1;</script>' * 50, '</head><body>',
+             '<header><ul class="main-header">', '<li><a href="/c/1">分类</a></li>' * 30, '</ul></header>',
+             '<div class="sidebar">', '<div class="w"><a href="/t">标签</a><span>热门</span></div>' * 800, '</div>',
+             '<div class="items">']
+    for i in range(60):
+        parts.append(f'<article class="item movies"><div class="poster"><img src="/p/{i}.jpg" alt="影片{i}">'
+                     f'<div class="rating">8.{i % 10}</div><a href="/movies/{i}"></a></div>'
+                     f'<div class="data"><h3>影片{i}</h3><span>2024</span></div></article>')
+    parts.append('</div><footer>' + '<p>版权说明</p>' * 500 + '</footer></body></html>')
+    return ''.join(parts)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='整页建树与选择性建树对比')
+    arg_parser.add_argument('page', nargs='?', help='页面文件，缺省用模拟的分类页')
+    arg_parser.add_argument('name', nargs='?', default='article', help='目标标签')
+    arg_parser.add_argument('class_', nargs='?', default='item movies', help='目标类名')
+    arg_parser.add_argument('-n', type=int, default=10, help='每种做法的运行次数')
+    args = arg_parser.parse_args()
+
+    if args.page:
+        with open(args.page, encoding='utf-8') as f:
+            page = f.read()
+    else:
+        page = sample_page()
+    name, class_ = args.name, args.class_
+
+    def full():
+        return BeautifulSoup(page, FEATURES).find_all(name, class_=class_)
+
+    def selective():
+        return find_all(page, name, class_)
+
+    assert [str(tag) for tag in full()] == [str(tag) for tag in selective()]
+    print(f"页面大小 {len(page) / 1024:.0f} KB, 解析器 {FEATURES}, 目标 {name}.{class_}")
+    for label, func in (('full', full), ('selective', selective)):
+        cost = timeit.timeit(func, number=args.n) / args.n
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{label:>10}: {cost * 1000:7.2f} ms  峰值内存 {peak / 1024 / 1024:6.2f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,24 +1,28 @@
 # -*- coding: utf-8 -*-
 # by @嗷呜
+import os
 import re
 import sys
-import threading
-import requests
 from Crypto.Hash import MD5
 sys.path.append("..")
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import pad, unpad
 from urllib.parse import quote, urlparse
 from base64 import b64encode, b64decode
 import json
-import time
+import requests
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from lib.appcrypto import PerSecond, get_cipher
+from lib.hostselect import HostSelector
 from base.spider import Spider
 
 
 class Spider(Spider):
 
     def init(self, extend=""):
-        self.host = self.gethost()
+        self.cipher = get_cipher(b"k9o3p2c8b7m3z0o8")
+        # 签名与设备id都只取决于整秒时间戳
+        self.verify = PerSecond(lambda t: (self.cipher.encrypt_b64(t), self.md5(t)))
+        self.hosts = HostSelector('ydys', discover=self.gethost)
+        self.host = self.hosts.select()
         pass
 
     def isVideoFormat(self, url):
@@ -142,63 +146,35 @@ class Spider(Spider):
         }
         response = self.fetch('https://ydysdynamicdomainname.68.gy:10678/c9m2js298x82h6/l9m8bx23j2o2p9q/dynamicdomainname.txt',
                               headers=headers).text
-        return self.host_late(response.split('\n'))
-
-    def host_late(self, url_list):
-        if isinstance(url_list, str):
-            urls = [u.strip() for u in url_list.split(',')]
-        else:
-            urls = url_list
-
-        if len(urls) <= 1:
-            return urls[0] if urls else ''
-
-        results = {}
-        threads = []
-
-        def test_host(url):
-            try:
-                start_time = time.time()
-                response = requests.head(url,timeout=1.0, allow_redirects=False)
-                delay = (time.time() - start_time) * 1000
-                results[url] = delay
-            except Exception as e:
-                results[url] = float('inf')
-
-        for url in urls:
-            t = threading.Thread(target=test_host, args=(url,))
-            threads.append(t)
-            t.start()
-
-        for t in threads:
-            t.join()
-
-        return min(results.items(), key=lambda x: x[1])[0]
+        return response.split('\n')
 
     def aes(self, text, b=None):
-        key = b"k9o3p2c8b7m3z0o8"
-        cipher = AES.new(key, AES.MODE_CBC, key)
         if b:
-            ct_bytes = cipher.encrypt(pad(text.encode("utf-8"), AES.block_size))
-            ct = b64encode(ct_bytes).decode("utf-8")
-            return ct
+            return self.cipher.encrypt_b64(text)
         else:
-            pt = unpad(cipher.decrypt(b64decode(text)), AES.block_size)
-            return pt.decode("utf-8")
+            return self.cipher.decrypt_b64(text).decode("utf-8")
 
     def header(self):
-        t = str(int(time.time()))
+        t, (sign, did) = self.verify()
         header = {"Referer": self.host,
                   "User-Agent": "okhttp/3.14.9", "app-version-code": "140", "app-ui-mode": "light",
-                  "app-api-verify-time": t, "app-user-device-id": self.md5(t),
-                  "app-api-verify-sign": self.aes(t, True),
+                  "app-api-verify-time": t, "app-user-device-id": did,
+                  "app-api-verify-sign": sign,
                   "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8"}
         return header
 
     def getdata(self, path, data=None):
+        # 后台测速可能已换了主机；连接失败、超时或5xx时切到次快的主机重试一次，接口层面的错误照常抛出
+        self.host = self.hosts.host
+        try:
+            response = self.post(f"{self.host}{path}", headers=self.header(), data=data, timeout=10)
+            if response.status_code < 500:
+                return self.cipher.decode_json(response.json()['data'])
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            pass
+        self.host = self.hosts.failover(self.host)
         vdata = self.post(f"{self.host}{path}", headers=self.header(), data=data, timeout=10).json()['data']
-        data1 = self.aes(vdata)
-        return json.loads(data1)
+        return self.cipher.decode_json(vdata)
 
     def Mproxy(self, url):
         return f"{self.getProxyUrl()}&url={self.e64(url)}&type=m3u8"
@@ -16,13 +16,11 @@ from urllib.parse import quote
 from base.spider import Spider
 from Crypto.Cipher import AES
 from datetime import datetime
-from bs4 import BeautifulSoup
 from base64 import b64decode
 import urllib.request
 import urllib.parse
 import datetime
 import binascii
-import requests
 import base64
 import json
 import time
@@ -31,6 +29,12 @@ import re
 import os
 
 sys.path.append('..')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from lib.httpclient import get_client
+from lib.extract import extract_middle_text
+from lib.soup import find_all, find
+
+http_client = get_client()
 
 xurl = "https://djw1.com"
 
@@ -55,76 +59,16 @@ class Spider(Spider):
         pass
 
     def extract_middle_text(self, text, start_str, end_str, pl, start_index1: str = '', end_index2: str = ''):
-        if pl == 3:
-            plx = []
-            while True:
-                start_index = text.find(start_str)
-                if start_index == -1:
-                    break
-                end_index = text.find(end_str, start_index + len(start_str))
-                if end_index == -1:
-                    break
-                middle_text = text[start_index + len(start_str):end_index]
-                plx.append(middle_text)
-                text = text.replace(start_str + middle_text + end_str, '')
-            if len(plx) > 0:
-                purl = ''
-                for i in range(len(plx)):
-                    matches = re.findall(start_index1, plx[i])
-                    output = ""
-                    for match in matches:
-                        match3 = re.search(r'(?:^|[^0-9])(\d+)(?:[^0-9]|$)', match[1])
-                        if match3:
-                            number = match3.group(1)
-                        else:
-                            number = 0
-                        if 'http' not in match[0]:
-                            output += f"#{match[1]}${number}{xurl}{match[0]}"
-                        else:
-                            output += f"#{match[1]}${number}{match[0]}"
-                    output = output[1:]
-                    purl = purl + output + "$$$"
-                purl = purl[:-3]
-                return purl
-            else:
-                return ""
-        else:
-            start_index = text.find(start_str)
-            if start_index == -1:
-                return ""
-            end_index = text.find(end_str, start_index + len(start_str))
-            if end_index == -1:
-                return ""
-
-        if pl == 0:
-            middle_text = text[start_index + len(start_str):end_index]
-            return middle_text.replace("\\", "")
-
-        if pl == 1:
-            middle_text = text[start_index + len(start_str):end_index]
-            matches = re.findall(start_index1, middle_text)
-            if matches:
-                jg = ' '.join(matches)
-                return jg
-
-        if pl == 2:
-            middle_text = text[start_index + len(start_str):end_index]
-            matches = re.findall(start_index1, middle_text)
-            if matches:
-                new_list = [f'{item}' for item in matches]
-                jg = '$$$'.join(new_list)
-                return jg
+        return extract_middle_text(text, start_str, end_str, pl, start_index1, end_index2, base_url=xurl)
 
     def homeContent(self, filter):
         result = {"class": []}
 
-        detail = requests.get(url=xurl + "/all/", headers=headerx)
+        detail = http_client.get(url=xurl + "/all/", headers=headerx)
         detail.encoding = "utf-8"
         res = detail.text
 
-        doc = BeautifulSoup(res, "lxml")
-
-        soups = doc.find_all('section', class_="container items")
+        soups = find_all(res, 'section', 'container items')
 
         for soup in soups:
             vods = soup.find_all('li')
@@ -152,12 +96,10 @@ class Spider(Spider):
             page = 1
 
         url = f'{cid}page/{str(page)}/'
-        detail = requests.get(url=url, headers=headerx)
+        detail = http_client.get(url=url, headers=headerx)
         detail.encoding = "utf-8"
         res = detail.text
-        doc = BeautifulSoup(res, "lxml")
-
-        soups = doc.find_all('section', class_="container items")
+        soups = find_all(res, 'section', 'container items')
 
         for soup in soups:
             vods = soup.find_all('li')
@@ -198,13 +140,11 @@ class Spider(Spider):
         if 'http' not in did:
             did = xurl + did
 
-        res = requests.get(url=did, headers=headerx)
+        res = http_client.get(url=did, headers=headerx)
         res.encoding = "utf-8"
         res = res.text
-        doc = BeautifulSoup(res, "lxml")
-
         url = 'https://fs-im-kefu.7moor-fs1.com/ly/4d2c3f00-7d4c-11e5-af15-41bf63ae4ea0/1732707176882/jiduo.txt'
-        response = requests.get(url)
+        response = http_client.get(url)
         response.encoding = 'utf-8'
         code = response.text
         name = self.extract_middle_text(code, "s1='", "'", 0)
@@ -220,7 +160,7 @@ class Spider(Spider):
             bofang = Jumps
             xianlu = '1'
         else:
-            soups = doc.find('div', class_="ep-list-items")
+            soups = find(res, 'div', 'ep-list-items')
 
             soup = soups.find_all('a')
 
@@ -250,7 +190,7 @@ class Spider(Spider):
 
     def playerContent(self, flag, id, vipFlags):
 
-        res = requests.get(url=id, headers=headerx)
+        res = http_client.get(url=id, headers=headerx)
         res.encoding = "utf-8"
         res = res.text
 
@@ -273,12 +213,10 @@ class Spider(Spider):
             page = 1
 
         url = f'{xurl}/search/{key}/page/{str(page)}/'
-        detail = requests.get(url=url, headers=headerx)
+        detail = http_client.get(url=url, headers=headerx)
         detail.encoding = "utf-8"
         res = detail.text
-        doc = BeautifulSoup(res, "lxml")
-
-        soups = doc.find_all('section', class_="container items")
+        soups = find_all(res, 'section', 'container items')
 
         for soup in soups:
             vods = soup.find_all('li')
@@ -11,7 +11,10 @@
 #coding=utf-8
 #!/usr/bin/python
 import sys
+import os
 sys.path.append('..') 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from lib.listcache import cached_listing, DEFAULT_STALE
 from base.spider import Spider
 import json
 import time
@@ -22,6 +25,9 @@ import urllib
 import urllib.request
 import time
 
+# 有分页列表的分类，其余 tid 走 EPG 节目单
+LIST_TIDS=('动画片','纪录片','电视剧','特别节目','节目大全')
+
 class Spider(Spider):  # 元类 默认的元类 type
 	def getName(self):
 		return "中央电视台"#可搜索
@@ -59,6 +65,8 @@ class Spider(Spider):  # 元类 默认的元类 type
 			'list':[]
 		}
 		return result
+	# EPG 节目单随时变动，只短时缓存且不返回过期数据
+	@cached_listing(ttl=lambda tid,*args:15*60 if tid in LIST_TIDS else 5*60,stale=lambda tid,*args:DEFAULT_STALE if tid in LIST_TIDS else 0)
 	def categoryContent(self,tid,pg,filter,extend):
 		result = {}
 		month = ""#月
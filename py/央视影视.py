@@ -1,7 +1,10 @@
 #coding=utf-8
 #!/usr/bin/python
 import sys
+import os
 sys.path.append('..') 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from lib.listcache import cached_listing
 from base.spider import Spider
 import json
 import time
@@ -90,6 +93,7 @@ class Spider(Spider):
         }
         return result
 
+    @cached_listing()
     def categoryContent(self, tid, pg, filter, extend):
         result = {}
         extend['id'] = tid
@@ -9,6 +9,129 @@ from urllib3.util.retry import Retry
 import time
 from datetime import datetime, timezone, timedelta
 import threading
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from lib.health import ProxyHealthMonitor
+from lib.playlist import encode_query, get_rewriter
+from lib.upstream import UpstreamClient
+
+
+class ProxyPool:
+    """单个SOCKS5出口的连接池；slots 限制同时在用的连接数"""
+
+    def __init__(self, proxy_url: str, session: requests.Session, max_connections: int):
+        self.proxy_url = proxy_url
+        self.session = session
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.requests = 0
+        self.active = 0
+        self.retired = False
+
+    def close(self):
+        self.session.close()
+
+
+class ProxyPoolRegistry:
+    """
+    按代理地址维护独立连接池：每个出口一个Session，互不混用，同时在用的连接数不超过 max_connections
+    空闲超过idle_timeout的连接池会被回收；代理熔断后（由健康监测判定）换新连接池重新握手
+    被替换或回收的连接池先退役，等正在使用它的请求都释放后才关闭
+    """
+
+    def __init__(self, session_factory, health: ProxyHealthMonitor, idle_timeout: float = 300,
+                 max_connections: int = 20, max_pools: int = 32, acquire_timeout: float = 5):
+        self.session_factory = session_factory
+        self.health = health
+        self.idle_timeout = idle_timeout
+        self.max_connections = max_connections
+        self.max_pools = max_pools
+        self.acquire_timeout = acquire_timeout
+        self._pools = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.time()
+
+    def acquire(self, proxy_url: str) -> Tuple[ProxyPool, Any]:
+        """
+        占用代理对应连接池的一个连接名额，返回 (连接池, release)
+        release 可重复调用；名额 acquire_timeout 秒内拿不到时抛出 ConnectionError
+        """
+        now = time.time()
+        with self._lock:
+            if now - self._last_sweep > 60:
+                self._evict_idle(now)
+            pool = self._pools.get(proxy_url)
+            if pool is not None and proxy_url and self.health.is_tripped(proxy_url):
+                # 熔断后的试探请求不再复用可能已失效的旧连接
+                self._retire(self._pools.pop(proxy_url))
+                pool = None
+            if pool is None:
+                if len(self._pools) >= self.max_pools:
+                    oldest = min(self._pools.values(), key=lambda p: p.last_used)
+                    self._retire(self._pools.pop(oldest.proxy_url))
+                pool = ProxyPool(proxy_url, self.session_factory(self.max_connections), self.max_connections)
+                self._pools[proxy_url] = pool
+            pool.last_used = now
+            pool.requests += 1
+            pool.active += 1
+
+        if not pool.slots.acquire(timeout=self.acquire_timeout):
+            self._release(pool)
+            raise requests.exceptions.ConnectionError(f"代理连接数已达上限: {proxy_url or '直连'}")
+
+        released = []
+
+        def release():
+            with self._lock:
+                if released:
+                    return
+                released.append(True)
+            pool.slots.release()
+            self._release(pool)
+
+        return pool, release
+
+    def _release(self, pool: ProxyPool):
+        with self._lock:
+            pool.active -= 1
+            close = pool.retired and pool.active == 0
+        if close:
+            pool.close()
+
+    def _retire(self, pool: ProxyPool):
+        """在锁内调用：没有请求在用时立即关闭，否则由最后一个请求释放时关闭"""
+        pool.retired = True
+        if pool.active == 0:
+            pool.close()
+
+    def _evict_idle(self, now: float):
+        self._last_sweep = now
+        for proxy_url, pool in list(self._pools.items()):
+            if now - pool.last_used > self.idle_timeout:
+                self._retire(self._pools.pop(proxy_url))
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """返回各连接池状态"""
+        now = time.time()
+        with self._lock:
+            return {
+                proxy_url or '直连': {
+                    'requests': pool.requests,
+                    'active': pool.active,
+                    'idle': round(now - pool.last_used, 1),
+                }
+                for proxy_url, pool in self._pools.items()
+            }
+
+    def close_all(self):
+        with self._lock:
+            for pool in self._pools.values():
+                self._retire(pool)
+            self._pools.clear()
+
 
 class Parser(Parser):
 
@@ -16,18 +139,28 @@ class Parser(Parser):
         super().__init__(*args, **kwargs)
         self.proxy_config = None
         self.session = self._create_optimized_session()
+
+        # 默认请求引擎：sync(requests) / async(asyncio内核)，可用 engine 参数按请求切换
+        self.engine = 'sync'
         
         logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
         self.logger = logging.getLogger(__name__)
         self.logger.info("节目单回看优化版SOCKS5代理解析器初始化完成")
 
-    def _create_optimized_session(self) -> requests.Session:
+        # 后台代理健康监测（单线程定期探测，替代每次parse启动的测试线程）
+        self.upstream = UpstreamClient(self.session, acquire=self._acquire_session, logger=self.logger)
+        self.health_monitor = self.upstream.health
+
+        # 按SOCKS5出口划分的连接池，熔断判定沿用健康监测
+        self.pool_registry = ProxyPoolRegistry(self._create_optimized_session, self.health_monitor)
+
+    def _create_optimized_session(self, pool_maxsize: int = 100) -> requests.Session:
         """创建优化的HTTP会话"""
         session = requests.Session()
         
         adapter = HTTPAdapter(
             pool_connections=50,
-            pool_maxsize=100,
+            pool_maxsize=pool_maxsize,
             max_retries=Retry(
                 total=1,
                 backoff_factor=0.1,
@@ -49,14 +182,25 @@ class Parser(Parser):
 
     def _get_proxy_config(self, params: Dict[str, str]) -> Dict[str, str]:
         """从参数中获取代理配置"""
-        proxy_url = params.get("proxy", "").strip()
-        if proxy_url and proxy_url.startswith('socks5://'):
+        proxy_url = self._select_proxy(params.get("proxy", ""))
+        if proxy_url:
             return {
                 "http": proxy_url,
                 "https": proxy_url
             }
         return {}
 
+    def _split_proxies(self, proxy_param: str) -> list:
+        """proxy参数支持逗号分隔的多个socks5地址"""
+        return [p.strip() for p in proxy_param.split(',') if p.strip().startswith('socks5://')]
+
+    def _select_proxy(self, proxy_param: str) -> str:
+        """按健康评分从候选代理中选出最优的一个，无可用代理时返回空字符串（直连）"""
+        candidates = self._split_proxies(proxy_param)
+        if len(candidates) > 1:
+            return self.health_monitor.best(candidates)
+        return candidates[0] if candidates else ""
+
     def parse(self, params: Dict[str, str]) -> Dict[str, str]:
         """
         解析参数并返回代理播放地址，优化节目单回看支持
@@ -104,19 +248,22 @@ class Parser(Parser):
                 query_params += f"&start={urllib.parse.quote(start_time, safe='')}"
             if end_time:
                 query_params += f"&end={urllib.parse.quote(end_time, safe='')}"
+
+            engine = params.get("engine", "").strip()
+            if engine:
+                query_params += f"&engine={urllib.parse.quote(engine, safe='')}"
             
             proxy_play_url = f"{self.address}?{query_params}"
             
-            # 异步测试连接
-            if proxy_config:
-                test_thread = threading.Thread(target=self._async_test_connection, args=(original_play_url, proxy_config))
-                test_thread.daemon = True
-                test_thread.start()
+            # 登记到后台健康监测
+            for candidate in self._split_proxies(params.get("proxy", "")):
+                self.health_monitor.register(candidate, original_play_url)
             
             return {
                 "url": proxy_play_url,
                 "proxy_type": "动态SOCKS5" if proxy_config else "直连",
                 "proxy_server": params.get("proxy", "无"),
+                "engine": engine or self.engine,
                 "status": "ready",
                 "play_url": proxy_play_url,
                 "m3u8_url": original_play_url,
@@ -285,17 +432,17 @@ class Parser(Parser):
             self.logger.warning(f"处理playseek表达式失败: {e}")
             return playseek_expr
 
-    def _async_test_connection(self, url: str, proxy_config: Dict[str, str]):
-        """异步测试连接"""
-        try:
-            response = self.session.head(url, proxies=proxy_config, timeout=1, verify=False)
-            if response.status_code == 200:
-                self.logger.info(f"连接测试成功: {response.status_code}")
-        except Exception as e:
-            self.logger.debug(f"连接测试跳过: {e}")
+    def _acquire_session(self, proxy_url: str):
+        """按代理出口取连接池会话，供上游请求与健康探测使用"""
+        pool, release = self.pool_registry.acquire(proxy_url)
+        return pool.session, release
 
     def stop(self):
         """停止解析器"""
+        if hasattr(self, 'upstream'):
+            self.upstream.close()
+        if hasattr(self, 'pool_registry'):
+            self.pool_registry.close_all()
         if hasattr(self, 'session'):
             self.session.close()
         self.logger.info("代理解析器已停止")
@@ -310,17 +457,19 @@ class Parser(Parser):
             parsed_url = urllib.parse.urlparse(url)
             query_params = urllib.parse.parse_qs(parsed_url.query)
             target_url = query_params.get('a', [''])[0]
-            proxy_url = query_params.get('proxy', [''])[0]
+            proxy_param = query_params.get('proxy', [''])[0]
             playseek_expr = query_params.get('playseek', [''])[0]
             start_param = query_params.get('start', [''])[0]    # 新增：开始时间
             end_param = query_params.get('end', [''])[0]        # 新增：结束时间
+            engine = query_params.get('engine', [self.engine])[0]
             
             if not target_url:
                 return self._quick_error_response("缺少URL参数a")
             
-            # 动态获取代理配置
+            # 动态获取代理配置（多个代理时选择健康评分最优的）
+            proxy_url = self._select_proxy(proxy_param)
             proxy_config = {}
-            if proxy_url and proxy_url.startswith('socks5://'):
+            if proxy_url:
                 proxy_config = {
                     "http": proxy_url,
                     "https": proxy_url
@@ -342,8 +491,9 @@ class Parser(Parser):
             timeout = 2 if is_m3u8 else 5
             
             # 直接请求目标URL
-            response = self.session.get(
+            response = self.upstream.get(
                 final_target_url,
+                engine,
                 proxies=proxy_config,
                 timeout=timeout,
                 verify=False,
@@ -351,17 +501,23 @@ class Parser(Parser):
             )
             
             if response.status_code != 200:
+                response.close()
                 return self._quick_error_response(f"请求失败: {response.status_code}")
             
             # 快速处理响应
             if is_m3u8:
+                try:
+                    playlist = response.text
+                finally:
+                    response.close()
                 content = self._optimized_m3u8_process(
-                    response.text, 
+                    playlist, 
                     final_target_url, 
-                    proxy_url, 
+                    proxy_param, 
                     playseek_expr,
                     start_param,  # 传递节目单参数
-                    end_param
+                    end_param,
+                    engine
                 )
                 content_bytes = content.encode('utf-8')
                 
@@ -386,7 +542,7 @@ class Parser(Parser):
                     'X-Playseek': final_playseek if final_playseek else 'none'
                 }
                 
-                return response.iter_content(chunk_size=8192), response_headers
+                return self._stream_response(response), response_headers
                 
         except requests.exceptions.Timeout:
             return self._quick_error_response("请求超时，请检查网络或源地址")
@@ -395,6 +551,14 @@ class Parser(Parser):
         except Exception as e:
             return self._quick_error_response(f"代理错误: {str(e)}")
 
+    def _stream_response(self, response) -> Iterable[bytes]:
+        """转发TS分片；播放器断开时宿主关闭生成器，随即关闭上游连接并归还名额"""
+        try:
+            for chunk in response.iter_content(chunk_size=8192):
+                yield chunk
+        finally:
+            response.close()
+
     def _apply_playseek_to_url(self, target_url: str, playseek: str) -> str:
         """将回看参数应用到目标URL"""
         if not playseek:
@@ -417,58 +581,19 @@ class Parser(Parser):
         return '.m3u8' in url.lower() or headers.get('Accept', '').find('mpegurl') != -1
 
     def _optimized_m3u8_process(self, content: str, base_url: str, proxy_url: str = "", 
-                               playseek_expr: str = "", start_time: str = "", end_time: str = "") -> str:
+                               playseek_expr: str = "", start_time: str = "", end_time: str = "",
+                               engine: str = "") -> str:
         """
-        优化m3u8处理，支持节目单参数传递
+        优化m3u8处理，支持节目单参数传递（重写器按播放列表地址与参数复用）
         """
-        if not content or not content.strip():
-            return content
-            
-        lines = content.splitlines()
-        processed_lines = []
-        
-        base_dir = base_url.rsplit('/', 1)[0] + '/' if '/' in base_url else base_url
-        
-        for line in lines:
-            if not line or line.startswith('#'):
-                processed_lines.append(line)
-                continue
-                
-            if line.startswith(('http://', 'https://')):
-                query_params = f"a={urllib.parse.quote(line, safe='')}"
-                if proxy_url:
-                    query_params += f"&proxy={urllib.parse.quote(proxy_url, safe='')}"
-                if playseek_expr:
-                    query_params += f"&playseek={urllib.parse.quote(playseek_expr, safe='')}"
-                # 传递节目单时间参数
-                if start_time:
-                    query_params += f"&start={urllib.parse.quote(start_time, safe='')}"
-                if end_time:
-                    query_params += f"&end={urllib.parse.quote(end_time, safe='')}"
-                
-                proxy_url_full = f"{self.address}?{query_params}"
-                processed_lines.append(proxy_url_full)
-            else:
-                if line.startswith('/'):
-                    parsed = urllib.parse.urlparse(base_url)
-                    full_url = f"{parsed.scheme}://{parsed.netloc}{line}"
-                else:
-                    full_url = urllib.parse.urljoin(base_dir, line)
-                
-                query_params = f"a={urllib.parse.quote(full_url, safe='')}"
-                if proxy_url:
-                    query_params += f"&proxy={urllib.parse.quote(proxy_url, safe='')}"
-                if playseek_expr:
-                    query_params += f"&playseek={urllib.parse.quote(playseek_expr, safe='')}"
-                if start_time:
-                    query_params += f"&start={urllib.parse.quote(start_time, safe='')}"
-                if end_time:
-                    query_params += f"&end={urllib.parse.quote(end_time, safe='')}"
-                
-                proxy_url_full = f"{self.address}?{query_params}"
-                processed_lines.append(proxy_url_full)
-        
-        return '\n'.join(processed_lines)
+        suffix = encode_query({
+            'proxy': proxy_url,
+            'playseek': playseek_expr,
+            'start': start_time,
+            'end': end_time,
+            'engine': engine if engine != self.engine else '',
+        })
+        return get_rewriter(self.address, base_url, suffix).rewrite(content)
 
     def _quick_error_response(self, error_msg: str) -> Tuple[bytes, Dict[str, str]]:
         """快速错误响应"""
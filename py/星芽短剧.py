@@ -16,7 +16,6 @@ from base64 import b64decode
 import urllib.request
 import urllib.parse
 import binascii
-import requests
 import base64
 import json
 import time
@@ -25,6 +24,12 @@ import re
 import os
 
 sys.path.append('..')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from lib.httpclient import get_client
+from lib.extract import extract_middle_text
+from lib.auth import TokenManager
+
+http_client = get_client()
 
 xurl = "https://app.whjzjx.cn"
 
@@ -38,40 +43,40 @@ headerf = {
     "content-type": "application/json; charset=utf-8"
           }
 
-times = int(time.time() * 1000)
-
-data = {
-    "device": "2a50580e69d38388c94c93605241fb306",
-    "package_name": "com.jz.xydj",
-    "android_id": "ec1280db12795506",
-    "install_first_open": True,
-    "first_install_time": 1752505243345,
-    "last_update_time": 1752505243345,
-    "report_link_url": "",
-    "authorization": "",
-    "timestamp": times
-        }
-
-plain_text = json.dumps(data, separators=(',', ':'), ensure_ascii=False)
-
 key = "B@ecf920Od8A4df7"
-key_bytes = key.encode('utf-8')
-plain_bytes = plain_text.encode('utf-8')
-cipher = AES.new(key_bytes, AES.MODE_ECB)
-padded_data = pad(plain_bytes, AES.block_size)
-ciphertext = cipher.encrypt(padded_data)
-encrypted = base64.b64encode(ciphertext).decode('utf-8')
-
-response = requests.post("https://u.shytkjgs.com/user/v3/account/login", headers=headerf, data=encrypted)
-response_data = response.json()
-Authorization = response_data['data']['token']
 
 headerx = {
-    'authorization': Authorization,
     'platform': '1',
     'version_name': '3.8.3.1'
           }
 
+
+def login():
+    data = {
+        "device": "2a50580e69d38388c94c93605241fb306",
+        "package_name": "com.jz.xydj",
+        "android_id": "ec1280db12795506",
+        "install_first_open": True,
+        "first_install_time": 1752505243345,
+        "last_update_time": 1752505243345,
+        "report_link_url": "",
+        "authorization": "",
+        "timestamp": int(time.time() * 1000)
+            }
+
+    plain_text = json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+
+    key_bytes = key.encode('utf-8')
+    plain_bytes = plain_text.encode('utf-8')
+    cipher = AES.new(key_bytes, AES.MODE_ECB)
+    padded_data = pad(plain_bytes, AES.block_size)
+    ciphertext = cipher.encrypt(padded_data)
+    encrypted = base64.b64encode(ciphertext).decode('utf-8')
+
+    response = http_client.post("https://u.shytkjgs.com/user/v3/account/login", headers=headerf, data=encrypted)
+    response_data = response.json()
+    return response_data['data']['token'], None
+
 class Spider(Spider):
     global xurl
     global headerx
@@ -81,7 +86,13 @@ class Spider(Spider):
         return "首页"
 
     def init(self, extend):
-        pass
+        # 首次请求时才登录，token 经宿主缓存持久化
+        self.auth = TokenManager(login, load=lambda: self.getCache('xydj_token'),
+                                 store=lambda value: self.setCache('xydj_token', value))
+
+    def api(self, method, url, **kwargs):
+        return self.auth.call(
+            lambda token: http_client.request(method, url, headers=dict(headerx, authorization=token), **kwargs))
 
     def isVideoFormat(self, url):
         pass
@@ -90,65 +101,7 @@ class Spider(Spider):
         pass
 
     def extract_middle_text(self, text, start_str, end_str, pl, start_index1: str = '', end_index2: str = ''):
-        if pl == 3:
-            plx = []
-            while True:
-                start_index = text.find(start_str)
-                if start_index == -1:
-                    break
-                end_index = text.find(end_str, start_index + len(start_str))
-                if end_index == -1:
-                    break
-                middle_text = text[start_index + len(start_str):end_index]
-                plx.append(middle_text)
-                text = text.replace(start_str + middle_text + end_str, '')
-            if len(plx) > 0:
-                purl = ''
-                for i in range(len(plx)):
-                    matches = re.findall(start_index1, plx[i])
-                    output = ""
-                    for match in matches:
-                        match3 = re.search(r'(?:^|[^0-9])(\d+)(?:[^0-9]|$)', match[1])
-                        if match3:
-                            number = match3.group(1)
-                        else:
-                            number = 0
-                        if 'http' not in match[0]:
-                            output += f"#{match[1]}${number}{xurl}{match[0]}"
-                        else:
-                            output += f"#{match[1]}${number}{match[0]}"
-                    output = output[1:]
-                    purl = purl + output + "$$$"
-                purl = purl[:-3]
-                return purl
-            else:
-                return ""
-        else:
-            start_index = text.find(start_str)
-            if start_index == -1:
-                return ""
-            end_index = text.find(end_str, start_index + len(start_str))
-            if end_index == -1:
-                return ""
-
-        if pl == 0:
-            middle_text = text[start_index + len(start_str):end_index]
-            return middle_text.replace("\\", "")
-
-        if pl == 1:
-            middle_text = text[start_index + len(start_str):end_index]
-            matches = re.findall(start_index1, middle_text)
-            if matches:
-                jg = ' '.join(matches)
-                return jg
-
-        if pl == 2:
-            middle_text = text[start_index + len(start_str):end_index]
-            matches = re.findall(start_index1, middle_text)
-            if matches:
-                new_list = [f'{item}' for item in matches]
-                jg = '$$$'.join(new_list)
-                return jg
+        return extract_middle_text(text, start_str, end_str, pl, start_index1, end_index2, base_url=xurl)
 
     def homeContent(self, filter):
         result = {}
@@ -165,7 +118,7 @@ class Spider(Spider):
         videos = []
 
         url= f'{xurl}/v1/theater/home_page?theater_class_id=1&class2_id=4&page_num=1&page_size=24'
-        detail = requests.get(url=url, headers=headerx)
+        detail = self.api('GET', url)
         detail.encoding = "utf-8"
         if detail.status_code == 200:
             data = detail.json()
@@ -196,7 +149,7 @@ class Spider(Spider):
         videos = []
 
         url = f'{xurl}/v1/theater/home_page?theater_class_id={cid}&page_num={pg}&page_size=24'
-        detail = requests.get(url=url,headers=headerx)
+        detail = self.api('GET', url)
         detail.encoding = "utf-8"
         if detail.status_code == 200:
             data = detail.json()
@@ -234,13 +187,13 @@ class Spider(Spider):
         bofang = ''
 
         url = f'{xurl}/v2/theater_parent/detail?theater_parent_id={did}'
-        detail = requests.get(url=url, headers=headerx)
+        detail = self.api('GET', url)
         detail.encoding = "utf-8"
         if detail.status_code == 200:
             data = detail.json()
 
         url = 'https://fs-im-kefu.7moor-fs1.com/ly/4d2c3f00-7d4c-11e5-af15-41bf63ae4ea0/1732707176882/jiduo.txt'
-        response = requests.get(url)
+        response = http_client.get(url)
         response.encoding = 'utf-8'
         code = response.text
         name = self.extract_middle_text(code, "s1='", "'", 0)
@@ -300,7 +253,7 @@ class Spider(Spider):
                   }
 
         url = f"{xurl}/v3/search"
-        detail = requests.post(url=url, headers=headerx, json=payload)
+        detail = self.api('POST', url, json=payload)
         if detail.status_code == 200:
             detail.encoding = "utf-8"
             data = detail.json()
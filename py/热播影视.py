@@ -2,14 +2,19 @@
 # by @嗷呜
 import json
 import sys
+import os
 import time
-import requests
 from base64 import b64decode, b64encode
 from Crypto.Hash import MD5
 from pyquery import PyQuery as pq
 sys.path.append('..')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from lib.httpclient import get_client
+from lib.listcache import cached_listing
 from base.spider import Spider
 
+http_client = get_client()
+
 class Spider(Spider):
 
     def init(self, extend=""):
@@ -34,8 +39,9 @@ class Spider(Spider):
         'Accept-Language': 'zh-CN,zh;q=0.8'
     }
 
+    @cached_listing()
     def homeContent(self, filter):
-        data=requests.post(f'{self.host}/v3/type/top_type',headers=self.headers,files=self.getfiles({'': (None, '')})).json()
+        data=http_client.post(f'{self.host}/v3/type/top_type',headers=self.headers,files=self.getfiles({'': (None, '')})).json()
         result = {}
         classes = []
         filters = {}
@@ -57,10 +63,12 @@ class Spider(Spider):
         result['filters'] = filters
         return result
 
+    @cached_listing()
     def homeVideoContent(self):
-        data=requests.post(f'{self.host}/v3/type/tj_vod',headers=self.headers,files=self.getfiles({'': (None, '')})).json()
+        data=http_client.post(f'{self.host}/v3/type/tj_vod',headers=self.headers,files=self.getfiles({'': (None, '')})).json()
         return {'list':self.getv(data['data']['cai']+data['data']['loop'])}
 
+    @cached_listing()
     def categoryContent(self, tid, pg, filter, extend):
         files = {
             'type_id': (None, tid),
@@ -70,7 +78,7 @@ class Spider(Spider):
         for k,v in extend.items():
             if k=='extend':k='class'
             files[k] = (None, v)
-        data=requests.post(f'{self.host}/v3/home/type_search',headers=self.headers,files=self.getfiles(files)).json()
+        data=http_client.post(f'{self.host}/v3/home/type_search',headers=self.headers,files=self.getfiles(files)).json()
         result = {}
         result['list'] = self.getv(data['data']['list'])
         result['page'] = pg
@@ -80,7 +88,7 @@ class Spider(Spider):
         return result
 
     def detailContent(self, ids):
-        data=requests.post(f'{self.host}/v3/home/vod_details',headers=self.headers,files=self.getfiles({'vod_id': (None, ids[0])})).json()
+        data=http_client.post(f'{self.host}/v3/home/vod_details',headers=self.headers,files=self.getfiles({'vod_id': (None, ids[0])})).json()
         v=data['data']
         vod = {
             'vod_name': v.get('vod_name'),
@@ -109,7 +117,7 @@ class Spider(Spider):
             'page': (None, pg),
             'keyword': (None, key),
         }
-        data=requests.post(f'{self.host}/v3/home/search',headers=self.headers,files=self.getfiles(files)).json()
+        data=http_client.post(f'{self.host}/v3/home/search',headers=self.headers,files=self.getfiles(files)).json()
         return {'list':self.getv(data['data']['list']),'page':pg}
 
     def playerContent(self, flag, id, vipFlags):
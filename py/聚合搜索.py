@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+聚合搜索站点：同时搜索同目录下的其他爬虫，结果按站点返回先后合并
+
+ext 中 sites 列出参与搜索的爬虫（文件名，不含.py），只加载这些爬虫；deadline、workers 可选：
+    {"sites": ["金牌影视", "热播影视"], "deadline": 6, "workers": 16}
+vod_id 与播放地址前加 站点名@@，详情与播放转给原站点处理
+（原站点经 localProxy 代理的播放地址不在此转发）
+"""
+import copy
+import json
+import logging
+import sys
+import os
+sys.path.append('..')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from lib.search import AggregatedSearch, load_spiders
+from base.spider import Spider
+
+SEP = '@@'
+
+
+class Spider(Spider):
+
+    def init(self, extend=""):
+        self.conf = json.loads(extend) if extend else {}
+        self.engine = None
+
+    def getName(self):
+        return "聚合搜索"
+
+    def isVideoFormat(self, url):
+        pass
+
+    def manualVideoCheck(self):
+        pass
+
+    def destroy(self):
+        if self.engine:
+            self.engine.shutdown()
+
+    def get_engine(self):
+        # 首次搜索时才加载其他爬虫，它们的 init 可能要联网
+        if self.engine is None:
+            sites = self.conf.get('sites') or []
+            if not sites:
+                logging.getLogger(__name__).warning("聚合搜索未配置 sites，不搜索任何站点")
+            spiders = load_spiders(os.path.dirname(os.path.abspath(__file__)), sites)
+            self.engine = AggregatedSearch(spiders, workers=self.conf.get('workers', 16),
+                                           deadline=self.conf.get('deadline', 6.0))
+        return self.engine
+
+    def homeContent(self, filter):
+        return {'class': []}
+
+    def homeVideoContent(self):
+        return {'list': []}
+
+    def categoryContent(self, tid, pg, filter, extend):
+        return {'list': []}
+
+    def searchContent(self, key, quick, pg="1"):
+        return {'list': self.get_engine().search_all(key, quick, pg), 'page': pg}
+
+    def detailContent(self, ids):
+        site, vid = ids[0].split(SEP, 1)
+        # 原站点可能返回自己缓存里的对象（如 DetailCache），改写前先复制
+        result = copy.deepcopy(self.get_engine().spiders[site].detailContent([vid]))
+        for vod in result.get('list') or []:
+            vod['vod_id'] = f"{site}{SEP}{vod.get('vod_id')}"
+            if vod.get('vod_play_url'):
+                vod['vod_play_url'] = self.tag_play_url(site, vod['vod_play_url'])
+        return result
+
+    def tag_play_url(self, site, play_url):
+        """每集的 名称$地址 改为 名称$站点@@地址"""
+        groups = []
+        for group in play_url.split('$$$'):
+            episodes = []
+            for episode in group.split('#'):
+                name, sep, url = episode.rpartition('$')
+                episodes.append(f"{name}{sep}{site}{SEP}{url}" if sep else f"{site}{SEP}{episode}")
+            groups.append('#'.join(episodes))
+        return '$$$'.join(groups)
+
+    def playerContent(self, flag, id, vipFlags):
+        site, pid = id.split(SEP, 1)
+        return self.get_engine().spiders[site].playerContent(flag, pid, vipFlags)
+
+    def localProxy(self, param):
+        pass
@@ -2,11 +2,13 @@
 # 金牌影视
 import json
 import sys
-import threading
+import os
 import uuid
 from pprint import pprint
-import requests
 sys.path.append('..')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from lib.hostselect import HostSelector
+from lib.listcache import cached_listing
 from base.spider import Spider
 import time
 from Crypto.Hash import MD5, SHA1
@@ -29,10 +31,12 @@ class Spider(Spider):
         },
         fm写法
         '''
+        self.extend = extend
         if extend:
             hosts=json.loads(extend)['site']
         # hosts = "https://www.tjrongze.com,https://www.jiabaide.cn,https://cqzuoer.com"
-        self.host = self.host_late(hosts)
+        self.hosts = HostSelector(f"jpys:{hosts}", candidates=hosts)
+        self.host = self.hosts.select()
         pass
 
     def getName(self):
@@ -47,9 +51,10 @@ class Spider(Spider):
     def destroy(self):
         pass
 
+    @cached_listing()
     def homeContent(self, filter):
-        cdata = self.fetch(f"{self.host}/api/mw-movie/anonymous/get/filer/type", headers=self.getheaders()).json()
-        fdata = self.fetch(f"{self.host}/api/mw-movie/anonymous/v1/get/filer/list", headers=self.getheaders()).json()
+        cdata = self.fetch_api("/api/mw-movie/anonymous/get/filer/type", headers=self.getheaders()).json()
+        fdata = self.fetch_api("/api/mw-movie/anonymous/v1/get/filer/list", headers=self.getheaders()).json()
         result = {}
         classes = []
         filters={}
@@ -86,9 +91,10 @@ class Spider(Spider):
         result['filters'] = filters
         return result
 
+    @cached_listing()
     def homeVideoContent(self):
-        data1 = self.fetch(f"{self.host}/api/mw-movie/anonymous/v1/home/all/list", headers=self.getheaders()).json()
-        data2=self.fetch(f"{self.host}/api/mw-movie/anonymous/home/hotSearch",headers=self.getheaders()).json()
+        data1 = self.fetch_api("/api/mw-movie/anonymous/v1/home/all/list", headers=self.getheaders()).json()
+        data2=self.fetch_api("/api/mw-movie/anonymous/home/hotSearch",headers=self.getheaders()).json()
         data=[]
         for i in data1['data'].values():
             data.extend(i['list'])
@@ -96,6 +102,7 @@ class Spider(Spider):
         vods=self.getvod(data)
         return {'list':vods}
 
+    @cached_listing()
     def categoryContent(self, tid, pg, filter, extend):
 
         params = {
@@ -111,7 +118,7 @@ class Spider(Spider):
           "v_class": extend.get('v_class', ''),
           "year": extend.get('year', '')
         }
-        data = self.fetch(f"{self.host}/api/mw-movie/anonymous/video/list?{self.js(params)}", headers=self.getheaders(params)).json()
+        data = self.fetch_api(f"/api/mw-movie/anonymous/video/list?{self.js(params)}", headers=self.getheaders(params)).json()
         result = {}
         result['list'] = self.getvod(data['data']['list'])
         result['page'] = pg
@@ -121,7 +128,7 @@ class Spider(Spider):
         return result
 
     def detailContent(self, ids):
-        data=self.fetch(f"{self.host}/api/mw-movie/anonymous/video/detail?id={ids[0]}",headers=self.getheaders({'id':ids[0]})).json()
+        data=self.fetch_api(f"/api/mw-movie/anonymous/video/detail?id={ids[0]}",headers=self.getheaders({'id':ids[0]})).json()
         vod=self.getvod([data['data']])[0]
         vod['vod_play_from']='飞哥'
         vod['vod_play_url'] = '#'.join(
@@ -137,7 +144,7 @@ class Spider(Spider):
           "pageSize": "8",
           "sourceCode": "1"
         }
-        data=self.fetch(f"{self.host}/api/mw-movie/anonymous/video/searchByWord?{self.js(params)}",headers=self.getheaders(params)).json()
+        data=self.fetch_api(f"/api/mw-movie/anonymous/video/searchByWord?{self.js(params)}",headers=self.getheaders(params)).json()
         vods=self.getvod(data['data']['result']['list'])
         return {'list':vods,'page':pg}
 
@@ -152,7 +159,7 @@ class Spider(Spider):
             'Referer': f'{self.host}/'
         }
         ids=id.split('@@')
-        pdata = self.fetch(f"{self.host}/api/mw-movie/anonymous/v2/video/episode/url?clientType=1&id={ids[0]}&nid={ids[1]}",headers=self.getheaders({'clientType':'1','id': ids[0], 'nid': ids[1]})).json()
+        pdata = self.fetch_api(f"/api/mw-movie/anonymous/v2/video/episode/url?clientType=1&id={ids[0]}&nid={ids[1]}",headers=self.getheaders({'clientType':'1','id': ids[0], 'nid': ids[1]})).json()
         vlist=[]
         for i in pdata['data']['list']:vlist.extend([i['resolutionName'],i['url']])
         return {'parse':0,'url':vlist,'header':self.header}
@@ -160,32 +167,17 @@ class Spider(Spider):
     def localProxy(self, param):
         pass
 
-    def host_late(self, url_list):
-        if isinstance(url_list, str):
-            urls = [u.strip() for u in url_list.split(',')]
-        else:
-            urls = url_list
-        if len(urls) <= 1:
-            return urls[0] if urls else ''
-
-        results = {}
-        threads = []
-
-        def test_host(url):
-            try:
-                start_time = time.time()
-                response = requests.head(url, timeout=1.0, allow_redirects=False)
-                delay = (time.time() - start_time) * 1000
-                results[url] = delay
-            except Exception as e:
-                results[url] = float('inf')
-        for url in urls:
-            t = threading.Thread(target=test_host, args=(url,))
-            threads.append(t)
-            t.start()
-        for t in threads:
-            t.join()
-        return min(results.items(), key=lambda x: x[1])[0]
+    def fetch_api(self, url, headers):
+        """url 为 /api 开头的路径；后台测速可能已换了主机，请求出错时切到次快的主机重试一次"""
+        self.host = self.hosts.host
+        try:
+            response = self.fetch(f"{self.host}{url}", headers=headers)
+            if response.status_code < 500:
+                return response
+        except Exception:
+            pass
+        self.host = self.hosts.failover(self.host)
+        return self.fetch(f"{self.host}{url}", headers=headers)
 
     def md5(self, sign_key):
         md5_hash = MD5.new()
@@ -1,6 +1,9 @@
 from base.spider import Spider
 import re,sys,json
+import os
 sys.path.append('..')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from lib.listcache import cached_listing
 
 class Spider(Spider):
     api_host = 'https://api.jinlidj.com'
@@ -26,6 +29,7 @@ class Spider(Spider):
     def homeContent(self, filter):
         return {'class': [{'type_id': 1, 'type_name': '情感关系'}, {'type_id': 2, 'type_name': '成长逆袭'}, {'type_id': 3, 'type_name': '奇幻异能'}, {'type_id': 4, 'type_name': '战斗热血'}, {'type_id': 5, 'type_name': '伦理现实'}, {'type_id': 6, 'type_name': '时空穿越'}, {'type_id': 7, 'type_name': '权谋身份'}]}
 
+    @cached_listing()
     def homeVideoContent(self):
         payload = {
             "page": 1,
@@ -92,6 +96,7 @@ class Spider(Spider):
                 })
         return {'list': videos, 'page': pg, 'total': data['total'], 'limit': 24}
 
+    @cached_listing()
     def categoryContent(self, tid, pg, filter, extend):
         payload = {
             "page": pg,
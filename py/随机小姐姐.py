@@ -1,7 +1,7 @@
 # coding=utf-8
 # !/usr/bin/python
 import sys
-import requests
+import os
 import datetime
 from bs4 import BeautifulSoup
 import re
@@ -10,6 +10,10 @@ from base.spider import Spider
 import json
 
 sys.path.append('..')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from lib.httpclient import get_client
+
+http_client = get_client()
 xurl = "http://xjj2.716888.xyz"
 headerx = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/50.0.2661.87 Safari/537.36',
@@ -115,7 +119,7 @@ class Spider(Spider):
 
     def playerContent(self, flag, id, vipFlags):
         result = {}
-        response = requests.get(url=xurl + id, headers=headerx, allow_redirects=False)
+        response = http_client.get(url=xurl + id, headers=headerx, allow_redirects=False)
 
         location_header = response.headers.get('Location')
         if 'http' in location_header:
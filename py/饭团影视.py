@@ -14,20 +14,26 @@ from Crypto.Cipher import ARC4
 from urllib.parse import quote
 from base.spider import Spider
 from Crypto.Cipher import AES
-from bs4 import BeautifulSoup
 from base64 import b64decode
 import urllib.request
 import urllib.parse
 import binascii
-import requests
 import base64
 import json
 import time
 import sys
 import re
 import os
+from functools import cached_property
 
 sys.path.append('..')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from lib.httpclient import get_client
+from lib.extract import extract_middle_text
+from lib.prefetch import DetailCache, LineResolver, prefetch_count
+from lib.soup import find_all, parse_only
+
+http_client = get_client()
 
 xurl = "https://fantuansjz.com"
 
@@ -46,7 +52,17 @@ class Spider(Spider):
         return "首页"
 
     def init(self, extend):
-        pass
+        self.details.count = prefetch_count(extend)
+
+    @cached_property
+    def details(self):
+        # 分类/搜索结果返回后在后台预取前几条详情
+        return DetailCache(self.load_detail)
+
+    @cached_property
+    def lines(self):
+        # 详情返回时后台解析各线路首集，播放时直接取用
+        return LineResolver(self.resolve_play)
 
     def isVideoFormat(self, url):
         pass
@@ -55,65 +71,7 @@ class Spider(Spider):
         pass
 
     def extract_middle_text(self, text, start_str, end_str, pl, start_index1: str = '', end_index2: str = ''):
-        if pl == 3:
-            plx = []
-            while True:
-                start_index = text.find(start_str)
-                if start_index == -1:
-                    break
-                end_index = text.find(end_str, start_index + len(start_str))
-                if end_index == -1:
-                    break
-                middle_text = text[start_index + len(start_str):end_index]
-                plx.append(middle_text)
-                text = text.replace(start_str + middle_text + end_str, '')
-            if len(plx) > 0:
-                purl = ''
-                for i in range(len(plx)):
-                    matches = re.findall(start_index1, plx[i])
-                    output = ""
-                    for match in matches:
-                        match3 = re.search(r'(?:^|[^0-9])(\d+)(?:[^0-9]|$)', match[1])
-                        if match3:
-                            number = match3.group(1)
-                        else:
-                            number = 0
-                        if 'http' not in match[0]:
-                            output += f"#{match[1]}${number}{xurl}{match[0]}"
-                        else:
-                            output += f"#{match[1]}${number}{match[0]}"
-                    output = output[1:]
-                    purl = purl + output + "$$$"
-                purl = purl[:-3]
-                return purl
-            else:
-                return ""
-        else:
-            start_index = text.find(start_str)
-            if start_index == -1:
-                return ""
-            end_index = text.find(end_str, start_index + len(start_str))
-            if end_index == -1:
-                return ""
-
-        if pl == 0:
-            middle_text = text[start_index + len(start_str):end_index]
-            return middle_text.replace("\\", "")
-
-        if pl == 1:
-            middle_text = text[start_index + len(start_str):end_index]
-            matches = re.findall(start_index1, middle_text)
-            if matches:
-                jg = ' '.join(matches)
-                return jg
-
-        if pl == 2:
-            middle_text = text[start_index + len(start_str):end_index]
-            matches = re.findall(start_index1, middle_text)
-            if matches:
-                new_list = [f'{item}' for item in matches]
-                jg = '$$$'.join(new_list)
-                return jg
+        return extract_middle_text(text, start_str, end_str, pl, start_index1, end_index2, base_url=xurl)
 
     def homeContent(self, filter):
         result = {}
@@ -186,13 +144,11 @@ class Spider(Spider):
         videos = []
 
         try:
-            detail = requests.get(url=xurl, headers=headerx)
+            detail = http_client.get(url=xurl, headers=headerx)
             detail.encoding = "utf-8"
             res = detail.text
 
-            doc = BeautifulSoup(res, "lxml")
-
-            soups = doc.find_all('ul', class_="fed-list-info")
+            soups = find_all(res, 'ul', 'fed-list-info')
 
             for soup in soups:
                 vods = soup.find_all('li')
@@ -246,12 +202,10 @@ class Spider(Spider):
             url = f'{xurl}/sjvodshow/{cid}--------{str(page)}---{NdType}.html'
 
         try:
-            detail = requests.get(url=url, headers=headerx)
+            detail = http_client.get(url=url, headers=headerx)
             detail.encoding = "utf-8"
             res = detail.text
-            doc = BeautifulSoup(res, "lxml")
-
-            soups = doc.find_all('ul', class_="fed-list-info")
+            soups = find_all(res, 'ul', 'fed-list-info')
 
             for soup in soups:
                 vods = soup.find_all('li')
@@ -286,23 +240,28 @@ class Spider(Spider):
         result['pagecount'] = 9999
         result['limit'] = 90
         result['total'] = 999999
+        self.details.prefetch_videos(videos)
         return result
 
     def detailContent(self, ids):
+        detail = self.details.get(ids[0])
+        self.lines.warm_detail(detail)
+        return detail
+
+    def load_detail(self, did):
         global pm
-        did = ids[0]
         result = {}
         videos = []
 
         if 'http' not in did:
             did = xurl + did
 
-        res = requests.get(url=did, headers=headerx)
+        res = http_client.get(url=did, headers=headerx)
         res.encoding = "utf-8"
         res = res.text
 
         url = 'https://m.baidu.com/'
-        response = requests.get(url)
+        response = http_client.get(url)
         response.encoding = 'utf-8'
         code = response.text
         name = self.extract_middle_text(code, "s1='", "'", 0)
@@ -323,7 +282,7 @@ class Spider(Spider):
         if name not in content:
             bofang = Jumps
         else:
-            doc = BeautifulSoup(res, "lxml")
+            doc = parse_only(res, 'ul', ['fed-padding', 'fed-tabs-btm'])
 
             soups = doc.find('ul', class_="fed-padding")
 
@@ -387,28 +346,30 @@ class Spider(Spider):
         return result
 
     def playerContent(self, flag, id, vipFlags):
-        parts = id.split("http")
-
         xiutan = 0
 
-        if xiutan == 0:
-            if len(parts) > 1:
-                before_https, after_https = parts[0], 'http' + parts[1]
+        result = {}
+        result["parse"] = xiutan
+        result["playUrl"] = ''
+        result["url"] = self.lines.get(id)
+        result["header"] = headerx
+        return result
 
-            if '/tp/jd.m3u8' in after_https:
-                url = after_https
-            else:
-                res = requests.get(url=after_https, headers=headerx)
-                res = res.text
+    def resolve_play(self, id):
+        parts = id.split("http")
 
-                url = self.extract_middle_text(res, '},"url":"', '"', 0).replace('\\', '')
+        if len(parts) > 1:
+            before_https, after_https = parts[0], 'http' + parts[1]
 
-            result = {}
-            result["parse"] = xiutan
-            result["playUrl"] = ''
-            result["url"] = url
-            result["header"] = headerx
-            return result
+        if '/tp/jd.m3u8' in after_https:
+            url = after_https
+        else:
+            res = http_client.get(url=after_https, headers=headerx)
+            res = res.text
+
+            url = self.extract_middle_text(res, '},"url":"', '"', 0).replace('\\', '')
+
+        return url
 
     def searchContentPage(self, key, quick, page):
         result = {}
@@ -422,12 +383,10 @@ class Spider(Spider):
         else:
             url = f'{xurl}/sjvodsearch/{key}----------{str(page)}---.html'
 
-        detail = requests.get(url=url, headers=headerx)
+        detail = http_client.get(url=url, headers=headerx)
         detail.encoding = "utf-8"
         res = detail.text
-        doc = BeautifulSoup(res, "lxml")
-
-        soups = doc.find_all('dl', class_="fed-list-deta")
+        soups = find_all(res, 'dl', 'fed-list-deta')
 
         for vod in soups:
             names = vod.find('h3', class_="fed-part-eone")
@@ -458,6 +417,7 @@ class Spider(Spider):
         result['pagecount'] = 9999
         result['limit'] = 90
         result['total'] = 999999
+        self.details.prefetch_videos(videos)
         return result
 
     def searchContent(self, key, quick, pg="1"):